@@ -14,7 +14,7 @@
 
 import argparse
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 import yaml
 
@@ -100,3 +100,33 @@ def pretty_print(data: Any, fmt: Optional[str] = None) -> None:
 
     # fallback to default
     print(yaml.safe_dump(data, default_flow_style=False))
+
+
+def pretty_print_stream(items: Iterable[Any],
+                        fmt: Optional[str] = None) -> None:
+    """
+    Outputs a list of items in the specified format, the same as
+    pretty_print, except that each item is output as soon as it is
+    available, rather than building the whole list in memory first.
+
+    :param Iterable[Any] items: an iterable of Python data structures
+    :param Optional[str] fmt:   the output format
+
+    """
+    if fmt and fmt == 'json':
+        print('[')
+        separator = ''
+        for item in items:
+            print(separator + json.dumps(item, indent=2), end='')
+            separator = ',\n'
+        print('\n]' if separator else ']')
+
+        return
+
+    # fallback to default
+    empty = True
+    for item in items:
+        print(yaml.safe_dump([item], default_flow_style=False), end='')
+        empty = False
+    if empty:
+        print(yaml.safe_dump([], default_flow_style=False))
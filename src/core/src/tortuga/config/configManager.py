@@ -756,6 +756,53 @@ class ConfigManager(dict): \
 
         return cfg.get('database', 'engine')
 
+    def get_websocket_queue_size(self) -> Optional[int]:
+        """
+        Get the maximum number of outbound messages queued for each
+        websocket session, or None for the default.
+
+        """
+        cfg = self._get_cfg()
+
+        if not cfg.has_option('websocket', 'queue_size'):
+            return None
+
+        return cfg.getint('websocket', 'queue_size')
+
+    def get_websocket_queue_policy(self) -> Optional[str]:
+        """
+        Get the policy applied when the outbound message queue of a
+        websocket session is full (drop-oldest, coalesce or disconnect),
+        or None for the default.
+
+        """
+        cfg = self._get_cfg()
+
+        if not cfg.has_option('websocket', 'queue_policy'):
+            return None
+
+        return cfg.get('websocket', 'queue_policy')
+
+    def get_event_ttl(self, name: str) -> Optional[int]:
+        """
+        Get the number of seconds events of a type are kept in the event
+        store, from the [event_ttl] section, where each option is the name
+        of an event type, and the "default" option applies to all other
+        types. A ttl of 0 keeps the events until they are deleted.
+
+        :param str name: the name of the event type
+
+        :return Optional[int]: the ttl, 0, or None if it is not configured
+
+        """
+        cfg = self._get_cfg()
+
+        for option in (name, 'default'):
+            if cfg.has_option('event_ttl', option):
+                return cfg.getint('event_ttl', option)
+
+        return None
+
     def is_offline_installation(self) -> bool:
         cfg = self._get_cfg()
 
@@ -18,7 +18,7 @@ import os
 from typing import List, Dict
 
 from tortuga.cli.base import Argument, RootCommand, Command
-from tortuga.cli.utils import pretty_print
+from tortuga.cli.utils import pretty_print, pretty_print_stream
 from tortuga.config.configManager import ConfigManager
 from tortuga.wsapi_v2.client import TortugaWsApiClient
 
@@ -37,6 +37,13 @@ class ListCommand(Command):
             type=str,
             nargs='*',
             help='List query parameters'
+        ),
+        Argument(
+            '--page-size',
+            type=int,
+            dest='page_size',
+            help='Request the list in pages of this size, and output '
+                 'items as they are received'
         )
     ]
 
@@ -59,7 +66,14 @@ class ListCommand(Command):
 
         params = self._parse_params(query)
 
-        pretty_print(ws_client.list(**params), args.fmt)
+        if args.page_size:
+            pretty_print_stream(
+                ws_client.list_all(page_size=args.page_size, **params),
+                args.fmt
+            )
+
+        else:
+            pretty_print(ws_client.list(**params), args.fmt)
 
     def _parse_params(self, query: List[str]) -> Dict[str, str]:
         """
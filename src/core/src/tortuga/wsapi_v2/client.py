@@ -13,7 +13,7 @@
 # limitations under the License.
 
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
 from tortuga.config.configManager import ConfigManager
 from tortuga.logging import WEBSERVICE_CLIENT_NAMESPACE
@@ -73,6 +73,27 @@ class TortugaWsApiClient:
 
         return self._client.get(path)
 
+    def list_all(self, page_size: int = 100, **params) -> Iterator[dict]:
+        """
+        Lists all objects, requesting them one page at a time, so that
+        arbitrarily large lists can be processed in constant memory.
+
+        :param int page_size: the number of objects to request per page
+        :param params:        list query parameters
+
+        :return Iterator[dict]: an iterator of objects
+
+        """
+        cursor = ''
+        while True:
+            page = self.list(page_size=page_size, cursor=cursor, **params)
+
+            yield from page['items']
+
+            cursor = page['next']
+            if not cursor:
+                return
+
     def get(self, id_: str) -> dict:
         path = '/{}'.format(id_)
 
@@ -35,3 +35,28 @@ def test_build_query_string(params, expected):
         endpoint='https://blah:1234')._build_query_string(params)
 
     assert result == expected
+
+
+def test_list_all(monkeypatch):
+    pages = {
+        '': {'items': [{'id': 1}, {'id': 2}], 'next': 'abc'},
+        'abc': {'items': [{'id': 3}, {'id': 4}], 'next': 'def'},
+        'def': {'items': [{'id': 5}], 'next': None},
+    }
+    requested = []
+
+    def list_(**params):
+        requested.append(params)
+        return pages[params['cursor']]
+
+    client = TortugaWsApiClient(endpoint='https://blah:1234')
+    monkeypatch.setattr(client, 'list', list_)
+
+    result = [obj['id'] for obj in client.list_all(page_size=2, name='x')]
+
+    assert result == [1, 2, 3, 4, 5]
+    assert requested == [
+        {'page_size': 2, 'cursor': '', 'name': 'x'},
+        {'page_size': 2, 'cursor': 'abc', 'name': 'x'},
+        {'page_size': 2, 'cursor': 'def', 'name': 'x'},
+    ]
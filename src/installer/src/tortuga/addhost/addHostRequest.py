@@ -20,6 +20,7 @@ import logging
 from sqlalchemy.orm.session import Session
 
 from tortuga.db.nodeRequestsDbHandler import NodeRequestsDbHandler
+from tortuga.events.dispatcher import batch_listeners
 from tortuga.events.types import AddNodeRequestComplete
 from tortuga.exceptions.tortugaException import TortugaException
 from tortuga.logging import ADD_HOST_NAMESPACE
@@ -54,7 +55,12 @@ def process_addhost_request(session: Session, request: dict,
             logger.debug(
                 'Processing add host request [%s]', req.addHostSession)
 
-            ahm.addHosts(session, addHostRequest)
+            #
+            # Nodes are added in bulk, so the listeners for the events
+            # fired while adding them are scheduled together
+            #
+            with batch_listeners():
+                ahm.addHosts(session, addHostRequest)
 
             # Delete session log
             ahm.delete_session(req.addHostSession)
@@ -21,15 +21,19 @@ import random
 import re
 import string
 import threading
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from sqlalchemy.orm.session import Session
 
+from tortuga.db.ipAllocationDbHandler import IpAllocationDbHandler
 from tortuga.db.models.hardwareProfile import HardwareProfile
+from tortuga.db.models.hardwareProfileNetwork import HardwareProfileNetwork
 from tortuga.db.models.network import Network
 from tortuga.db.models.nic import Nic
 from tortuga.db.models.node import Node
 from tortuga.db.models.softwareProfile import SoftwareProfile
+from tortuga.db.nicsDbHandler import NicsDbHandler
+from tortuga.db.nodeNameDbHandler import NodeNameDbHandler
 from tortuga.db.nodesDbHandler import NodesDbHandler
 from tortuga.exceptions.invalidArgument import InvalidArgument
 from tortuga.exceptions.invalidMacAddress import InvalidMacAddress
@@ -37,66 +41,47 @@ from tortuga.exceptions.macAddressAlreadyExists import MacAddressAlreadyExists
 from tortuga.exceptions.networkNotFound import NetworkNotFound
 from tortuga.exceptions.nicNotFound import NicNotFound
 from tortuga.logging import ADD_HOST_NAMESPACE
-from tortuga.resourceAdapter.utility import get_provisioning_nics
 from tortuga.utility.tortugaApi import TortugaApi
 
 
 session_nodes_lock = threading.RLock()
 
-session_nodes: List[Node] = []
-
-# Maintain a list of used IP addresses. We do this to ensure we are
-# not reusing IP addresses that were already used in this add nodes
-# session.
-reservedIps: List[str] = []
-
-logger = logging.getLogger(ADD_HOST_NAMESPACE)
+MAC_ADDRESS_REGEX = re.compile(
+    r'^([0-9A-Fa-f]{2}[:-]?){5}[0-9A-Fa-f]{2}([:-]?.*)?$')
 
 
 class AddHostServerLocal(TortugaApi):
     def __init__(self):
         super(AddHostServerLocal, self).__init__()
         self._nodesDbHandler = NodesDbHandler()
+        self._nicsDbHandler = NicsDbHandler()
+        self._ipAllocationDbHandler = IpAllocationDbHandler()
+        self._nodeNameDbHandler = NodeNameDbHandler()
         self._logger = logging.getLogger(ADD_HOST_NAMESPACE)
 
     @staticmethod
-    def clear_session_nodes(nodes: List[Node]) -> None:
-        """Remove session entries for specified nodes"""
-
-        with session_nodes_lock:
-            for node in nodes:
-                AddHostServerLocal.clear_session_node(node, lock=False)
-
-    @staticmethod
-    def clear_session_node(node: Node, lock: bool = True) -> None:
-        if lock:
-            session_nodes_lock.acquire()
-
-        try:
-            if not node.name:
-                return
-
-            hostname = get_host_name(node.name)
+    def clear_session_nodes(nodes: List[Node]) -> None: \
+            # pylint: disable=unused-argument
+        """
+        Node names are reserved in the transaction that adds the nodes,
+        so there is nothing left to clear. Kept for resource adapters that
+        still call it.
 
-            logger.debug(
-                'clear_session_node(): session_nodes=[{0}]'.format(
-                    ' '.join([session_node
-                              for session_node in session_nodes])))
+        """
 
-            if hostname in session_nodes:
-                logger.debug('DELETING session_nodes entry: {0}'.format(
-                    hostname))
+    def release_node_name(self, session: Session, node: Node) -> None:
+        """
+        Releases the name generated for a node that is not being added
+        after all, so that it can be generated again.
 
-                session_nodes.remove(hostname)
+        :param Session session: the database session
+        :param Node node:       the node
 
-            prov_nics = get_provisioning_nics(node)
+        """
+        if not node.name:
+            return
 
-            if prov_nics:
-                if prov_nics[0].ip in reservedIps:
-                    reservedIps.remove(prov_nics[0].ip)
-        finally:
-            if lock:
-                session_nodes_lock.release()
+        self._nodeNameDbHandler.release(session, get_host_name(node.name))
 
     def initializeNode(self, session: Session, dbNode: Node,
                        dbHardwareProfile: HardwareProfile,
@@ -104,7 +89,8 @@ class AddHostServerLocal(TortugaApi):
                        nic_defs: List[dict],
                        bValidateIp: bool = True,
                        bGenerateIp: bool = True,
-                       dns_zone: Optional[str] = None) -> None: \
+                       dns_zone: Optional[str] = None,
+                       bValidateMac: bool = True) -> None: \
             # pylint: disable=unused-argument
         """
         Assigns hostname and IP address, and inserts new record into
@@ -125,6 +111,8 @@ class AddHostServerLocal(TortugaApi):
                 'Hardware profile [{}] does not have a provisioning'
                 ' network'.format(dbHardwareProfile.name))
 
+        generated_name = False
+
         try:
             if not dbNode.name:
                 # Generate unique name for new node
@@ -133,18 +121,21 @@ class AddHostServerLocal(TortugaApi):
                     rackNumber=dbNode.rack,
                     dns_zone=dns_zone)
 
+                generated_name = True
+
             # Create NIC entries
             dbNode.nics = self._initializeNics(session, dbNode,
                                                dbHardwareProfile, nic_defs,
                                                bValidateIp=bValidateIp,
-                                               bGenerateIp=bGenerateIp)
+                                               bGenerateIp=bGenerateIp,
+                                               bValidateMac=bValidateMac)
 
             self._logger.debug(
                 'initializeNode(): initialized new node [%s]' % (
                     dbNode.name))
         except Exception:
-            with session_nodes_lock:
-                self.clear_session_node(dbNode)
+            if generated_name:
+                self.release_node_name(session, dbNode)
 
             raise
 
@@ -164,51 +155,14 @@ class AddHostServerLocal(TortugaApi):
                 self._substituteHashSpecifier(
                     nameFormat, '#R', rackNumber)
 
-            # Find all pre-existing nodes + nodes in the session
-            if not randomize:
-                nodes = self._nodesDbHandler.getNodesByNameFilter(
-                    session,
-                    self._substituteHashSpecifier(
-                        base_name, '#N', '_'))
-
-                # Get list of all existing nodes names
-                node_names = [get_host_name(tmpNode.name)
-                              for tmpNode in nodes]
-            else:
-                # Get all nodes matching name format WITH a random suffix
-                nodes = self._nodesDbHandler.getNodesByNameFilter(
-                    session,
-                    self._substituteHashSpecifier(base_name, '#N', '_') +
-                    '-_____')
-
-                node_names = [
-                    strip_random_node_name_suffix(get_host_name(node.name))
-                    for node in nodes]
-
-            with session_nodes_lock:
-                # Build a list of all nodes in database and session
-                if randomize:
-                    all_session_nodes = node_names + \
-                        strip_random_node_name_suffixes(session_nodes)
-                else:
-                    all_session_nodes = node_names + session_nodes
-
-            for slot in itertools.count(1):
-                name = self._substituteHashSpecifier(
-                    base_name, '#N', slot)
-
-                if name not in all_session_nodes:
-                    break
+            name = self._nodeNameDbHandler.allocate(
+                session, base_name, randomized=randomize)
 
             if randomize:
                 # Add random 5 letter suffix to generated host name
                 name += '-%s' % (
                     ''.join(random.sample(string.ascii_lowercase, 5)))
 
-            with session_nodes_lock:
-                # Add only host name to session_nodes cache
-                session_nodes.append(name)
-
             return '{}.{}'.format(name, dns_zone) if dns_zone else name
         except InvalidArgument as exc:
             raise InvalidArgument('%s (format=[%s])' % (exc, nameFormat))
@@ -281,7 +235,8 @@ class AddHostServerLocal(TortugaApi):
     def _initializeNics(self, session: Session, dbNode: Node,
                         dbHardwareProfile: HardwareProfile,
                         nic_defs: List[dict], bValidateIp: bool = True,
-                        bGenerateIp: bool = True) -> List[Nic]:
+                        bGenerateIp: bool = True,
+                        bValidateMac: bool = True) -> List[Nic]:
         """
         Return list of Nic objects reflecting the configuration of dbNode
         and nic definitions provided in nic_defs.
@@ -293,9 +248,7 @@ class AddHostServerLocal(TortugaApi):
         """
         nics = []
 
-        hwpnetworks = dbHardwareProfile.hardwareprofilenetworks[:]
-
-        hwpnetworks.sort(key=lambda a: a.networkdevice.name)
+        hwpnetworks = get_hardware_profile_networks(dbHardwareProfile)
 
         for nic_def, dbHardwareProfileNetwork in itertools.zip_longest(
                 nic_defs, hwpnetworks, fillvalue=None):
@@ -309,8 +262,12 @@ class AddHostServerLocal(TortugaApi):
                 # MAC addresses are generated for virtualization platforms
                 # such as libvirt and VMware
                 #
-                dbNic.mac = self._validate_mac_address(
-                    session, nic_def['mac'], dbHardwareProfileNetwork.network)
+                if bValidateMac:
+                    dbNic.mac = self._validate_mac_address(
+                        session, nic_def['mac'],
+                        dbHardwareProfileNetwork.network)
+                else:
+                    dbNic.mac = nic_def['mac']
 
             #
             # Validate IP, if specified, otherwise generate an IP, if
@@ -322,6 +279,12 @@ class AddHostServerLocal(TortugaApi):
                         nic_def['ip'], dbHardwareProfileNetwork.network)
 
                 dbNic.ip = nic_def['ip']
+
+                if dbHardwareProfileNetwork:
+                    with session_nodes_lock:
+                        self._ipAllocationDbHandler.reserve(
+                            session, dbHardwareProfileNetwork.network,
+                            dbNic.ip)
             else:
                 if dbHardwareProfile.location == 'local' and \
                         not dbHardwareProfileNetwork:
@@ -333,7 +296,7 @@ class AddHostServerLocal(TortugaApi):
                         dbHardwareProfileNetwork.network.type == 'provision':
                     # Generate an IP address for the specified nic
                     dbNic.ip = self.generate_provisioning_ip_address(
-                        dbHardwareProfileNetwork.network)
+                        session, dbHardwareProfileNetwork.network)
 
                     self._logger.debug(
                         'Generated IP [%s] for node [%s]' % (
@@ -353,13 +316,62 @@ class AddHostServerLocal(TortugaApi):
             # Set the 'boot' flag if this is a provisioning network
             dbNic.boot = dbNic.network and dbNic.network.type == 'provision'
 
-            if dbNic.ip:
-                reservedIps.append(dbNic.ip)
-
             nics.append(dbNic)
 
         return nics
 
+    def validate_mac_addresses(self, session: Session,
+                               dbHardwareProfile: HardwareProfile,
+                               nic_defs_list: List[List[dict]]) \
+            -> List[List[dict]]:
+        """
+        Validate the MAC addresses of the nic definitions of many nodes
+        being added to a hardware profile, using a single query rather
+        than one query per nic.
+
+        :param Session session:                the database session
+        :param HardwareProfile dbHardwareProfile: the hardware profile
+        :param List[List[dict]] nic_defs_list: nic definitions, per node
+
+        :return List[List[dict]]: copies of the nic definitions, with
+                                  normalized MAC addresses
+
+        :raises InvalidMacAddress:
+        :raises MacAddressAlreadyExists:
+
+        """
+        networks = [
+            hwpnetwork.network
+            for hwpnetwork in get_hardware_profile_networks(
+                dbHardwareProfile)
+        ]
+
+        result = []
+        mac_addresses = []
+
+        for nic_defs in nic_defs_list:
+            node_nic_defs = []
+
+            for nic_def, network in itertools.zip_longest(
+                    nic_defs, networks, fillvalue=None):
+                if nic_def is None:
+                    break
+
+                nic_def = dict(nic_def)
+
+                if 'mac' in nic_def:
+                    nic_def['mac'] = normalize_mac_address(nic_def['mac'])
+
+                    mac_addresses.append((nic_def['mac'], network))
+
+                node_nic_defs.append(nic_def)
+
+            result.append(node_nic_defs)
+
+        self._check_mac_addresses(session, mac_addresses)
+
+        return result
+
     def _validate_mac_address(self, session: Session, mac_address: str,
                               network: Network) -> str:
         """
@@ -370,48 +382,46 @@ class AddHostServerLocal(TortugaApi):
 
         """
 
-        if not mac_address:
-            raise InvalidMacAddress('MAC address is empty/undefined')
+        mac_address = normalize_mac_address(mac_address)
 
-        #
-        # Normalize and Validate MAC address formatting
-        #
-        mac_regex = re.compile(
-            r'^([0-9A-Fa-f]{2}[:-]?){5}[0-9A-Fa-f]{2}([:-]?.*)?$')
-        if not mac_regex.match(mac_address):
-            raise InvalidMacAddress(
-                'MAC address [{}] is invalid/malformed'.format(mac_address))
-
-        if '-' in mac_address:
-            mac_address = mac_address.replace('-', ':').lower()
-
-        if ':' not in mac_address:
-            mac_address = '{}:{}:{}:{}:{}:{}'.format(mac_address[0:2],
-                                                     mac_address[2:4],
-                                                     mac_address[4:6],
-                                                     mac_address[6:8],
-                                                     mac_address[8:10],
-                                                     mac_address[10:12])
-
-        #
-        # Make sure that the MAC address does not already exist on the
-        # same provisioning network
-        #
-        db_host_list = self._nodesDbHandler.getNodesByMac(session,
-                                                          [mac_address])
-        for db_host in db_host_list:
-            for db_nic in db_host.nics:
-                if db_nic.mac == mac_address and \
-                        db_nic.networkId == network.id:
-                    raise MacAddressAlreadyExists(
-                        'The MAC address [{}] already exists '
-                        'on the network [{}/{}]'.format(mac_address,
-                                                        network.address,
-                                                        network.netmask)
-                    )
+        self._check_mac_addresses(session, [(mac_address, network)])
 
         return mac_address
 
+    def _check_mac_addresses(self, session: Session,
+                             mac_addresses: List[Tuple[str, Network]]) \
+            -> None:
+        """
+        Make sure that none of the MAC addresses already exist on the same
+        provisioning network, in the database or in the list itself.
+
+        :raises MacAddressAlreadyExists:
+
+        """
+        requested = set()
+
+        for mac_address, network in mac_addresses:
+            key = (mac_address, network.id if network else None)
+
+            if key in requested:
+                raise MacAddressAlreadyExists(
+                    'The MAC address [{}] is specified more than once'.format(
+                        mac_address))
+
+            requested.add(key)
+
+        used = set(self._nicsDbHandler.getNetworkIdsByMac(
+            session, [mac_address for mac_address, _ in mac_addresses]))
+
+        for mac_address, network in mac_addresses:
+            if network and (mac_address, network.id) in used:
+                raise MacAddressAlreadyExists(
+                    'The MAC address [{}] already exists '
+                    'on the network [{}/{}]'.format(mac_address,
+                                                    network.address,
+                                                    network.netmask)
+                )
+
     def _validate_ip_address(self, ip, network) -> None:
         """
         :raises NetworkNotFound:
@@ -436,7 +446,8 @@ class AddHostServerLocal(TortugaApi):
             #
             raise NetworkNotFound('IP address [{}] is invalid'.format(ip))
 
-    def generate_provisioning_ip_address(self, network):
+    def generate_provisioning_ip_address(self, session: Session,
+                                         network: Network) -> Optional[str]:
         """
         Raises:
             InvalidArgument
@@ -447,61 +458,54 @@ class AddHostServerLocal(TortugaApi):
             # (we do not assign the IP address for this hardwareProfile.)
             return None
 
-        n = ipaddress.IPv4Network(
-            '%s/%s' % (network.address, network.netmask))
+        with session_nodes_lock:
+            ip = self._ipAllocationDbHandler.allocate(session, network)
 
-        # Get list of all currently allocated IPs on this network
-        ips = [
-            ipaddress.IPv4Address(str(dbNic.ip))
-            for dbNic in network.nics if dbNic and dbNic.ip]
+        self._logger.debug(
+            'Assigning IP address [%s] on network [%s/%s]' % (
+                ip, network.address, network.netmask))
 
-        with session_nodes_lock:
-            # Include reserved IPs
-            ips.extend([ipaddress.IPv4Address(str(ip))
-                        for ip in reservedIps])
-
-            if not network.startIp:
-                # Assume the starting IP address is the first IP address in
-                # the subnet
-                try:
-                    ip = n[1]
-                except IndexError:
-                    raise InvalidArgument('IP address space exhausted')
-            else:
-                ip = ipaddress.IPv4Address(str(network.startIp))
+        return ip
 
-            # Ensure there's a valid increment if none is defined in the
-            # network object.
-            inc = network.increment if network.increment else 1
 
-            for _ in range(n.num_addresses):
-                if ip not in ips:
-                    # Found available IP address within address space
-                    break
+def normalize_mac_address(mac_address: str) -> str:
+    """
+    Validate the formatting of a MAC address, and normalize it to
+    lowercase, colon separated form.
 
-                ip += int(inc)
-            else:
-                raise InvalidArgument('IP address space exhausted')
+    :raises InvalidMacAddress:
 
-            if ip == n.broadcast_address:
-                raise InvalidArgument('IP address space exhausted')
+    """
+    if not mac_address:
+        raise InvalidMacAddress('MAC address is empty/undefined')
 
-            reservedIps.append(ip.exploded)
+    if not MAC_ADDRESS_REGEX.match(mac_address):
+        raise InvalidMacAddress(
+            'MAC address [{}] is invalid/malformed'.format(mac_address))
 
-        self._logger.debug(
-            'Assigning IP address [%s] on network [%s]' % (
-                ip.exploded, str(n)))
+    if '-' in mac_address:
+        mac_address = mac_address.replace('-', ':').lower()
 
-        return ip.exploded
+    if ':' not in mac_address:
+        mac_address = '{}:{}:{}:{}:{}:{}'.format(mac_address[0:2],
+                                                 mac_address[2:4],
+                                                 mac_address[4:6],
+                                                 mac_address[6:8],
+                                                 mac_address[8:10],
+                                                 mac_address[10:12])
 
+    return mac_address
 
-def strip_random_node_name_suffix(name):
-    # Strip leading dash ("-") and 5 random character node name suffix
-    return name[:-6]
 
+def get_hardware_profile_networks(dbHardwareProfile: HardwareProfile) \
+        -> List[HardwareProfileNetwork]:
+    """
+    Return the networks of a hardware profile, in the order in which they
+    are assigned to the nics of a node.
 
-def strip_random_node_name_suffixes(names):
-    return [strip_random_node_name_suffix(name) for name in names]
+    """
+    return sorted(dbHardwareProfile.hardwareprofilenetworks,
+                  key=lambda a: a.networkdevice.name)
 
 
 def get_host_name(name):
@@ -17,6 +17,8 @@
 
 import configparser
 import os
+import threading
+from typing import Any, Dict
 
 import sqlalchemy
 import sqlalchemy.orm
@@ -25,10 +27,22 @@ from tortuga.config.configManager import ConfigManager
 from tortuga.exceptions.dbError import DbError
 from tortuga.kit.registry import get_all_kit_installers
 from tortuga.objects.tortugaObjectManager import TortugaObjectManager
+from .migrations import migrate_database, upgrade_database
 from .models.base import ModelBase
+from .pool import InstrumentedQueuePool, PoolMetrics
 from .sessionContextManager import SessionContextManager
 
 
+#
+# Connection pool defaults, used unless overridden in the [database]
+# section of tortuga.ini. Connections are recycled well within the MySQL
+# default wait_timeout, and tested before use, so that connections closed
+# by the server are replaced rather than returned to requests.
+#
+DEFAULT_POOL_RECYCLE = 3600
+DEFAULT_POOL_PRE_PING = True
+
+
 class DbManager(TortugaObjectManager):
     """
     Class for db management.
@@ -40,6 +54,20 @@ class DbManager(TortugaObjectManager):
                    cleared once the database has been initialized.
 
     """
+    #
+    # Kit table mappers are registered once per process, and again only
+    # when more kit installers have been registered since
+    #
+    _tables_lock = threading.Lock()
+    _tables_kit_installer_count = None
+
+    #
+    # Databases are upgraded once per DbManager, when the first session is
+    # opened, so that processes started after an in-place upgrade of the
+    # installer do not query columns and tables that do not exist yet
+    #
+    _upgrade_lock = threading.Lock()
+
     def __init__(self, engine=None):
         super().__init__()
 
@@ -58,17 +86,56 @@ class DbManager(TortugaObjectManager):
 
                 os.close(fd)
 
-            self._engine = sqlalchemy.create_engine(engineURI)
+            self._engine = sqlalchemy.create_engine(
+                engineURI, **get_pool_options(self._dbConfig))
         else:
             self._engine = engine
 
+        self.pool_metrics = PoolMetrics()
+        self.pool_metrics.attach(self._engine)
+        if isinstance(self._engine.pool, InstrumentedQueuePool):
+            self._engine.pool.metrics = self.pool_metrics
+
+        self._upgraded = False
+
         self.Session = sqlalchemy.orm.scoped_session(
             sqlalchemy.orm.sessionmaker(bind=self.engine))
 
     def _register_database_tables(self):
-        for kit_installer_class in get_all_kit_installers():
-            kit_installer = kit_installer_class()
-            kit_installer.register_database_tables()
+        cls = self.__class__
+
+        kit_installer_classes = get_all_kit_installers()
+        if len(kit_installer_classes) == cls._tables_kit_installer_count:
+            return
+
+        with cls._tables_lock:
+            if len(kit_installer_classes) == \
+                    cls._tables_kit_installer_count:
+                return
+
+            for kit_installer_class in kit_installer_classes:
+                kit_installer = kit_installer_class()
+                kit_installer.register_database_tables()
+
+            cls._tables_kit_installer_count = len(kit_installer_classes)
+
+    def _upgrade_database(self):
+        if self._upgraded:
+            return
+
+        with self._upgrade_lock:
+            if self._upgraded:
+                return
+
+            try:
+                upgrade_database(self._engine)
+            except DbError:
+                raise
+            except Exception:
+                self._logger.exception('SQLAlchemy raised exception')
+                raise DbError('Database upgrade failed')
+
+            self._upgraded = True
 
     @property
     def engine(self):
@@ -91,6 +158,15 @@ class DbManager(TortugaObjectManager):
         self._register_database_tables()
         try:
             ModelBase.metadata.create_all(self.engine)
+
+            #
+            # Bring tables created by earlier releases up to date
+            #
+            migrate_database(self.engine)
+
+            self._upgraded = True
+        except DbError:
+            raise
         except Exception:
             self._logger.exception('SQLAlchemy raised exception')
             raise DbError('Check database settings or credentials')
@@ -211,6 +287,16 @@ class DbManager(TortugaObjectManager):
 
         dbConfig['password'] = val
 
+        # Connection pool
+        for option in ['pool_size', 'max_overflow', 'pool_recycle',
+                       'pool_timeout']:
+            dbConfig[option] = cfg.getint('database', option) \
+                if cfg.has_option('database', option) else None
+
+        dbConfig['pool_pre_ping'] = \
+            cfg.getboolean('database', 'pool_pre_ping') \
+            if cfg.has_option('database', 'pool_pre_ping') else None
+
         return dbConfig
 
     def get_backend_opts(self): \
@@ -222,12 +308,53 @@ class DbManager(TortugaObjectManager):
     def getMetadataTable(self, table):
         return self._metadata.tables[table]
 
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Gets the connection pool metrics.
+
+        :return Dict[str, Any]: the connection pool metrics
+
+        """
+        stats = self.pool_metrics.get_stats()
+        stats['pool'] = self._engine.pool.status()
+
+        return stats
+
     def openSession(self):
         """ Open db session. """
 
+        self._upgrade_database()
+
         return self.Session()
 
     def closeSession(self):
         """Close scoped_session."""
 
         self.Session.remove()
+
+
+def get_pool_options(dbConfig: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Gets the connection pool options for create_engine() from a database
+    configuration. SQLite databases keep the SQLAlchemy default pool.
+
+    :param Dict[str, Any] dbConfig: the database configuration
+
+    :return Dict[str, Any]: keyword arguments for create_engine()
+
+    """
+    if dbConfig['engine'] == 'sqlite':
+        return {}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_recycle': DEFAULT_POOL_RECYCLE,
+        'pool_pre_ping': DEFAULT_POOL_PRE_PING,
+    }
+
+    for option in ['pool_size', 'max_overflow', 'pool_recycle',
+                   'pool_timeout', 'pool_pre_ping']:
+        if dbConfig.get(option) is not None:
+            options[option] = dbConfig[option]
+
+    return options
@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
+from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.session import Session
 from tortuga.db.models.instanceMetadata import InstanceMetadata
 from tortuga.db.tortugaDbObjectHandler import TortugaDbObjectHandler
@@ -30,6 +31,20 @@ class InstanceMetadataDbHandler(TortugaDbObjectHandler):
             session, filter_key, filter_value
         ).all()
 
+    def iterate(self, session: Session, *, filter_key: Optional[str] = None,
+                filter_value: Optional[str] = None,
+                batch_size: int = 1000) -> Iterator[InstanceMetadata]:
+        """
+        Iterate over all metadata, loading batch_size rows at a time.
+
+        """
+
+        return filter_instance_metadata(
+            session, filter_key, filter_value
+        ).options(
+            joinedload(InstanceMetadata.instance)
+        ).yield_per(batch_size)
+
     def delete(self, session: Session, *, filter_key: Optional[str] = None,
                filter_value: Optional[str] = None) -> None:
         """Delete metadata based on query"""
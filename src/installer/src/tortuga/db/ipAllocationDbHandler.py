@@ -0,0 +1,443 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+import re
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.session import Session
+
+from tortuga.db.tortugaDbObjectHandler import TortugaDbObjectHandler
+from tortuga.exceptions.invalidArgument import InvalidArgument
+
+from .models.network import Network
+from .models.networkIpAllocation import NetworkIpAllocation
+from .models.nic import Nic
+
+
+#
+# Matches a byte of the bitmap with at least one free slot
+#
+FREE_SLOT_BYTE = re.compile(b'[^\xff]')
+
+#
+# The number of free slots checked against the nics table at a time
+#
+VERIFY_BATCH_SIZE = 256
+
+
+class _AllocationState:
+    """
+    The state of an allocation that has been locked by a transaction.
+
+    """
+    def __init__(self, transaction, allocation: NetworkIpAllocation,
+                 bits: bytearray):
+        self.transaction = transaction
+        self.allocation = allocation
+        self.bits = bits
+
+        #
+        # Slots reserved by this transaction, which may not have been
+        # flushed to the nics table yet
+        #
+        self.reserved: Set[int] = set()
+
+        #
+        # Free slots that have been checked against the nics table
+        #
+        self.verified: Set[int] = set()
+
+
+class IpAllocationDbHandler(TortugaDbObjectHandler):
+    """
+    This class handles the network_ip_allocations table.
+
+    Each network has a bitmap of its assignable addresses, and a cursor to
+    the slot after the most recently allocated address, so that allocating
+    an address does not depend on the number of addresses already in use.
+    The allocation row is locked for the rest of the transaction when it is
+    first used, and reservations are committed or rolled back along with
+    the nics they are made for.
+
+    The bitmap is rebuilt from the nics table when it is first created,
+    when the address range of the network changes, and when the cursor has
+    wrapped around without finding a free slot, which reclaims addresses
+    that have been released outside of this handler.
+
+    """
+    def allocate(self, session: Session, network: Network) -> str:
+        """
+        Reserves the next free IP address on a network.
+
+        :param Session session: the database session
+        :param Network network: the network
+
+        :return str: the IP address
+
+        Raises:
+            InvalidArgument
+
+        """
+        state = self._get_state(session, network)
+        allocation = state.allocation
+
+        slot = find_free_slot(state.bits, allocation.size, allocation.cursor)
+        rebuilt = False
+
+        while True:
+            if slot is None:
+                if rebuilt:
+                    raise InvalidArgument('IP address space exhausted')
+
+                self._rebuild(session, network, state)
+                rebuilt = True
+
+                slot = find_free_slot(state.bits, allocation.size,
+                                      allocation.cursor)
+
+                continue
+
+            #
+            # Addresses can be assigned to nics without going through
+            # this handler, so make sure the address is really free
+            #
+            if slot not in state.verified:
+                self._verify(session, network, state, slot)
+
+            if slot in state.verified:
+                break
+
+            slot = find_free_slot(state.bits, allocation.size, slot)
+
+        state.verified.discard(slot)
+        state.reserved.add(slot)
+        set_slot(state.bits, slot)
+
+        allocation.cursor = (slot + 1) % allocation.size
+        allocation.bitmap = bytes(state.bits)
+
+        return get_slot_ip(allocation, slot)
+
+    def reserve(self, session: Session, network: Network, ip: str) -> None:
+        """
+        Reserves a specific IP address on a network. Addresses outside of
+        the assignable range of the network are ignored.
+
+        :param Session session: the database session
+        :param Network network: the network
+        :param str ip:          the IP address
+
+        """
+        self._set_ip(session, network, ip, True)
+
+    def release(self, session: Session, network: Network, ip: str) -> None:
+        """
+        Releases an IP address on a network, so that it can be allocated
+        again once the cursor wraps around.
+
+        :param Session session: the database session
+        :param Network network: the network
+        :param str ip:          the IP address
+
+        """
+        self._set_ip(session, network, ip, False)
+
+    def _set_ip(self, session: Session, network: Network, ip: str,
+                used: bool) -> None:
+        if network is None or network.usingDhcp or not ip:
+            return
+
+        state = self._get_state(session, network)
+
+        slot = get_ip_slot(state.allocation, ip)
+        if slot is None:
+            return
+
+        state.verified.discard(slot)
+
+        if used:
+            state.reserved.add(slot)
+            set_slot(state.bits, slot)
+        else:
+            state.reserved.discard(slot)
+            clear_slot(state.bits, slot)
+
+        state.allocation.bitmap = bytes(state.bits)
+
+    def _get_state(self, session: Session,
+                   network: Network) -> _AllocationState:
+        """
+        Gets the allocation for a network, locking it the first time it is
+        used in a transaction, and creating or rebuilding it as required.
+
+        Raises:
+            InvalidArgument
+
+        """
+        states: Dict[int, _AllocationState] = \
+            session.info.setdefault('ip_allocations', {})
+
+        state = states.get(network.id)
+        if state is not None and state.transaction is session.transaction:
+            return state
+
+        start_ip, increment, size = get_address_range(network)
+
+        allocation = self._lock(session, network)
+        if allocation is None:
+            state = self._create(session, network)
+
+        elif (allocation.start_ip, allocation.increment,
+              allocation.size) == (start_ip, increment, size):
+            state = _AllocationState(session.transaction, allocation,
+                                     bytearray(allocation.bitmap))
+
+        else:
+            state = self._reset(session, network, allocation)
+
+        states[network.id] = state
+
+        return state
+
+    def _lock(self, session: Session,
+              network: Network) -> Optional[NetworkIpAllocation]:
+        """
+        Locks the allocation for a network, if it exists.
+
+        """
+        query = session.query(NetworkIpAllocation).filter(
+            NetworkIpAllocation.network_id == network.id)
+
+        #
+        # Updating the row locks it, unlike SELECT ... FOR UPDATE, which
+        # is ignored by SQLite
+        #
+        if not query.update(
+                {NetworkIpAllocation.cursor: NetworkIpAllocation.cursor},
+                synchronize_session=False):
+            return None
+
+        return query.populate_existing().one()
+
+    def _create(self, session: Session,
+                network: Network) -> _AllocationState:
+        """
+        Creates the allocation for a network from the nics table.
+
+        """
+        allocation = NetworkIpAllocation(network_id=network.id)
+
+        #
+        # The allocation is only added once complete, as rebuilding
+        # flushes the session
+        #
+        state = self._reset(session, network, allocation)
+
+        try:
+            with session.begin_nested():
+                session.add(allocation)
+        except IntegrityError:
+            # Created by a concurrent transaction
+            return self._get_state(session, network)
+
+        return state
+
+    def _reset(self, session: Session, network: Network,
+               allocation: NetworkIpAllocation) -> _AllocationState:
+        """
+        Resets an allocation to the current address range of its network,
+        and rebuilds it.
+
+        """
+        allocation.start_ip, allocation.increment, allocation.size = \
+            get_address_range(network)
+        allocation.cursor = 0
+
+        state = _AllocationState(session.transaction, allocation,
+                                 bytearray())
+        self._rebuild(session, network, state)
+
+        return state
+
+    def _rebuild(self, session: Session, network: Network,
+                 state: _AllocationState) -> None:
+        """
+        Rebuilds the bitmap of an allocation from the nics table, and the
+        reservations made by the current transaction.
+
+        """
+        self._logger.debug(
+            'Rebuilding IP address allocation for network [%s/%s]',
+            network.address, network.netmask)
+
+        allocation = state.allocation
+        bits = bytearray((allocation.size + 7) // 8)
+
+        #
+        # Padding bits at the end of the last byte are never free
+        #
+        for slot in range(allocation.size, len(bits) * 8):
+            set_slot(bits, slot)
+
+        for ip, in session.query(Nic.ip).filter(
+                Nic.networkId == network.id, Nic.ip.isnot(None)):
+            slot = get_ip_slot(allocation, ip)
+            if slot is not None:
+                set_slot(bits, slot)
+
+        for slot in state.reserved:
+            set_slot(bits, slot)
+
+        state.bits = bits
+        state.verified.clear()
+        allocation.bitmap = bytes(bits)
+
+    def _verify(self, session: Session, network: Network,
+                state: _AllocationState, slot: int) -> None:
+        """
+        Checks a batch of free slots, starting at slot, against the nics
+        table. Slots that are in use are marked as such, and the others
+        are marked as verified.
+
+        """
+        allocation = state.allocation
+
+        ips: Dict[str, int] = {}
+        while slot is not None and len(ips) < VERIFY_BATCH_SIZE:
+            ip = get_slot_ip(allocation, slot)
+            if ip in ips:
+                # Wrapped around to the first slot of the batch
+                break
+
+            ips[ip] = slot
+            slot = find_free_slot(state.bits, allocation.size,
+                                  (slot + 1) % allocation.size)
+
+        with session.no_autoflush:
+            used_ips = [ip for ip, in session.query(Nic.ip).filter(
+                Nic.networkId == network.id,
+                Nic.ip.in_(list(ips.keys()))
+            )]
+
+        for ip in used_ips:
+            set_slot(state.bits, ips.pop(ip))
+
+        state.verified.update(ips.values())
+
+
+def get_address_range(network: Network) -> Tuple[str, int, int]:
+    """
+    Gets the assignable address range of a network, as a tuple of the
+    first address, the increment between addresses, and the number of
+    addresses.
+
+    Raises:
+        InvalidArgument
+
+    """
+    n = ipaddress.IPv4Network(
+        '{}/{}'.format(network.address, network.netmask))
+
+    if network.startIp:
+        start = ipaddress.IPv4Address(str(network.startIp))
+    else:
+        # Assume the starting IP address is the first IP address in the
+        # subnet
+        try:
+            start = n[1]
+        except IndexError:
+            raise InvalidArgument('IP address space exhausted')
+
+    increment = int(network.increment) if network.increment else 1
+
+    end = int(n.broadcast_address)
+    if int(start) >= end:
+        raise InvalidArgument('IP address space exhausted')
+
+    size = (end - int(start) - 1) // increment + 1
+
+    return start.exploded, increment, size
+
+
+def get_slot_ip(allocation: NetworkIpAllocation, slot: int) -> str:
+    return (ipaddress.IPv4Address(allocation.start_ip) +
+            slot * allocation.increment).exploded
+
+
+def get_ip_slot(allocation: NetworkIpAllocation, ip: str) -> Optional[int]:
+    try:
+        offset = int(ipaddress.IPv4Address(str(ip))) - \
+            int(ipaddress.IPv4Address(allocation.start_ip))
+    except ipaddress.AddressValueError:
+        return None
+
+    slot, remainder = divmod(offset, allocation.increment)
+    if remainder or not 0 <= slot < allocation.size:
+        return None
+
+    return slot
+
+
+def set_slot(bits: bytearray, slot: int) -> None:
+    bits[slot // 8] |= 1 << (slot % 8)
+
+
+def clear_slot(bits: bytearray, slot: int) -> None:
+    bits[slot // 8] &= ~(1 << (slot % 8)) & 0xff
+
+
+def find_free_slot(bits: bytearray, size: int,
+                   start: int) -> Optional[int]:
+    """
+    Finds the first free slot at or after start, wrapping around to the
+    beginning of the bitmap.
+
+    """
+    for low, high in ((start, size), (0, start)):
+        slot = _find_free_slot_in_range(bits, low, high)
+        if slot is not None:
+            return slot
+
+    return None
+
+
+def _find_free_slot_in_range(bits: bytearray, low: int,
+                             high: int) -> Optional[int]:
+    slot = low
+
+    #
+    # Check slots one at a time up to a byte boundary, then skip over
+    # full bytes
+    #
+    while slot < high and slot % 8:
+        if not bits[slot // 8] & (1 << (slot % 8)):
+            return slot
+        slot += 1
+
+    if slot >= high:
+        return None
+
+    match = FREE_SLOT_BYTE.search(bits, slot // 8)
+    if match is None:
+        return None
+
+    byte = bits[match.start()]
+    for bit in range(8):
+        if not byte & (1 << bit):
+            slot = match.start() * 8 + bit
+            return slot if slot < high else None
+
+    return None
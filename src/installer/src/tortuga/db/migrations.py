@@ -0,0 +1,167 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Schema changes for databases created by earlier releases.
+
+create_all() only creates missing tables, so columns and indexes added to
+existing tables are applied here. Every migration must be safe to run
+against a database that is already up to date.
+
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from tortuga.exceptions.dbError import DbError
+from tortuga.logging import DATABASE_NAMESPACE
+from .models.base import ModelBase
+from .models.nic import Nic
+from .models.node import Node
+
+
+logger = logging.getLogger(DATABASE_NAMESPACE)
+
+
+def migrate_node_indexes(engine: Engine):
+    """
+    Adds the normalized lowercase name column to the nodes table, and the
+    indexes used for node lookups.
+
+    :param Engine engine: the database engine
+
+    """
+    inspector = inspect(engine)
+
+    columns = [column['name'] for column in inspector.get_columns('nodes')]
+    if 'name_lower' not in columns:
+        logger.info('Adding column nodes.name_lower')
+        engine.execute(text(
+            'ALTER TABLE nodes ADD COLUMN name_lower VARCHAR(255)'))
+
+    engine.execute(text(
+        'UPDATE nodes SET name_lower = lower(name)'
+        ' WHERE name_lower IS NULL'))
+
+    indexes = [index['name'] for index in inspector.get_indexes('nodes')]
+    if 'ix_nodes_name_lower' not in indexes:
+        check_node_name_collisions(engine)
+
+    create_missing_indexes(engine, Node.__table__)
+
+
+def check_node_name_collisions(engine: Engine):
+    """
+    Checks that no node names differ only by case, which the unique index
+    on nodes.name_lower does not allow.
+
+    :param Engine engine: the database engine
+
+    :raises DbError: if any node names collide
+
+    """
+    names = [
+        row[0] for row in engine.execute(text(
+            'SELECT name FROM nodes WHERE name_lower IN ('
+            ' SELECT name_lower FROM nodes GROUP BY name_lower'
+            ' HAVING COUNT(*) > 1) ORDER BY name_lower, name'))
+    ]
+    if names:
+        raise DbError(
+            'Node names must be unique regardless of case, rename or'
+            ' delete the nodes that collide, then try again: {}'.format(
+                ', '.join(names)))
+
+
+def migrate_nic_indexes(engine: Engine):
+    """
+    Adds the indexes used to look up IP addresses on a network, and MAC
+    addresses.
+
+    :param Engine engine: the database engine
+
+    """
+    create_missing_indexes(engine, Nic.__table__)
+
+
+def create_missing_indexes(engine: Engine, table):
+    """
+    Creates the indexes defined on a table that do not exist in the
+    database. Tables that do not exist are skipped.
+
+    :param Engine engine: the database engine
+    :param Table table:   the table
+
+    """
+    if not engine.has_table(table.name):
+        return
+
+    inspector = inspect(engine)
+
+    indexes = [index['name'] for index in inspector.get_indexes(table.name)]
+    for index in table.indexes:
+        if index.name not in indexes:
+            logger.info('Creating index {}'.format(index.name))
+            index.create(engine)
+
+
+MIGRATIONS = [
+    migrate_node_indexes,
+    migrate_nic_indexes,
+]
+
+
+def migrate_database(engine: Engine):
+    """
+    Applies all migrations to a database.
+
+    :param Engine engine: the database engine
+
+    """
+    for migration in MIGRATIONS:
+        migration(engine)
+
+
+def upgrade_database(engine: Engine):
+    """
+    Brings a database created by an earlier release up to date, by
+    creating missing tables, and applying all migrations. Databases that
+    have not been initialized yet are left to init_database().
+
+    Processes sharing the database may upgrade it at the same time, so if
+    a schema change fails, the upgrade is run once more, and skips the
+    changes made by the other process.
+
+    :param Engine engine: the database engine
+
+    """
+    if not engine.has_table(Node.__tablename__):
+        return
+
+    for attempt in range(2):
+        try:
+            ModelBase.metadata.create_all(engine)
+            migrate_database(engine)
+
+            return
+
+        except DBAPIError as ex:
+            if attempt:
+                raise
+
+            logger.info(
+                'Database upgrade failed, retrying: {}'.format(ex))
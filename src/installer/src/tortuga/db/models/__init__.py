@@ -21,6 +21,7 @@ from . import osComponent  # noqa
 from . import osFamilyComponent  # noqa
 from . import component  # noqa
 from . import network  # noqa
+from . import networkIpAllocation  # noqa
 from . import kit  # noqa
 from . import kitSource  # noqa
 from . import softwareProfileKitSource  # noqa
@@ -34,6 +35,7 @@ from . import softwareUsesHardware  # noqa
 from . import globalParameter  # noqa
 from . import nic  # noqa
 from . import node  # noqa
+from . import nodeNameCounter  # noqa
 from . import hardwareProfile  # noqa
 from . import partition  # noqa
 from . import softwareProfile  # noqa
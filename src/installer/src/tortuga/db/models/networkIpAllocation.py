@@ -0,0 +1,48 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+
+from sqlalchemy import Column, ForeignKey, Integer, LargeBinary, String
+from sqlalchemy.orm import backref, relationship
+
+from .base import ModelBase
+
+
+class NetworkIpAllocation(ModelBase):
+    """
+    IP address allocation bitmap for a network. Bit n is set when the n-th
+    assignable address (startIp + n * increment) is in use.
+
+    """
+    __tablename__ = 'network_ip_allocations'
+
+    id = Column(Integer, primary_key=True)
+    network_id = Column(Integer, ForeignKey('networks.id'), nullable=False,
+                        unique=True)
+    start_ip = Column(String(45), nullable=False)
+    increment = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    cursor = Column(Integer, nullable=False, default=0)
+    bitmap = Column(LargeBinary, nullable=False)
+
+    network = relationship(
+        'Network',
+        backref=backref('ip_allocation', uselist=False,
+                        cascade='all,delete-orphan')
+    )
+
+    def __repr__(self):
+        return 'NetworkIpAllocation(network_id={}, start_ip={})'.format(
+            self.network_id, self.start_ip)
@@ -14,7 +14,7 @@
 
 # pylint: disable=too-few-public-methods
 
-from sqlalchemy import (Boolean, Column, ForeignKey, Integer, String,
+from sqlalchemy import (Boolean, Column, ForeignKey, Index, Integer, String,
                         UniqueConstraint)
 from sqlalchemy.ext.indexable import index_property
 from sqlalchemy.orm import relationship
@@ -27,6 +27,10 @@ class Nic(ModelBase):
     __table_args = {
         UniqueConstraint('mac', 'ip'),
     }
+    __table_args__ = (
+        Index('ix_nics_networkId_ip', 'networkId', 'ip'),
+        Index('ix_nics_mac', 'mac'),
+    )
 
     id = Column(Integer, primary_key=True)
     nodeId = Column(Integer, ForeignKey('nodes.id'), nullable=False)
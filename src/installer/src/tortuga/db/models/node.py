@@ -14,18 +14,26 @@
 
 # pylint: disable=too-few-public-methods
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
-from sqlalchemy.ext.indexable import index_property
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import relationship, validates
 
 from .base import ModelBase
 
 
 class Node(ModelBase):
     __tablename__ = 'nodes'
+    __table_args__ = (
+        Index('ix_nodes_name_lower', 'name_lower', unique=True),
+        Index('ix_nodes_state_softwareProfileId', 'state',
+              'softwareProfileId'),
+        Index('ix_nodes_softwareProfileId', 'softwareProfileId'),
+        Index('ix_nodes_hardwareProfileId', 'hardwareProfileId'),
+        Index('ix_nodes_addHostSession', 'addHostSession'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), unique=True, nullable=False)
+    name_lower = Column(String(255))
     public_hostname = Column(String(255), unique=True, nullable=True)
     state = Column(String(255), default='Discovered')
     bootFrom = Column(Integer, default=0)
@@ -39,13 +47,6 @@ class Node(ModelBase):
     addHostSession = Column(String(36))
     vcpus = Column(Integer)
 
-    nodes_softwareProfileId = index_property(
-        'softwareProfilesId', 'Nodes_softwareProfileId')
-    nodes_hardwareProfileId = index_property(
-        'hardwareProfilesId', 'Nodes_hardwareProfilesId')
-    nodes_addHostSession = index_property(
-        'addHostSession', 'Nodes_addHostSession')
-
     nics = relationship('Nic', backref='node', lazy=False,
                         cascade='all, delete-orphan')
 
@@ -55,5 +56,17 @@ class Node(ModelBase):
         'InstanceMapping', uselist=False, back_populates='node',
         cascade='all,delete-orphan')
 
+    #
+    # Bulk updates and inserts (Query.update(), Session.bulk_*() and Core
+    # statements) bypass this, so they must also set 'name_lower' whenever
+    # they set 'name'.
+    #
+    @validates('name')
+    def normalize(self, key, value): \
+            # pylint: disable=unused-argument
+        """Keep 'name_lower' in sync with 'name', for indexed lookups."""
+        self.name_lower = value.lower() if value is not None else None
+        return value
+
     def __repr__(self):
         return 'Node(name={})'.format(self.name)
@@ -0,0 +1,58 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=too-few-public-methods
+
+from sqlalchemy import (Boolean, Column, ForeignKey, Integer, String,
+                        UniqueConstraint)
+from sqlalchemy.orm import relationship
+
+from .base import ModelBase
+
+
+class NodeNameCounter(ModelBase):
+    """
+    Node name slot counter for a name format. Slots below next_slot are
+    in use, unless they are in the free list.
+
+    """
+    __tablename__ = 'node_name_counters'
+    __table_args__ = (
+        UniqueConstraint('name_format', 'randomized'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name_format = Column(String(255), nullable=False)
+    randomized = Column(Boolean, nullable=False, default=False)
+    next_slot = Column(Integer, nullable=False, default=1)
+
+    free_slots = relationship('NodeNameFreeSlot', backref='counter',
+                              cascade='all,delete-orphan')
+
+    def __repr__(self):
+        return 'NodeNameCounter(name_format={}, next_slot={})'.format(
+            self.name_format, self.next_slot)
+
+
+class NodeNameFreeSlot(ModelBase):
+    """
+    A slot below the next_slot of a node name counter that is free to be
+    reused.
+
+    """
+    __tablename__ = 'node_name_free_slots'
+
+    counter_id = Column(Integer, ForeignKey('node_name_counters.id'),
+                        primary_key=True)
+    slot = Column(Integer, primary_key=True, autoincrement=False)
@@ -14,6 +14,8 @@
 
 # pylint: disable=not-callable,multiple-statements,no-member,no-self-use
 
+from typing import List, Optional, Tuple
+
 from sqlalchemy.orm.exc import NoResultFound
 
 from tortuga.db.networkDevicesDbHandler import NetworkDevicesDbHandler
@@ -23,6 +25,13 @@ from tortuga.exceptions.nicNotFound import NicNotFound
 from .models.nic import Nic
 
 
+#
+# The number of MAC addresses looked up per query, which keeps the number
+# of bound parameters within the limits of all supported databases
+#
+MAC_QUERY_CHUNK_SIZE = 500
+
+
 class NicsDbHandler(TortugaDbObjectHandler):
     """
     This class handles nics table.
@@ -49,6 +58,25 @@ class NicsDbHandler(TortugaDbObjectHandler):
             raise NicNotFound(
                 'NIC with MAC address [%s] not found.' % (mac))
 
+    def getNetworkIdsByMac(self, session, macs: List[str]) \
+            -> List[Tuple[str, Optional[int]]]:
+        """
+        Return the MAC address and network id of all nics with any of the
+        given MAC addresses.
+        """
+
+        macs = sorted(set(macs))
+
+        result = []
+
+        for offset in range(0, len(macs), MAC_QUERY_CHUNK_SIZE):
+            result.extend(
+                session.query(Nic.mac, Nic.networkId).filter(
+                    Nic.mac.in_(macs[offset:offset + MAC_QUERY_CHUNK_SIZE]))
+            )
+
+        return result
+
     def getNicById(self, session, _id):
         """
         Return nic.
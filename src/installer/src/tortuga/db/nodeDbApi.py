@@ -12,10 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
+from sqlalchemy import inspect
+from sqlalchemy.orm import lazyload, selectinload
 from sqlalchemy.orm.session import Session
 from tortuga.config.configManager import getfqdn
+from tortuga.exceptions.invalidDbRelation import InvalidDbRelation
 from tortuga.exceptions.tortugaException import TortugaException
 from tortuga.node import state
 from tortuga.objects.node import Node
@@ -24,6 +27,7 @@ from tortuga.objects.provisioningInfo import ProvisioningInfo
 from tortuga.objects.tortugaObject import TortugaObjectList
 
 from .globalParameterDbApi import GlobalParameterDbApi
+from .models.hardwareProfile import HardwareProfile
 from .models.node import Node as NodeModel
 from .models.nodeTag import NodeTag
 from .nodesDbHandler import NodesDbHandler
@@ -62,7 +66,8 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
 
         try:
             return self.__convert_nodes_to_TortugaObjectList(
-                [self._nodesDbHandler.getNode(session, name)],
+                [self._nodesDbHandler.getNode(
+                    session, name, options=get_load_options(optionDict))],
                 optionDict=optionDict)[0]
         except TortugaException:
             raise
@@ -80,7 +85,9 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
         try:
             return self.__convert_nodes_to_TortugaObjectList(
                 self._nodesDbHandler.getNodesByAddHostSession(
-                    session, ahSession), optionDict=optionDict)
+                    session, ahSession,
+                    options=get_load_options(optionDict)),
+                optionDict=optionDict)
         except TortugaException:
             raise
         except Exception as ex:
@@ -101,7 +108,8 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
                 self._nodesDbHandler.expand_nodespec(
                     session,
                     nodespec,
-                    include_installer=include_installer),
+                    include_installer=include_installer,
+                    options=get_load_options(optionDict)),
                 optionDict=optionDict)
         except Exception as ex:
             if not isinstance(ex, TortugaException):
@@ -146,7 +154,8 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
         try:
             return self.__convert_nodes_to_TortugaObjectList(
                 [self._nodesDbHandler.getNodeById(
-                    session, nodeId)], optionDict=optionDict)[0]
+                    session, nodeId, options=get_load_options(optionDict))],
+                optionDict=optionDict)[0]
         except TortugaException:
             raise
         except Exception as ex:
@@ -162,7 +171,8 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
         try:
             return self.__convert_nodes_to_TortugaObjectList(
                 [self._nodesDbHandler.getNodeByIp(
-                    session, ip)], optionDict=optionDict)[0]
+                    session, ip, options=get_load_options(optionDict))],
+                optionDict=optionDict)[0]
         except TortugaException:
             raise
         except Exception as ex:
@@ -175,30 +185,40 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
         """
         Return TortugaObjectList of nodes with relations populated
 
+        Relations are normally loaded by the query that returned the nodes,
+        using the options from get_load_options(). Nodes that were already
+        in the session when that query ran may still be missing relations,
+        so those are loaded here.
+
         :param nodes:      list of Node objects
         :param optionDict:
-        :param deleting:   whether or not to include nodes in the deleting
-                           state
 
         :return: TortugaObjectList
 
         """
         nodeList = TortugaObjectList()
 
+        relations = get_requested_relations(optionDict)
+
         for node in nodes:
-            self.loadRelations(node, optionDict)
+            unloaded = inspect(node).unloaded
+            for relation in relations:
+                if relation in unloaded:
+                    getattr(node, relation)
 
-            # ensure 'resourceadapter' relation is always loaded. This one
-            # is special since it's a relationship inside of a relationship.
-            # It needs to be explicitly defined.
-            self.loadRelation(node.hardwareprofile, 'resourceadapter')
+            if 'hardwareprofile' in relations and node.hardwareprofile:
+                if 'resourceadapter' in inspect(
+                        node.hardwareprofile).unloaded:
+                    getattr(node.hardwareprofile, 'resourceadapter')
 
             nodeList.append(Node.getFromDbDict(node.__dict__))
 
         return nodeList
 
     def getNodeList(self, session, tags: Optional[Tags] = None,
-                    optionDict: OptionsDict = None) -> TortugaObjectList:
+                    optionDict: OptionsDict = None,
+                    limit: Optional[int] = None,
+                    after: Optional[int] = None) -> TortugaObjectList:
         """
         Get list of all available nodes from the db.
 
@@ -210,7 +230,9 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
 
         try:
             return self.__convert_nodes_to_TortugaObjectList(
-                self._nodesDbHandler.getNodeList(session, tags=tags),
+                self._nodesDbHandler.getNodeList(
+                    session, tags=tags, limit=limit, after=after,
+                    options=get_load_options(optionDict)),
                 optionDict=optionDict
             )
         except TortugaException:
@@ -293,9 +315,72 @@ class NodeDbApi(TagsDbApiMixin, TortugaDbApi):
         try:
             return self.__convert_nodes_to_TortugaObjectList(
                 self._nodesDbHandler.getNodesByNodeState(
-                    session, node_state), optionDict=optionDict)
+                    session, node_state,
+                    options=get_load_options(optionDict)),
+                optionDict=optionDict)
         except TortugaException:
             raise
         except Exception as ex:
             self._logger.exception(str(ex))
             raise
+
+
+def get_requested_relations(optionDict: Optional[OptionsDict]) \
+        -> List[str]:
+    """
+    Gets the names of the node relations requested in an option dict. The
+    hardware profile is always requested, unless it is explicitly excluded,
+    as its resource adapter is always required.
+
+    Raises:
+        InvalidDbRelation
+
+    """
+    relations = [] if optionDict is None else \
+        [relation for relation, load in optionDict.items() if load]
+
+    for relation in relations:
+        if not hasattr(NodeModel, relation):
+            raise InvalidDbRelation(
+                'Relation {} not valid for class {}'.format(
+                    relation, NodeModel.__name__))
+
+    if (optionDict is None or optionDict.get('hardwareprofile', True)) and \
+            'hardwareprofile' not in relations:
+        relations.append('hardwareprofile')
+
+    return [relation for relation in relations
+            if relation in inspect(NodeModel).relationships]
+
+
+def get_load_options(optionDict: Optional[OptionsDict]) -> List[Any]:
+    """
+    Gets the query loader options for the node relations in an option
+    dict. Requested relations are loaded for all nodes returned by a query
+    in a single SELECT per relation, rather than one SELECT per relation
+    per node. Relations that are explicitly excluded are not loaded, even
+    if they are normally loaded eagerly.
+
+    Raises:
+        InvalidDbRelation
+
+    """
+    options = []
+
+    for relation in get_requested_relations(optionDict):
+        option = selectinload(getattr(NodeModel, relation))
+
+        if relation == 'hardwareprofile':
+            option = option.selectinload(HardwareProfile.resourceadapter)
+
+        options.append(option)
+
+    if optionDict:
+        options.extend([
+            lazyload(getattr(NodeModel, relation))
+            for relation, load in optionDict.items()
+            if load is False and
+            relation in inspect(NodeModel).relationships
+        ])
+
+    return options
@@ -0,0 +1,460 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import heapq
+import re
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.session import Session
+
+from tortuga.db.tortugaDbObjectHandler import TortugaDbObjectHandler
+from tortuga.exceptions.invalidArgument import InvalidArgument
+
+from .models.node import Node
+from .models.nodeNameCounter import NodeNameCounter, NodeNameFreeSlot
+
+
+#
+# Matches the node number specifier in a name format
+#
+NODE_NUMBER_SPECIFIER = re.compile(r'#N+')
+
+#
+# The number of slots above the counter checked against the nodes table at
+# a time
+#
+VERIFY_BATCH_SIZE = 256
+
+
+class _CounterState:
+    """
+    The state of a counter that has been locked by a transaction.
+
+    """
+    def __init__(self, transaction, counter: NodeNameCounter):
+        self.transaction = transaction
+        self.counter = counter
+
+        #
+        # Free slots, and a heap of the same slots so that the lowest one
+        # is reused first
+        #
+        self.free: Dict[int, NodeNameFreeSlot] = {}
+        self.heap: List[int] = []
+
+        #
+        # Slots reserved by this transaction, which may not have been
+        # flushed to the nodes table yet
+        #
+        self.reserved: Set[int] = set()
+
+        #
+        # Slots from next_slot up to verified_until have been checked
+        # against the nodes table, and those in used were found in use
+        #
+        self.verified_until = 0
+        self.used: Set[int] = set()
+
+
+class NodeNameDbHandler(TortugaDbObjectHandler):
+    """
+    This class handles the node_name_counters table.
+
+    Each name format has a counter of the next unused slot (the number
+    substituted for '#N'), and a free list of the slots released below it,
+    so that generating a name does not depend on the number of nodes
+    already named. The counter row is locked for the rest of the
+    transaction when it is first used, so that concurrent transactions
+    cannot generate the same name.
+
+    Counters are built from the nodes table when they are first created,
+    and rebuilt when the slots of a name format are exhausted, which
+    reclaims the names of nodes that have been deleted outside of this
+    handler.
+
+    """
+    def allocate(self, session: Session, name_format: str,
+                 randomized: bool = False) -> str:
+        """
+        Reserves the lowest free host name of a name format.
+
+        :param Session session:  the database session
+        :param str name_format:  the name format, with the rack number
+                                 already substituted
+        :param bool randomized:  True if a random suffix is added to names
+                                 generated from the name format
+
+        :return str: the host name, without random suffix or DNS zone
+
+        Raises:
+            InvalidArgument
+
+        """
+        max_slot = get_max_slot(name_format)
+
+        state = self._get_state(session, name_format, randomized)
+        rebuilt = False
+
+        while True:
+            reused = bool(state.heap)
+
+            slot = self._pop_slot(session, state, max_slot)
+
+            if slot is None:
+                if rebuilt:
+                    raise InvalidArgument(
+                        'Unable to generate unique host name')
+
+                self._rebuild(session, state)
+                rebuilt = True
+
+                continue
+
+            state.reserved.add(slot)
+
+            #
+            # Nodes can be named without going through this handler, so
+            # make sure the name is really free
+            #
+            name = format_name(name_format, slot)
+
+            if reused:
+                if not self._is_used(session, name, randomized):
+                    return name
+            else:
+                if slot >= state.verified_until:
+                    self._verify(session, state, slot, max_slot)
+
+                if slot not in state.used:
+                    return name
+
+    def release(self, session: Session, name: str) -> None:
+        """
+        Releases a node name, so that it can be generated again. Names
+        that were not generated from a name format are ignored.
+
+        :param Session session: the database session
+        :param str name:        the node name
+
+        """
+        if not name:
+            return
+
+        for name_format, randomized in self._get_name_formats(session):
+            slot = get_name_slot(name_format, randomized, name)
+            if slot is None:
+                continue
+
+            state = self._get_state(session, name_format, randomized)
+
+            state.reserved.discard(slot)
+
+            if slot < state.counter.next_slot:
+                self._push_slot(session, state, slot)
+
+    def _get_name_formats(self, session: Session) \
+            -> List[Tuple[str, bool]]: \
+            # pylint: disable=no-self-use
+        """
+        Gets the name formats of all counters, once per transaction.
+
+        """
+        name_formats = session.info.get('node_name_formats')
+        if name_formats is not None and \
+                name_formats[0] is session.transaction:
+            return name_formats[1]
+
+        with session.no_autoflush:
+            result = session.query(NodeNameCounter.name_format,
+                                   NodeNameCounter.randomized).all()
+
+        session.info['node_name_formats'] = (session.transaction, result)
+
+        return result
+
+    def _get_state(self, session: Session, name_format: str,
+                   randomized: bool) -> _CounterState:
+        """
+        Gets the counter for a name format, locking it the first time it
+        is used in a transaction, and creating it as required.
+
+        """
+        states: Dict[Tuple[str, bool], _CounterState] = \
+            session.info.setdefault('node_name_counters', {})
+
+        state = states.get((name_format, randomized))
+        if state is not None and state.transaction is session.transaction:
+            return state
+
+        counter = self._lock(session, name_format, randomized)
+        if counter is not None:
+            state = _CounterState(session.transaction, counter)
+
+            for free_slot in session.query(NodeNameFreeSlot).filter(
+                    NodeNameFreeSlot.counter_id == counter.id):
+                state.free[free_slot.slot] = free_slot
+
+            state.heap = list(state.free.keys())
+            heapq.heapify(state.heap)
+        else:
+            state = self._create(session, name_format, randomized)
+
+        states[(name_format, randomized)] = state
+
+        return state
+
+    def _lock(self, session: Session, name_format: str,
+              randomized: bool) -> Optional[NodeNameCounter]:
+        """
+        Locks the counter for a name format, if it exists.
+
+        """
+        query = session.query(NodeNameCounter).filter(
+            NodeNameCounter.name_format == name_format,
+            NodeNameCounter.randomized == randomized)
+
+        #
+        # Updating the row locks it, unlike SELECT ... FOR UPDATE, which
+        # is ignored by SQLite
+        #
+        if not query.update(
+                {NodeNameCounter.next_slot: NodeNameCounter.next_slot},
+                synchronize_session=False):
+            return None
+
+        return query.populate_existing().one()
+
+    def _create(self, session: Session, name_format: str,
+                randomized: bool) -> _CounterState:
+        """
+        Creates the counter for a name format from the nodes table.
+
+        """
+        counter = NodeNameCounter(name_format=name_format,
+                                  randomized=randomized,
+                                  next_slot=1)
+
+        session.info.pop('node_name_formats', None)
+
+        try:
+            with session.begin_nested():
+                session.add(counter)
+        except IntegrityError:
+            # Created by a concurrent transaction
+            return self._get_state(session, name_format, randomized)
+
+        state = _CounterState(session.transaction, counter)
+
+        self._rebuild(session, state)
+
+        return state
+
+    def _rebuild(self, session: Session, state: _CounterState) -> None:
+        """
+        Rebuilds a counter from the nodes table, and the reservations
+        made by the current transaction.
+
+        """
+        counter = state.counter
+
+        self._logger.debug(
+            'Rebuilding node name counter for name format [%s]',
+            counter.name_format)
+
+        used = set(state.reserved)
+
+        name_filter = NODE_NUMBER_SPECIFIER.sub(
+            lambda match: '_' * (len(match.group(0)) - 1),
+            counter.name_format, count=1).lower()
+
+        with session.no_autoflush:
+            for name, in session.query(Node.name).filter(
+                    Node.name_lower.like(name_filter + '%')):
+                slot = get_name_slot(counter.name_format,
+                                     counter.randomized, name)
+                if slot is not None:
+                    used.add(slot)
+
+        for slot in list(state.free.keys()):
+            self._pop_free_slot(session, state, slot)
+
+        state.heap.clear()
+        state.verified_until = 0
+        state.used.clear()
+
+        counter.next_slot = max(used) + 1 if used else 1
+
+        for slot in range(1, counter.next_slot):
+            if slot not in used:
+                self._push_slot(session, state, slot)
+
+    def _verify(self, session: Session, state: _CounterState, slot: int,
+                max_slot: int) -> None:
+        """
+        Checks a batch of slots above the counter, starting at slot,
+        against the nodes table.
+
+        """
+        counter = state.counter
+
+        last_slot = min(slot + VERIFY_BATCH_SIZE, max_slot + 1) - 1
+
+        #
+        # Slots are zero padded, so the names of the batch, with or without
+        # a DNS zone or random suffix, sort between the names of its first
+        # and last slots
+        #
+        with session.no_autoflush:
+            names = session.query(Node.name).filter(
+                Node.name_lower >= format_name(
+                    counter.name_format, slot).lower(),
+                Node.name_lower < format_name(
+                    counter.name_format, last_slot).lower() + '/')
+
+            state.used = set()
+
+            for name, in names:
+                used_slot = get_name_slot(counter.name_format,
+                                          counter.randomized, name)
+                if used_slot is not None and \
+                        slot <= used_slot <= last_slot:
+                    state.used.add(used_slot)
+
+        state.verified_until = last_slot + 1
+
+    def _pop_slot(self, session: Session, state: _CounterState,
+                  max_slot: int) -> Optional[int]:
+        """
+        Takes the lowest free slot of a counter, or None if all slots up
+        to max_slot are in use.
+
+        """
+        if state.heap:
+            slot = heapq.heappop(state.heap)
+            self._pop_free_slot(session, state, slot)
+
+            return slot
+
+        slot = state.counter.next_slot
+        if slot > max_slot:
+            return None
+
+        state.counter.next_slot = slot + 1
+
+        return slot
+
+    def _pop_free_slot(self, session: Session, state: _CounterState,
+                       slot: int) -> None:
+        free_slot = state.free.pop(slot)
+
+        if free_slot in session.new:
+            session.expunge(free_slot)
+        else:
+            session.delete(free_slot)
+
+    def _push_slot(self, session: Session, state: _CounterState,
+                   slot: int) -> None:
+        if slot in state.free:
+            return
+
+        free_slot = NodeNameFreeSlot(counter_id=state.counter.id, slot=slot)
+        session.add(free_slot)
+
+        state.free[slot] = free_slot
+        heapq.heappush(state.heap, slot)
+
+    def _is_used(self, session: Session, name: str,
+                 randomized: bool) -> bool: \
+            # pylint: disable=no-self-use
+        """
+        Checks whether a host name is used by a node, with or without a
+        DNS zone, or a random suffix if the name format is randomized.
+
+        """
+        name_lower = name.lower()
+
+        #
+        # '-' sorts before '.', which sorts before '/', so the range also
+        # covers fully qualified names
+        #
+        name_range = and_(
+            Node.name_lower > name_lower + ('-' if randomized else '.'),
+            Node.name_lower < name_lower + '/'
+        )
+
+        with session.no_autoflush:
+            return session.query(Node.id).filter(
+                or_(Node.name_lower == name_lower, name_range)
+            ).first() is not None
+
+
+def get_max_slot(name_format: str) -> int:
+    """
+    Gets the highest slot of a name format. A name format without a node
+    number specifier has a single slot.
+
+    """
+    match = NODE_NUMBER_SPECIFIER.search(name_format)
+    if match is None:
+        return 1
+
+    return 10 ** (len(match.group(0)) - 1) - 1
+
+
+def format_name(name_format: str, slot: int) -> str:
+    return NODE_NUMBER_SPECIFIER.sub(
+        lambda match: '%0*d' % (len(match.group(0)) - 1, slot),
+        name_format, count=1)
+
+
+@functools.lru_cache(maxsize=64)
+def get_name_pattern(name_format: str, randomized: bool) -> Pattern:
+    """
+    Gets a regular expression matching the node names generated from a
+    name format. The slot, if any, is captured in the first group.
+
+    """
+    match = NODE_NUMBER_SPECIFIER.search(name_format)
+    if match is None:
+        pattern = re.escape(name_format)
+    else:
+        pattern = '{}([0-9]{{{}}}){}'.format(
+            re.escape(name_format[:match.start()]),
+            len(match.group(0)) - 1,
+            re.escape(name_format[match.end():]))
+
+    if randomized:
+        pattern += '-[a-z]{5}'
+
+    return re.compile(pattern + r'(?:\..*)?$', re.IGNORECASE)
+
+
+def get_name_slot(name_format: str, randomized: bool,
+                  name: str) -> Optional[int]:
+    """
+    Gets the slot of a node name generated from a name format, or None if
+    the name does not match the name format.
+
+    """
+    match = get_name_pattern(name_format, randomized).match(name)
+    if match is None:
+        return None
+
+    if not match.groups():
+        return 1
+
+    return int(match.group(1)) or None
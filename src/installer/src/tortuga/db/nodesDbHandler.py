@@ -13,9 +13,9 @@
 # limitations under the License.
 
 # pylint: disable=not-callable,no-member,multiple-statements,no-self-use
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
-from sqlalchemy import and_, func, or_
+from sqlalchemy import and_, or_
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
 
@@ -28,6 +28,13 @@ from .models.node import Node
 from .models.softwareProfile import SoftwareProfile
 
 Tags = Dict[str, Optional[str]]
+LoadOptions = Optional[List[Any]]
+
+#
+# The number of node ids looked up per query, which keeps the number of
+# bound parameters within the limits of all supported databases
+#
+NODE_ID_QUERY_CHUNK_SIZE = 500
 
 
 class NodesDbHandler(TortugaDbObjectHandler):
@@ -40,7 +47,8 @@ class NodesDbHandler(TortugaDbObjectHandler):
 
         self._softwareProfilesDbHandler = SoftwareProfilesDbHandler()
 
-    def getNode(self, session: Session, name: str) -> Node:
+    def getNode(self, session: Session, name: str,
+                options: LoadOptions = None) -> Node:
         """
         Return node.
 
@@ -48,17 +56,23 @@ class NodesDbHandler(TortugaDbObjectHandler):
             NodeNotFound
         """
 
+        query = session.query(Node).options(*(options or []))
+
+        name_lower = name.lower()
+
         try:
-            if '.' in name:
-                # Attempt exact match on fully-qualfied name
-                return session.query(Node).filter(
-                    func.lower(Node.name) == name.lower()).one()
-
-            # 'name' is short host name; attempt to match on either short
-            # host name or any host starting with same host name
-            return session.query(Node).filter(
-                or_(func.lower(Node.name) == name.lower(),
-                    func.lower(Node.name).like(name.lower() + '.%'))).one()
+            if '.' in name_lower:
+                # Exact match on fully-qualified name
+                return query.filter(Node.name_lower == name_lower).one()
+
+            # 'name' is short host name; match on either short host name
+            # or any host in a domain under the same host name. The prefix
+            # match is a range on the indexed column, rather than a LIKE,
+            # so that it uses the index on all database engines.
+            return query.filter(
+                or_(Node.name_lower == name_lower,
+                    and_(Node.name_lower > name_lower + '.',
+                         Node.name_lower < name_lower + '/'))).one()
         except NoResultFound:
             raise NodeNotFound("Node [%s] not found" % (name))
 
@@ -126,8 +140,8 @@ class NodesDbHandler(TortugaDbObjectHandler):
 
         return session.query(Node).filter(or_(*searchspec)).all()
 
-    def getNodesByAddHostSession(self, session: Session, ahSession: str) \
-            -> List[Node]:
+    def getNodesByAddHostSession(self, session: Session, ahSession: str,
+                                 options: LoadOptions = None) -> List[Node]:
         """
         Get nodes by add host session
         Returns a list of nodes
@@ -136,14 +150,15 @@ class NodesDbHandler(TortugaDbObjectHandler):
         self._logger.debug(
             'getNodesByAddHostSession(): ahSession [%s]' % (ahSession))
 
-        return session.query(Node).filter(
+        return session.query(Node).options(*(options or [])).filter(
             Node.addHostSession == ahSession).order_by(Node.name).all()
 
     def getNodesByNameFilter(
             self,
             session: Session,
             filter_spec: Union[str, list],
-            include_installer: Optional[bool] = True) -> List[Node]:
+            include_installer: Optional[bool] = True,
+            options: LoadOptions = None) -> List[Node]:
         """
         Filter follows SQL "LIKE" semantics (ie. "something%")
 
@@ -172,19 +187,22 @@ class NodesDbHandler(TortugaDbObjectHandler):
             # (ie. "hostname-01.domain")
             node_filter.append(Node.name.like(filter_spec_item))
 
+        query = session.query(Node).options(*(options or []))
+
         if not include_installer:
             installer_fqdn = getfqdn()
 
-            return session.query(Node).filter(
+            return query.filter(
                 and_(
                     Node.name != installer_fqdn,
                     or_(*node_filter)
                 )
             ).all()
 
-        return session.query(Node).filter(or_(*node_filter)).all()
+        return query.filter(or_(*node_filter)).all()
 
-    def getNodeById(self, session: Session, _id: int) -> Node:
+    def getNodeById(self, session: Session, _id: int,
+                    options: LoadOptions = None) -> Node:
         """
         Return node.
 
@@ -194,14 +212,32 @@ class NodesDbHandler(TortugaDbObjectHandler):
 
         self._logger.debug('Retrieving node by ID [%s]' % (_id))
 
-        dbNode = session.query(Node).get(_id)
+        dbNode = session.query(Node).options(*(options or [])).get(_id)
 
         if not dbNode:
             raise NodeNotFound('Node ID [%s] not found.' % (_id))
 
         return dbNode
 
-    def getNodeByIp(self, session: Session, ip: str) -> Node:
+    def getNodesByIds(self, session: Session, ids: List[int],
+                      options: LoadOptions = None) -> List[Node]:
+        """
+        Return the nodes with any of the given ids.
+        """
+
+        nodes = []
+
+        for offset in range(0, len(ids), NODE_ID_QUERY_CHUNK_SIZE):
+            nodes.extend(
+                session.query(Node).options(*(options or [])).filter(
+                    Node.id.in_(
+                        ids[offset:offset + NODE_ID_QUERY_CHUNK_SIZE]))
+            )
+
+        return nodes
+
+    def getNodeByIp(self, session: Session, ip: str,
+                    options: LoadOptions = None) -> Node:
         """
         Raises:
             NodeNotFound
@@ -210,17 +246,28 @@ class NodesDbHandler(TortugaDbObjectHandler):
         self._logger.debug('Retrieving node by IP [%s]' % (ip))
 
         try:
-            return session.query(Node).join(Nic).filter(Nic.ip == ip).one()
+            return session.query(Node).options(*(options or [])).join(
+                Nic).filter(Nic.ip == ip).one()
         except NoResultFound:
             raise NodeNotFound(
                 'Node with IP address [%s] not found.' % (ip))
 
     def getNodeList(self, session: Session,
                     softwareProfile: Optional[str] = None,
-                    tags: Optional[Tags] = None) -> List[Node]:
+                    tags: Optional[Tags] = None,
+                    limit: Optional[int] = None,
+                    after: Optional[int] = None,
+                    options: LoadOptions = None) -> List[Node]:
         """
         Get sorted list of nodes from the db.
 
+        If limit or after are specified, nodes are sorted by id instead of
+        name, and only the nodes with an id greater than after are
+        returned, up to limit nodes (keyset pagination).
+
+        Loader options, for the relations to load along with the nodes,
+        may be specified in options.
+
         Raises:
             SoftwareProfileNotFound
         """
@@ -252,8 +299,21 @@ class NodesDbHandler(TortugaDbObjectHandler):
                     #
                     searchspec.append(Node.tags.any(name=name))
 
-        return session.query(Node).filter(
-            or_(*searchspec)).order_by(Node.name).all()
+        query = session.query(Node).options(*(options or [])).filter(
+            or_(*searchspec))
+
+        if limit is None and after is None:
+            return query.order_by(Node.name).all()
+
+        if after is not None:
+            query = query.filter(Node.id > after)
+
+        query = query.order_by(Node.id)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query.all()
 
     def getNodeListByNodeStateAndSoftwareProfileName(
             self, session: Session, nodeState: str,
@@ -270,8 +330,10 @@ class NodesDbHandler(TortugaDbObjectHandler):
             SoftwareProfile.name == softwareProfileName,
             Node.state == nodeState)).all()
 
-    def getNodesByNodeState(self, session: Session, state: str) -> List[Node]:
-        return session.query(Node).filter(Node.state == state).all()
+    def getNodesByNodeState(self, session: Session, state: str,
+                            options: LoadOptions = None) -> List[Node]:
+        return session.query(Node).options(*(options or [])).filter(
+            Node.state == state).all()
 
     def getNodesByMac(self, session: Session, usedMacList: List[str]) \
             -> List[Node]:
@@ -304,8 +366,8 @@ class NodesDbHandler(TortugaDbObjectHandler):
         return filter_spec
 
     def expand_nodespec(self, session: Session, nodespec: str,
-                        include_installer: Optional[bool] = True) \
-            -> List[Node]:
+                        include_installer: Optional[bool] = True,
+                        options: LoadOptions = None) -> List[Node]:
         """
         Expand command-line nodespec (ie. "compute*") to list of nodes
         """
@@ -313,5 +375,6 @@ class NodesDbHandler(TortugaDbObjectHandler):
         return self.getNodesByNameFilter(
             session,
             self.build_node_filterspec(nodespec),
-            include_installer=include_installer
+            include_installer=include_installer,
+            options=options
         )
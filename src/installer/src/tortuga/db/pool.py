@@ -0,0 +1,134 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """
+    Connection pool metrics for an engine, collected from pool events.
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        self.connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def attach(self, engine: Engine):
+        """
+        Starts collecting metrics for the connection pool of an engine.
+        Listeners are attached to the engine, rather than the pool, so that
+        they are carried over when the pool is re-created.
+
+        :param Engine engine: the engine
+
+        """
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'close', self._on_close)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def record_wait(self, wait_time: float):
+        """
+        Records the time spent waiting for a connection to be checked out
+        of the pool.
+
+        :param float wait_time: the wait time, in seconds
+
+        """
+        with self._lock:
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Gets the pool metrics.
+
+        :return Dict[str, Any]: the pool metrics
+
+        """
+        with self._lock:
+            return {
+                'connections': self.connections,
+                'checked_out': self.checked_out,
+                'max_checked_out': self.max_checked_out,
+                'checkouts': self.checkouts,
+                'invalidated': self.invalidated,
+                'wait_time_total': self.wait_time_total,
+                'wait_time_max': self.wait_time_max,
+                'wait_time_avg': self.wait_time_total / self.checkouts
+                                 if self.checkouts else 0.0,
+            }
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections -= 1
+
+    def _on_checkout(self, dbapi_connection, connection_record,
+                     connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out,
+                                       self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out -= 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record,
+                       exception):
+        with self._lock:
+            self.invalidated += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long each checkout waits for a
+    connection, in the metrics assigned to it.
+
+    """
+    metrics: Optional[PoolMetrics] = None
+
+    def connect(self):
+        start = time.monotonic()
+        try:
+            return super().connect()
+
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.monotonic() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+
+        return pool
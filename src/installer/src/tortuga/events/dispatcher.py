@@ -0,0 +1,113 @@
+# Copyright 2008-2018 Univa Corporation
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .types import BaseEvent
+
+
+#
+# Thread local storage, for events fired in a batch
+#
+_local = threading.local()
+
+
+@contextmanager
+def batch_listeners():
+    """
+    A context manager that defers scheduling event listeners for events
+    fired within it, until it exits. Events are still stored and published
+    as they fire, but all listeners for the burst are scheduled together,
+    in as few tasks as possible. Nested batches are part of the outermost
+    batch.
+
+    Listeners are scheduled even if the block raises an exception. The
+    events have already been stored and published, and the changes they
+    are about may already have been committed.
+
+    """
+    if getattr(_local, 'events', None) is not None:
+        yield
+        return
+
+    _local.events = []
+    try:
+        yield
+    finally:
+        events: List[BaseEvent] = _local.events
+        _local.events = None
+        if events:
+            schedule_listeners(events)
+
+
+def dispatch_event(event: BaseEvent):
+    """
+    Schedules all event listeners to run for an event, as required. If a
+    batch is in progress, the event is added to the batch instead.
+
+    :param BaseEvent event: the event
+
+    """
+    events: Optional[List[BaseEvent]] = getattr(_local, 'events', None)
+
+    if events is not None:
+        events.append(event)
+    else:
+        schedule_listeners([event])
+
+
+def schedule_listeners(events: List[BaseEvent]):
+    """
+    Schedules all event listeners to run for a list of events, as required.
+    Listeners that have the same countdown are grouped into a single task,
+    which runs each of them for each of the events they should run for.
+
+    :param List[BaseEvent] events: the events
+
+    """
+    from .listeners import get_all_listener_classes
+    from .tasks import run_event_listeners
+
+    #
+    # Group listener names, and the events they should run for, by
+    # countdown
+    #
+    groups: Dict[Optional[int], Tuple[List[str], List[dict]]] = {}
+    listener_classes = get_all_listener_classes()
+
+    for event in events:
+        event_dict = None
+        for listener_class in listener_classes:
+            if not listener_class.should_run(event):
+                continue
+
+            if event_dict is None:
+                event_dict = event.schema().dump(event).data
+
+            names, event_dicts = groups.setdefault(
+                listener_class.countdown, ([], []))
+            if listener_class.name not in names:
+                names.append(listener_class.name)
+            if not event_dicts or event_dicts[-1] is not event_dict:
+                event_dicts.append(event_dict)
+
+    for countdown, (names, event_dicts) in groups.items():
+        kwargs = {}
+        if countdown is not None:
+            kwargs['countdown'] = countdown
+        run_event_listeners.apply_async(
+            args=[names, event_dicts],
+            **kwargs
+        )
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import List, Optional
+
 from tortuga.node import state
 from .base import BaseListener
 from ..types import NodeStateChanged
@@ -25,9 +27,35 @@ class NodeProvisioningListener(BaseListener):
     "Installed" state, then it is assumed that the node has a problem, and
     thus it's state is changed to "Unresponsive".
 
+    Rather than scheduling a delayed task for each node, a timer is added
+    to a timer wheel, which is checked periodically by the
+    check_node_provisioning_timeouts task.
+
     """
+    name = 'node-provisioning-listener'
     event_types = [NodeStateChanged]
-    countdown = 600  # 10 minutes
+
+    #
+    # The name of the timer wheel
+    #
+    timer_wheel = 'node-provisioning'
+
+    #
+    # How long to wait (in seconds) for a provisioned node to be installed
+    #
+    timeout = 600  # 10 minutes
+
+    #
+    # The maximum number of timed out nodes to check in a single database
+    # session
+    #
+    batch_size = 500
+
+    #
+    # How long to wait (in seconds) before checking a batch of nodes again,
+    # if checking them failed
+    #
+    retry_delay = 60
 
     @classmethod
     def should_run(cls, event: NodeStateChanged):
@@ -44,15 +72,67 @@ class NodeProvisioningListener(BaseListener):
         if not event.node['name']:
             return
 
-        from tortuga.node.nodeManager import NodeManager
+        from ..manager import TimerWheelManager
+
+        TimerWheelManager.get(self.timer_wheel).schedule(
+            event.node['name'], self.timeout)
+
+    @classmethod
+    def check_timeouts(cls, now: Optional[float] = None) -> int:
+        """
+        Checks all nodes whose provisioning timeout has expired, and marks
+        any that have not been installed as unresponsive.
+
+        :param float now: the current time, as a unix timestamp, defaults
+                          to the current system time
+
+        :return int: the number of nodes checked
+
+        """
         from tortuga.tasks.celery import app
+        from ..manager import TimerWheelManager
+
+        timer_wheel = TimerWheelManager.get(cls.timer_wheel)
+        checked = 0
+
+        while True:
+            node_names = timer_wheel.pop_due(now=now, limit=cls.batch_size)
+            if not node_names:
+                break
+
+            try:
+                with app.dbm.session() as session:
+                    cls._check_nodes(session, node_names)
+
+            except Exception:
+                #
+                # The timers have already been removed from the timer
+                # wheel, so they are scheduled again, rather than lost
+                #
+                timer_wheel.schedule_many(node_names, cls.retry_delay)
+                raise
+
+            checked += len(node_names)
+
+        return checked
+
+    @staticmethod
+    def _check_nodes(session, node_names: List[str]):
+        """
+        Marks nodes that have not been installed as unresponsive.
+
+        :param session:              the database session
+        :param List[str] node_names: the names of the nodes to check
+
+        """
+        from tortuga.node.nodeManager import NodeManager
         from tortuga.exceptions.nodeNotFound import NodeNotFound
 
-        with app.dbm.session() as session:
-            manager: NodeManager = NodeManager()
+        manager: NodeManager = NodeManager()
 
+        for node_name in node_names:
             try:
-                node = manager.getNode(session, event.node['name'])
+                node = manager.getNode(session, node_name)
 
                 if node.getState() not in [state.NODE_STATE_INSTALLED,
                                            state.NODE_STATE_DELETED]:
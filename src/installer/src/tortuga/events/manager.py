@@ -18,6 +18,7 @@ from tortuga.config.configManager import ConfigManager
 from tortuga.objectstore.manager import ObjectStoreManager
 from .pubsub import EventPubSub, RedisEventPubSub
 from .store import EventStore, ObjectStoreEventStore
+from .timers import TimerWheel, RedisTimerWheel
 
 
 class EventStoreManager:
@@ -36,7 +37,16 @@ class EventStoreManager:
 
         """
         if not cls._event_store:
-            object_store = ObjectStoreManager.get('events')
+            object_store = ObjectStoreManager.get(
+                'events',
+                equality_indexes=['name'],
+                ordered_indexes=['timestamp']
+            )
+            #
+            # Events stored before the indexes existed are indexed once
+            #
+            object_store.reindex()
+
             cls._event_store = ObjectStoreEventStore(object_store)
         return cls._event_store
 
@@ -64,3 +74,27 @@ class PubSubManager:
             redis_client=cls._redis_client,
             event_store=EventStoreManager.get()
         )
+
+
+class TimerWheelManager:
+    """
+    Timer wheel manager.
+
+    """
+    _redis_client: Redis = None
+    _config_manager: ConfigManager = ConfigManager()
+
+    @classmethod
+    def get(cls, name: str) -> TimerWheel:
+        """
+        Get a timer wheel instance.
+
+        :param str name: the name of the timer wheel
+
+        :return TimerWheel: the timer wheel instance
+
+        """
+        if not cls._redis_client:
+            cls._redis_client = Redis(
+                password=cls._config_manager.getRedisPassword())
+        return RedisTimerWheel(name=name, redis_client=cls._redis_client)
@@ -11,14 +11,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 from typing import Optional
 
 from redis import Redis
 
 from .types import BaseEvent
+from .types.base import get_event_class
 from .store import EventStore
 
 
+#
+# The maximum size (in bytes) of an event payload that is published inline,
+# larger events are published by key only, and have to be fetched from the
+# event store by subscribers
+#
+DEFAULT_MAX_INLINE_SIZE = 16 * 1024
+
+
 class EventPubSub:
     """
     A publish/subscribe service for system events.
@@ -50,10 +60,13 @@ class EventPubSub:
         """
         raise NotImplementedError()
 
-    def get_message(self) -> Optional[BaseEvent]:
+    def get_message(self, timeout: float = 0) -> Optional[BaseEvent]:
         """
         Get the next event in the queue if any.
 
+        :param float timeout: the maximum number of seconds to wait for an
+                              event
+
         :returns Optional[BaseEvent]: the next event, or None
 
         """
@@ -63,28 +76,44 @@ class EventPubSub:
 class RedisEventPubSub(EventPubSub):
     _namespace = 'events'
 
-    def __init__(self, redis_client: Redis, event_store: EventStore):
+    def __init__(self, redis_client: Redis, event_store: EventStore,
+                 max_inline_size: int = DEFAULT_MAX_INLINE_SIZE):
         """
         Initialization.
 
         :param Redis redis_client:     the (initialized) redis client to use
         :param EventSTore event_store: the (initialized) event store to use
+        :param int max_inline_size:    the maximum size, in bytes, of event
+                                       payloads published inline
 
         """
         self._redis = redis_client
         self._store = event_store
         self._pubsub = None
+        self._max_inline_size = max_inline_size
 
     def publish(self, event: BaseEvent):
         """
         See superclass.
 
+        Events are published with their payload inline, so that subscribers
+        don't need to fetch them from the event store. Events with payloads
+        larger than max_inline_size are published by key only.
+
         :param BaseEvent event:
 
         """
         channel = '{}.{}'.format(self._namespace, event.name)
         key = '{}:{}'.format(self._namespace, event.id)
-        self._redis.publish(channel, key)
+
+        payload = json.dumps({
+            'key': key,
+            'event': event.schema().dump(event).data
+        })
+        if len(payload) > self._max_inline_size:
+            payload = key
+
+        self._redis.publish(channel, payload)
 
     def subscribe(self, event_name: str = None):
         """
@@ -111,25 +140,57 @@ class RedisEventPubSub(EventPubSub):
         """
         if not self._pubsub:
             return
-        self._pubsub.unsubscribe()
+        #
+        # Closing the connection drops both the channel and the pattern
+        # subscriptions
+        #
+        self._pubsub.close()
         self._pubsub = None
 
-    def get_message(self) -> Optional[BaseEvent]:
+    def get_message(self, timeout: float = 0) -> Optional[BaseEvent]:
         """
         See superclass.
 
+        :param float timeout:
+
         :return Optional[BaseEvent]:
 
         """
         if not self._pubsub:
             raise Exception('No subscription')
 
-        msg = self._pubsub.get_message(ignore_subscribe_messages=True)
+        msg = self._pubsub.get_message(ignore_subscribe_messages=True,
+                                       timeout=timeout)
 
         if not msg:
             return None
 
-        key = msg['data'].decode()
-        event_id = key.replace('{}:'.format(self._namespace), '')
+        return self._get_event(msg)
+
+    def _get_event(self, msg: dict) -> Optional[BaseEvent]:
+        """
+        Gets the event for a pub/sub message.
+
+        :param dict msg: the pub/sub message
+
+        :return Optional[BaseEvent]: the event, or None if it is no longer
+                                     in the event store
+
+        """
+        data = msg['data'].decode()
+
+        #
+        # Inline events are unmarshalled directly from the message
+        #
+        if data.startswith('{'):
+            event_dict = json.loads(data)['event']
+            event_class = get_event_class(event_dict['name'])
+            unmarshalled = event_class.schema().load(event_dict)
+            return event_class(**unmarshalled.data)
+
+        #
+        # Otherwise, the message is the event key
+        #
+        event_id = data.replace('{}:'.format(self._namespace), '')
         event = self._store.get(event_id)
         return event
@@ -13,11 +13,13 @@
 # limitations under the License.
 
 import logging
-from typing import Iterator, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from tortuga.config.configManager import ConfigManager
 from tortuga.logging import EVENTS_NAMESPACE
 from tortuga.objectstore.base import matches_filters, ObjectStore
 from .types import BaseEvent, get_event_class
+from .types.base import EVENT_TYPES
 
 
 logger = logging.getLogger(EVENTS_NAMESPACE)
@@ -37,6 +39,17 @@ class EventStore:
         """
         raise NotImplementedError()
 
+    def compact(self) -> int:
+        """
+        Removes events from the event store, as required by the retention
+        policies (ttl and max_count) of each event type. This is designed
+        to be called periodically.
+
+        :return int: the number of events removed
+
+        """
+        raise NotImplementedError()
+
     def get(self, event_id: str) -> Optional[BaseEvent]:
         """
         Gets an event from the event store.
@@ -70,6 +83,30 @@ class EventStore:
         """
         raise NotImplementedError()
 
+    def list_page(
+            self,
+            order_by: str = 'timestamp',
+            order_desc: bool = False,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            **filters) -> Tuple[List[BaseEvent], Optional[str]]:
+        """
+        Gets a single page of events from the event store.
+
+        :param str order_by:    the name of the event attribute to order by
+        :param bool order_desc: sort in descending order
+        :param int limit:       the maximum number of events in the page
+        :param str cursor:      the cursor returned with the previous page,
+                                or None to get the first page
+        :param filters:         one or more filters to apply to the list
+
+        :return Tuple[List[BaseEvent], Optional[str]]: a tuple containing
+            the events in the page, and the cursor for the next page, which
+            is None if there are no more events
+
+        """
+        raise NotImplementedError()
+
 
 class ObjectStoreEventStore(EventStore):
     """
@@ -77,8 +114,11 @@ class ObjectStoreEventStore(EventStore):
     object store.
     
     """
-    def __init__(self, object_store: ObjectStore):
+    def __init__(self, object_store: ObjectStore,
+                 config_manager: Optional[ConfigManager] = None):
         self._store = object_store
+        self._config_manager = config_manager or ConfigManager()
+        self._ttls: Dict[str, Optional[int]] = {}
 
     def save(self, event: BaseEvent):
         """
@@ -89,7 +129,53 @@ class ObjectStoreEventStore(EventStore):
         """
         marshalled = event.schema().dump(event)
         event_dict = marshalled.data
-        self._store.set(event.id, event_dict)
+        self._store.set(event.id, event_dict, ttl=self._get_ttl(event))
+
+    def _get_ttl(self, event: BaseEvent) -> Optional[int]:
+        """
+        Gets the ttl of an event, which is read from the configuration,
+        once per event type, falling back to the ttl of the event type.
+
+        :param BaseEvent event: the event
+
+        :return Optional[int]: the ttl, or None if the event is kept until
+                               it is deleted
+
+        """
+        if event.name not in self._ttls:
+            ttl = self._config_manager.get_event_ttl(event.name)
+            if ttl is None:
+                ttl = event.ttl
+            self._ttls[event.name] = ttl or None
+
+        return self._ttls[event.name]
+
+    def compact(self) -> int:
+        """
+        See superclass.
+
+        Expired events are removed by the object store, which only needs
+        to clean up after them. Events stored before the object store was
+        indexed are indexed first, so that they are not skipped by the
+        indexed queries.
+
+        :return int:
+
+        """
+        self._store.reindex()
+
+        removed = self._store.sweep()
+
+        for event_class in EVENT_TYPES.values():
+            if event_class.max_count is None:
+                continue
+            removed += self._store.trim(order_by='timestamp',
+                                        max_count=event_class.max_count,
+                                        name=event_class.name)
+
+        logger.debug('compact() -> {}'.format(removed))
+
+        return removed
 
     def get(self, event_id: str) -> Optional[BaseEvent]:
         """
@@ -127,6 +213,10 @@ class ObjectStoreEventStore(EventStore):
         """
         See superclass.
 
+        The filters are used to narrow down the events loaded from the
+        object store, using its indexes where possible, and are then
+        applied to each unmarshalled event.
+
         :return Iterator[BaseEvent]:
 
         """
@@ -137,9 +227,9 @@ class ObjectStoreEventStore(EventStore):
         )
 
         count = 0
-        for _, event_dict in self._store.list_sorted(order_by=order_by,
-                                                     order_desc=order_desc,
-                                                     order_alpha=order_alpha):
+        for _, event_dict in self._store.list_candidates(
+                order_by=order_by, order_desc=order_desc,
+                order_alpha=order_alpha, **filters):
             obj = self._unmarshall(event_dict)
             if matches_filters(obj, filters):
                 count += 1
@@ -148,3 +238,28 @@ class ObjectStoreEventStore(EventStore):
                     return
 
                 yield obj
+
+    def list_page(
+            self,
+            order_by: str = 'timestamp',
+            order_desc: bool = False,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            **filters) -> Tuple[List[BaseEvent], Optional[str]]:
+        """
+        See superclass.
+
+        Filters are applied to the stored event data, rather than to the
+        unmarshalled events.
+
+        :return Tuple[List[BaseEvent], Optional[str]]:
+
+        """
+        page, next_cursor = self._store.list_page(order_by=order_by,
+                                                  order_desc=order_desc,
+                                                  limit=limit,
+                                                  cursor=cursor,
+                                                  **filters)
+
+        return [self._unmarshall(event_dict) for _, event_dict in page], \
+            next_cursor
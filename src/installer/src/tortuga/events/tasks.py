@@ -11,12 +11,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Type
+import logging
+from typing import List, Type
 
+from tortuga.events.manager import EventStoreManager
 from tortuga.events.types import BaseEvent, get_event_class
+from tortuga.logging import EVENTS_NAMESPACE
 from tortuga.tasks.celery import app
 
-from .listeners import get_listnener_class, BaseListener
+from .listeners import get_listnener_class, BaseListener, \
+    NodeProvisioningListener
+
+
+logger = logging.getLogger(EVENTS_NAMESPACE)
 
 
 @app.task()
@@ -45,3 +52,61 @@ def run_event_listener(listener_name: str, event_dict: dict):
     # Run the event listener
     #
     listener.run_if_required(event)
+
+
+@app.task()
+def run_event_listeners(listener_names: List[str], event_dicts: List[dict]):
+    """
+    A celery task that runs a group of event listeners for a batch of
+    events. Each listener is run for each event it is required for, and
+    a failing listener does not prevent the others from running.
+
+    :param List[str] listener_names: the listener names
+    :param List[dict] event_dicts:   the events, serialized as dicts
+
+    """
+    #
+    # Unmarshall the events
+    #
+    events: List[BaseEvent] = []
+    for event_dict in event_dicts:
+        event_class = get_event_class(event_dict['name'])
+        unmarshalled = event_class.schema().load(event_dict)
+        events.append(event_class(**unmarshalled.data))
+
+    #
+    # Run the event listeners
+    #
+    for listener_name in listener_names:
+        listener_class: Type[BaseListener] = \
+            get_listnener_class(listener_name)
+        listener: BaseListener = listener_class(app.app)
+
+        for event in events:
+            try:
+                listener.run_if_required(event)
+
+            except Exception:
+                logger.exception(
+                    'Event listener {} failed for event {}'.format(
+                        listener_name, event.id))
+
+
+@app.task()
+def compact_event_store():
+    """
+    A celery task that removes events from the event store, as required by
+    the retention policies of the event types.
+
+    """
+    EventStoreManager.get().compact()
+
+
+@app.task()
+def check_node_provisioning_timeouts():
+    """
+    A celery task that marks nodes that have not been installed within the
+    provisioning timeout as unresponsive.
+
+    """
+    NodeProvisioningListener.check_timeouts()
@@ -0,0 +1,177 @@
+# Copyright 2008-2018 Univa Corporation
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from typing import List, Optional
+
+from redis import Redis
+
+
+class TimerWheel:
+    """
+    A set of named timers, that are checked for expiry in bulk by a
+    periodic task, rather than each timer being a delayed task of its own.
+
+    """
+    def schedule(self, member: str, delay: float):
+        """
+        Schedules a timer to expire after a delay. If there is already a
+        timer for the member, it is rescheduled.
+
+        :param str member:  the member the timer is for
+        :param float delay: the number of seconds until the timer expires
+
+        """
+        raise NotImplementedError()
+
+    def schedule_many(self, members: List[str], delay: float):
+        """
+        Schedules timers for a list of members, all expiring after the same
+        delay. Existing timers for the members are rescheduled.
+
+        :param List[str] members: the members the timers are for
+        :param float delay:       the number of seconds until the timers
+                                  expire
+
+        """
+        raise NotImplementedError()
+
+    def cancel(self, member: str):
+        """
+        Cancels the timer for a member, if there is one.
+
+        :param str member: the member the timer is for
+
+        """
+        raise NotImplementedError()
+
+    def pop_due(self, now: Optional[float] = None,
+                limit: int = 1000) -> List[str]:
+        """
+        Removes expired timers, and returns their members, oldest first.
+        Each expired timer is only ever returned once, even if there are
+        multiple callers, so callers that fail to process the members must
+        schedule them again.
+
+        :param float now: the current time, as a unix timestamp, defaults
+                          to the current system time
+        :param int limit: the maximum number of timers to return
+
+        :return List[str]: the members of the expired timers
+
+        """
+        raise NotImplementedError()
+
+    def count(self) -> int:
+        """
+        Gets the number of pending timers.
+
+        :return int: the number of pending timers
+
+        """
+        raise NotImplementedError()
+
+
+class RedisTimerWheel(TimerWheel):
+    """
+    A timer wheel stored in a Redis sorted set, scored by expiry time.
+
+    """
+    _namespace = 'timers'
+
+    def __init__(self, name: str, redis_client: Redis):
+        """
+        Initialization.
+
+        :param str name:           the name of the timer wheel
+        :param Redis redis_client: the (initialized) redis client to use
+
+        """
+        self._key = '{}:{}'.format(self._namespace, name)
+        self._redis = redis_client
+
+    def schedule(self, member: str, delay: float):
+        """
+        See superclass.
+
+        :param str member:
+        :param float delay:
+
+        """
+        self._redis.zadd(self._key, **{member: time.time() + delay})
+
+    def schedule_many(self, members: List[str], delay: float):
+        """
+        See superclass.
+
+        :param List[str] members:
+        :param float delay:
+
+        """
+        if not members:
+            return
+
+        expires = time.time() + delay
+        self._redis.zadd(self._key,
+                         **{member: expires for member in members})
+
+    def cancel(self, member: str):
+        """
+        See superclass.
+
+        :param str member:
+
+        """
+        self._redis.zrem(self._key, member)
+
+    def pop_due(self, now: Optional[float] = None,
+                limit: int = 1000) -> List[str]:
+        """
+        See superclass.
+
+        :param float now:
+        :param int limit:
+
+        :return List[str]:
+
+        """
+        if now is None:
+            now = time.time()
+
+        members = [
+            member.decode() if isinstance(member, bytes) else member
+            for member in self._redis.zrangebyscore(self._key, '-inf', now,
+                                                    start=0, num=limit)
+        ]
+        if not members:
+            return []
+
+        #
+        # Only the caller that actually removes a timer gets to return it
+        #
+        pipeline = self._redis.pipeline(transaction=False)
+        for member in members:
+            pipeline.zrem(self._key, member)
+        removed = pipeline.execute()
+
+        return [member for member, result in zip(members, removed)
+                if result]
+
+    def count(self) -> int:
+        """
+        See superclass.
+
+        :return int:
+
+        """
+        return self._redis.zcard(self._key)
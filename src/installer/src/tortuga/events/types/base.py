@@ -13,7 +13,7 @@
 # limitations under the License.
 
 import datetime
-from typing import Dict, Type
+from typing import Dict, Optional, Type
 import uuid
 
 from marshmallow import Schema, fields
@@ -89,6 +89,17 @@ class BaseEvent(metaclass=EventMeta):
     # A marshmallow schema for the event
     #
     schema: Type[BaseEventSchema] = None
+    #
+    # The number of seconds events of this type are kept in the event
+    # store, or None to keep them until they are deleted. This can be
+    # overridden in the [event_ttl] section of tortuga.ini.
+    #
+    ttl: Optional[int] = None
+    #
+    # The maximum number of events of this type that are kept in the event
+    # store, the oldest are removed first. None for no limit.
+    #
+    max_count: Optional[int] = None
 
     def __init__(self, message=None, **kwargs):
         """
@@ -105,6 +116,18 @@ class BaseEvent(metaclass=EventMeta):
         for k, v in kwargs.items():
             setattr(self, k, v)
 
+    def get_coalesce_key(self) -> Optional[str]:
+        """
+        Gets a key identifying the object this event is about. When
+        delivery falls behind, a pending event may be replaced by a newer
+        event with the same key.
+
+        :return Optional[str]: the key, or None if the event must never be
+                               replaced
+
+        """
+        return None
+
     @classmethod
     def fire(cls, **kwargs) -> 'BaseEvent':
         """
@@ -167,16 +190,6 @@ class BaseEvent(metaclass=EventMeta):
         :param BaseEvent event:
 
         """
-        from ..listeners import get_all_listener_classes
-        from ..tasks import run_event_listener
-
-        event_dict = event.schema().dump(event).data
-        for listener_class in get_all_listener_classes():
-            if listener_class.should_run(event):
-                kwargs = {}
-                if listener_class.countdown is not None:
-                    kwargs['countdown'] = listener_class.countdown
-                run_event_listener.apply_async(
-                    args=[listener_class.name, event_dict],
-                    **kwargs
-                )
+        from ..dispatcher import dispatch_event
+
+        dispatch_event(event)
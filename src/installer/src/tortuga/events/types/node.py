@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Optional
+
 from marshmallow import fields
 
 from .base import BaseEventSchema, BaseEvent
@@ -47,3 +49,15 @@ class NodeStateChanged(BaseEvent):
         self.previous_state: dict = previous_state
 
         super().__init__(**kwargs)
+
+    def get_coalesce_key(self) -> Optional[str]:
+        """
+        See superclass.
+
+        :return Optional[str]:
+
+        """
+        if not self.node or not self.node.get('id'):
+            return None
+
+        return '{}:{}'.format(self.name, self.node['id'])
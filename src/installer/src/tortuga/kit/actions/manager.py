@@ -14,14 +14,34 @@
 
 # pylint: disable=no-name-in-module,no-member
 import logging
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
-from tortuga.kit.registry import get_all_kit_installers
+from tortuga.kit.loader import load_kits
+from tortuga.kit.registry import (get_all_kit_installers,
+                                  get_kit_installers_generation)
 from tortuga.logging import KIT_NAMESPACE
 from tortuga.objects.node import Node
 from tortuga.objects.tortugaObjectManager import TortugaObjectManager
 
 
+class _KitInstallerCache:
+    """
+    The kit installer classes of the installed kits, in the order their
+    actions are run, shared by all KitActionsManager instances in the
+    process. The cache is keyed on the installed kits, and the generation
+    of the kit installer registry.
+
+    """
+    def __init__(self):
+        self.installed_kits: Optional[Tuple[Tuple[str, str, str], ...]] = \
+            None
+        self.generation: Optional[int] = None
+        self.kit_installers: Dict[str, List[Any]] = {}
+
+
+_kit_installer_cache = _KitInstallerCache()
+
+
 class KitActionsManager(TortugaObjectManager):
     def __init__(self):
         self._logger = logging.getLogger(KIT_NAMESPACE)
@@ -179,7 +199,7 @@ class KitActionsManager(TortugaObjectManager):
 
     def _get_all_component_installers(self, base_kit_order='first'):
         all_components = []
-        for kit_installer_class in self._load_kits(base_kit_order):
+        for kit_installer_class in self._get_kit_installers(base_kit_order):
             kit_installer = kit_installer_class()
             kit_installer.session = self.session
             all_components.extend(
@@ -214,6 +234,46 @@ class KitActionsManager(TortugaObjectManager):
                 **kwargs
             )
 
+    def _get_kit_installers(self, base_kit_order='any'):
+        """
+        Return a list of all KitInstaller classes in the system, from the
+        cache of the process.
+
+        Kits are loaded again when the installed kits in the database
+        differ from the ones the cache was built for, such as when a kit
+        has been installed or deleted by another process.
+
+        """
+        cache = _kit_installer_cache
+
+        installed_kits = self._get_installed_kits()
+        if installed_kits != cache.installed_kits:
+            load_kits()
+
+        generation = get_kit_installers_generation()
+
+        if installed_kits != cache.installed_kits or \
+                generation != cache.generation:
+            cache.installed_kits = installed_kits
+            cache.generation = generation
+            cache.kit_installers = {}
+
+        if base_kit_order not in cache.kit_installers:
+            cache.kit_installers[base_kit_order] = \
+                self._load_kits(base_kit_order)
+
+        return list(cache.kit_installers[base_kit_order])
+
+    def _get_installed_kits(self) -> Tuple[Tuple[str, str, str], ...]:
+        from tortuga.db.models.kit import Kit
+
+        return tuple(sorted(
+            (name, version, iteration)
+            for name, version, iteration in self.session.query(
+                Kit.name, Kit.version, Kit.iteration
+            ).filter(Kit.isOs == False)  # noqa pylint: disable=singleton-comparison
+        ))
+
     def _load_kits(self, base_kit_order='any'):
         """
         Return a list of all KitInstaller objects in the system
@@ -228,10 +288,10 @@ class KitActionsManager(TortugaObjectManager):
                     base_kit_installer = kit
             if base_kit_installer:
                 all_kit_installers.remove(base_kit_installer)
-            if base_kit_order == 'first':
-                all_kit_installers.insert(0, base_kit_installer)
-            else:
-                all_kit_installers.append(base_kit_installer)
+                if base_kit_order == 'first':
+                    all_kit_installers.insert(0, base_kit_installer)
+                else:
+                    all_kit_installers.append(base_kit_installer)
 
         return all_kit_installers
 
@@ -20,7 +20,7 @@ import json
 import os
 import pkgutil
 import logging
-from typing import Optional, Type
+from typing import Dict, List, Optional, Tuple, Type
 
 from tortuga.config import VERSION, version_is_compatible
 from tortuga.config.configManager import ConfigManager
@@ -34,7 +34,7 @@ from tortuga.objects.kit import Kit
 from tortuga.objects.osFamilyInfo import OsFamilyInfo
 from tortuga.os_utility.tortugaSubprocess import executeCommand
 
-from .registry import register_kit_installer
+from .registry import get_kit_installers_generation, register_kit_installer
 from .utils import pip_install_requirements
 
 
@@ -43,6 +43,12 @@ logger = logging.getLogger(KIT_NAMESPACE)
 
 EULA_FILE = 'docs/EULA.txt'
 
+#
+# The component installer classes found in each components package, with
+# the generation of the kit installer registry they were found in
+#
+COMPONENT_INSTALLER_CLASSES: Dict[str, Tuple[int, List[type]]] = {}
+
 
 class ConfigurableMixin:
     """
@@ -279,15 +285,46 @@ class KitInstallerBase(ConfigurableMixin, metaclass=KitInstallerMeta):
         if self._component_installers_loaded:
             return
 
+        for comp_inst_class in self._get_component_installer_classes():
+            #
+            # Initialize the ComponentInstaller class and register
+            # it with the KitInstaller
+            #
+            comp_inst = comp_inst_class(self)
+            comp_inst.session = self.session
+            self._component_installers[comp_inst_class.name] = comp_inst
+
+            logger.debug(
+                'Component installer registered: %s', comp_inst.spec
+            )
+
+        self._component_installers_loaded = True
+
+    def _get_component_installer_classes(self) \
+            -> List[Type['ComponentInstallerBase']]:
+        """
+        Gets the component installer classes of this kit. The components
+        sub-package is only searched once per generation of the kit
+        installer registry.
+
+        """
         kit_pkg_name = inspect.getmodule(self).__package__
 
         comp_pkg_name = '{}.components'.format(kit_pkg_name)
 
+        generation = get_kit_installers_generation()
+
+        cached = COMPONENT_INSTALLER_CLASSES.get(comp_pkg_name)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
         logger.debug(
             'Searching for component installers in package: %s',
             comp_pkg_name
         )
 
+        comp_inst_classes = []
+
         #
         # Look for the components sub-package
         #
@@ -298,12 +335,14 @@ class KitInstallerBase(ConfigurableMixin, metaclass=KitInstallerMeta):
                 'No component installers found for kit: %s',
                 kit_pkg_name
             )
-            return
+            comp_pkg = None
 
         #
         # Walk the components sub-package, looking for component installers
         #
-        for loader, name, ispkg in pkgutil.walk_packages(comp_pkg.__path__):
+        comp_pkg_path = comp_pkg.__path__ if comp_pkg is not None else []
+
+        for _, name, ispkg in pkgutil.walk_packages(comp_pkg_path):
             if not ispkg:
                 continue
 
@@ -315,33 +354,28 @@ class KitInstallerBase(ConfigurableMixin, metaclass=KitInstallerMeta):
                 comp_inst_mod = importlib.import_module(
                     '{}.component'.format(full_pkg_path))
 
-                #
-                # Look for the ComponentInstaller class in the module
-                #
-                if not hasattr(comp_inst_mod, 'ComponentInstaller'):
-                    logger.warning(
-                        'ComponentInstaller class not found: %s',
-                        full_pkg_path
-                    )
+            except ModuleNotFoundError:
+                logger.debug('Package not a component: %s', full_pkg_path)
 
-                #
-                # Initialize the ComponentInstaller class and register
-                # it with the KitInstaller
-                #
-                comp_inst_class = comp_inst_mod.ComponentInstaller
-                comp_inst = comp_inst_class(self)
-                comp_inst.session = self.session
-                self._component_installers[comp_inst_class.name] = \
-                    comp_inst
+                continue
 
-                logger.debug(
-                    'Component installer registered: %s', comp_inst.spec
+            #
+            # Look for the ComponentInstaller class in the module
+            #
+            if not hasattr(comp_inst_mod, 'ComponentInstaller'):
+                logger.warning(
+                    'ComponentInstaller class not found: %s',
+                    full_pkg_path
                 )
 
-            except ModuleNotFoundError:
-                logger.debug('Package not a component: %s', full_pkg_path)
+                continue
+
+            comp_inst_classes.append(comp_inst_mod.ComponentInstaller)
+
+        COMPONENT_INSTALLER_CLASSES[comp_pkg_name] = \
+            (generation, comp_inst_classes)
 
-            self._component_installers_loaded = True
+        return comp_inst_classes
 
     def is_installable(self):
         """
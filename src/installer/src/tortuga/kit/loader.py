@@ -33,8 +33,8 @@ def load_kits():
     """
     config_manager = ConfigManager()
     kits_dir = config_manager.getKitDir()
-    kits_dir_list = os.listdir(config_manager.getKitDir()) \
-            if Path(config_manager.getKitDir()).exists() else []
+    kits_dir_exists = Path(kits_dir).exists()
+    kits_dir_list = os.listdir(kits_dir) if kits_dir_exists else []
     for entry in kits_dir_list:
         kit_search_path = os.path.join(kits_dir, entry)
         if not os.path.isdir(kit_search_path):
@@ -46,4 +46,13 @@ def load_kits():
                     'Adding kit search path to sys.path: {}'.format(
                         kit_search_path))
                 sys.path.insert(0, kit_search_path)
-    discover_kit_installers()
+
+    #
+    # Installing or removing a kit changes the modification time of the
+    # kits directory, so the kit installers only need to be discovered
+    # again when it changes
+    #
+    discover_kit_installers(cache_key=(
+        kits_dir,
+        os.stat(kits_dir).st_mtime if kits_dir_exists else None
+    ))
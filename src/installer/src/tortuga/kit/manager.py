@@ -53,7 +53,7 @@ from tortuga.softwareprofile.softwareProfileApi import SoftwareProfileApi
 from tortuga.utility.actionManager import ActionManager
 from .eula import BaseEulaValidator
 from .loader import load_kits
-from .registry import get_kit_installer
+from .registry import get_kit_installer, invalidate_kit_installers
 
 
 class KitManager(TortugaObjectManager):
@@ -290,6 +290,7 @@ class KitManager(TortugaObjectManager):
         # Add the kit to the database
         #
         self._kit_db_api.addKit(installer.session, kit)
+        invalidate_kit_installers()
 
         #
         # Clean up the kit archive directory
@@ -857,6 +858,12 @@ class KitManager(TortugaObjectManager):
                 'Removing kit installation directory: {}'.format(kit_dir))
             osUtility.removeDir(kit_dir)
 
+        #
+        # Component installers cached by other managers in this process
+        # must be looked up again
+        #
+        invalidate_kit_installers()
+
     def remove_proxy(self, repoDir):
         # Check for this repo as an actual entry in the tortuga apache.conf
         # file to remove
@@ -12,10 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import importlib
 import logging
 import pkgutil
-from typing import Tuple
+from typing import Any, Optional, Tuple
 
 from tortuga.exceptions.kitNotFound import KitNotFound
 from tortuga.logging import KIT_NAMESPACE
@@ -27,16 +28,40 @@ logger = logging.getLogger(KIT_NAMESPACE)
 KIT_INSTALLER_PACKAGES = ['tortuga_kits']
 KIT_INSTALLER_REGISTRY = {}
 
+#
+# Incremented whenever the registered kit installers may have changed, so
+# that anything derived from them, such as the component installers of each
+# kit, is looked up again
+#
+KIT_INSTALLER_GENERATION = 0
+
 
-def discover_kit_installers():
+def discover_kit_installers(cache_key: Optional[Any] = None):
     """
     Searches for kits in KITS_PACKAGES.
 
+    :param cache_key: if set, the search is skipped if the previous search
+                      was made with the same key, such as the modification
+                      time of the kits directory
+
     """
+    if cache_key is None:
+        _discover_kit_installers()
+    else:
+        _discover_kit_installers_cached(cache_key)
+
+
+def _discover_kit_installers():
     for pkg_name in KIT_INSTALLER_PACKAGES:
         discover_kit_installers_in_package(pkg_name)
 
 
+@functools.lru_cache(maxsize=1)
+def _discover_kit_installers_cached(cache_key: Any): \
+        # pylint: disable=unused-argument
+    _discover_kit_installers()
+
+
 def discover_kit_installers_in_package(pkg_name):
     """
     Searches pkg_name for kits, and loads/imports them if found.
@@ -68,12 +93,39 @@ def register_kit_installer(kit_class):
     :param kit_class: a subclass of KitInstallerBase
 
     """
+    global KIT_INSTALLER_GENERATION
+
     if kit_class.spec in KIT_INSTALLER_REGISTRY.keys():
         return
     KIT_INSTALLER_REGISTRY[kit_class.spec] = kit_class
+    KIT_INSTALLER_GENERATION += 1
     logger.info('Kit installer registered: {}'.format(kit_class.spec))
 
 
+def invalidate_kit_installers():
+    """
+    Marks the registered kit installers as changed, such as when a kit is
+    installed or deleted. Kit installers are searched for again the next
+    time kits are loaded.
+
+    """
+    global KIT_INSTALLER_GENERATION
+
+    KIT_INSTALLER_GENERATION += 1
+    _discover_kit_installers_cached.cache_clear()
+
+
+def get_kit_installers_generation() -> int:
+    """
+    Gets the generation of the registered kit installers, which changes
+    whenever they may have changed.
+
+    :return: the generation
+
+    """
+    return KIT_INSTALLER_GENERATION
+
+
 def get_kit_installer(kit_spec: Tuple[str, str, str]):
     """
     Gets a kit installer from the registry.
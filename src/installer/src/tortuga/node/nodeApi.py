@@ -46,13 +46,14 @@ class NodeApi(TortugaApi):
                       dbHardwareProfile: HardwareProfile,
                       dbSoftwareProfile: Optional[SoftwareProfile] = None,
                       validateIp: bool = True, bGenerateIp: bool = True,
-                      dns_zone: Optional[str] = None) -> NodeModel:
+                      dns_zone: Optional[str] = None,
+                      validateMac: bool = True) -> NodeModel:
         try:
             return self._nodeManager.createNewNode(
                 session, addNodeRequest, dbHardwareProfile,
                 dbSoftwareProfile=dbSoftwareProfile,
                 validateIp=validateIp, bGenerateIp=bGenerateIp,
-                dns_zone=dns_zone)
+                dns_zone=dns_zone, validateMac=validateMac)
         except TortugaException:
             raise
         except Exception as ex:
@@ -61,7 +62,10 @@ class NodeApi(TortugaApi):
             raise TortugaException(exception=ex)
 
     def getNodeList(self, session,
-                    tags: Optional[Tags] = None) -> TortugaObjectList:
+                    tags: Optional[Tags] = None,
+                    optionDict: Optional[OptionDict] = None,
+                    limit: Optional[int] = None,
+                    after: Optional[int] = None) -> TortugaObjectList:
         """
         Get node list..
 
@@ -71,7 +75,9 @@ class NodeApi(TortugaApi):
                 TortugaException
         """
         try:
-            return self._nodeManager.getNodeList(session, tags=tags)
+            return self._nodeManager.getNodeList(
+                session, tags=tags, optionDict=optionDict, limit=limit,
+                after=after)
         except TortugaException:
             raise
         except Exception as ex:
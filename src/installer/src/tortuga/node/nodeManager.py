@@ -14,17 +14,20 @@
 
 # pylint: disable=no-self-use,no-member,no-name-in-module
 
+import concurrent.futures
 import datetime
 import json
 import logging
 import time
 from collections import defaultdict
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.session import Session
 from tortuga.addhost.addHostManager import AddHostManager
 from tortuga.addhost.addHostServerLocal import AddHostServerLocal
 from tortuga.config.configManager import ConfigManager
+from tortuga.db.ipAllocationDbHandler import IpAllocationDbHandler
 from tortuga.db.models.hardwareProfile import \
     HardwareProfile as HardwareProfileModel
 from tortuga.db.models.node import Node as NodeModel
@@ -32,9 +35,12 @@ from tortuga.db.models.nodeRequest import NodeRequest
 from tortuga.db.models.softwareProfile import \
     SoftwareProfile as SoftwareProfileModel
 from tortuga.db.nodeDbApi import NodeDbApi
+from tortuga.db.nodeNameDbHandler import NodeNameDbHandler
 from tortuga.db.nodesDbHandler import NodesDbHandler
+from tortuga.events.dispatcher import batch_listeners
 from tortuga.events.types import NodeStateChanged
 from tortuga.exceptions.configurationError import ConfigurationError
+from tortuga.exceptions.deleteNodeFailed import DeleteNodeFailed
 from tortuga.exceptions.nodeNotFound import NodeNotFound
 from tortuga.exceptions.operationFailed import OperationFailed
 from tortuga.exceptions.tortugaException import TortugaException
@@ -54,6 +60,12 @@ from . import state
 
 OptionDict = Dict[str, bool]
 
+#
+# The maximum number of deleted nodes whose Puppet certificates and files
+# are cleaned up concurrently
+#
+DELETE_NODE_CLEANUP_WORKERS = 8
+
 
 class NodeManager(TortugaObjectManager): \
         # pylint: disable=too-many-public-methods
@@ -67,6 +79,8 @@ class NodeManager(TortugaObjectManager): \
             self._cm)
         self._syncApi = SyncApi()
         self._nodesDbHandler = NodesDbHandler()
+        self._ipAllocationDbHandler = IpAllocationDbHandler()
+        self._nodeNameDbHandler = NodeNameDbHandler()
         self._addHostManager = AddHostManager()
         self._logger = logging.getLogger(NODE_NAMESPACE)
 
@@ -93,7 +107,8 @@ class NodeManager(TortugaObjectManager): \
                       dbHardwareProfile: HardwareProfileModel,
                       dbSoftwareProfile: Optional[SoftwareProfileModel] = None,
                       validateIp: bool = True, bGenerateIp: bool = True,
-                      dns_zone: Optional[str] = None) -> NodeModel:
+                      dns_zone: Optional[str] = None,
+                      validateMac: bool = True) -> NodeModel:
         """
         Convert the addNodeRequest into a Nodes object
 
@@ -132,7 +147,7 @@ class NodeManager(TortugaObjectManager): \
         AddHostServerLocal().initializeNode(
             session, node, dbHardwareProfile, dbSoftwareProfile, nic_defs,
             bValidateIp=validateIp, bGenerateIp=bGenerateIp,
-            dns_zone=dns_zone)
+            dns_zone=dns_zone, bValidateMac=validateMac)
 
         # Set hardware profile of new node
         node.hardwareprofile = dbHardwareProfile
@@ -190,9 +205,12 @@ class NodeManager(TortugaObjectManager): \
                 optionDict=get_default_relations(optionDict))])[0]
 
     def getNodeList(self, session, tags=None,
-                    optionDict: Optional[OptionDict] = None) -> List[Node]:
+                    optionDict: Optional[OptionDict] = None,
+                    limit: Optional[int] = None,
+                    after: Optional[int] = None) -> List[Node]:
         """
-        Return all nodes
+        Return all nodes, or a page of nodes ordered by id if limit or
+        after are specified
 
         """
         return self.__populate_nodes(
@@ -200,7 +218,9 @@ class NodeManager(TortugaObjectManager): \
             self._nodeDbApi.getNodeList(
                 session,
                 tags=tags,
-                optionDict=get_default_relations(optionDict)
+                optionDict=get_default_relations(optionDict),
+                limit=limit,
+                after=after
             )
         )
 
@@ -379,34 +399,23 @@ class NodeManager(TortugaObjectManager): \
         # If the node state has changed, fire the node state changed
         # event
         #
-        if state and (previous_state != state):
+        if changed & 1:
             NodeStateChanged.fire(node=node_dict,
                                   previous_state=previous_state)
 
         return result
 
-    def __process_nodeErrorDict(self, nodeErrorDict):
-        result = {}
-        nodes_deleted = []
-
-        for key, nodeList in nodeErrorDict.items():
-            result[key] = [dbNode.name for dbNode in nodeList]
-
-            if key == 'NodesDeleted':
-                for node in nodeList:
-                    node_deleted = {
-                        'name': node.name,
-                        'hardwareprofile': node.hardwareprofile.name,
-                        'addHostSession': node.addHostSession,
-                    }
-
-                    if node.softwareprofile:
-                        node_deleted['softwareprofile'] = \
-                            node.softwareprofile.name
+    def __get_deleted_node_dict(self, node: NodeModel) -> dict:
+        node_deleted = {
+            'name': node.name,
+            'hardwareprofile': node.hardwareprofile.name,
+            'addHostSession': node.addHostSession,
+        }
 
-                    nodes_deleted.append(node_deleted)
+        if node.softwareprofile:
+            node_deleted['softwareprofile'] = node.softwareprofile.name
 
-        return result, nodes_deleted
+        return node_deleted
 
     def deleteNode(self, session, nodespec: str, force: bool = False):
         """
@@ -414,6 +423,7 @@ class NodeManager(TortugaObjectManager): \
 
         Raises:
             NodeNotFound
+            DeleteNodeFailed
         """
 
         kitmgr = KitActionsManager()
@@ -430,15 +440,7 @@ class NodeManager(TortugaObjectManager): \
 
             self.__preDeleteHost(kitmgr, nodes)
 
-            nodeErrorDict = self.__delete_node(session, nodes)
-
-            # REALLY!?!? Convert a list of Nodes objects into a list of
-            # node names so we can report the list back to the end-user.
-            # This needs to be FIXED!
-
-            result, nodes_deleted = self.__process_nodeErrorDict(nodeErrorDict)
-
-            session.commit()
+            result, nodes_deleted = self.__delete_node(session, nodes)
 
             # ============================================================
             # Perform actions *after* node deletion(s) have been committed
@@ -454,17 +456,20 @@ class NodeManager(TortugaObjectManager): \
             if addHostSessions:
                 self._addHostManager.delete_sessions(addHostSessions)
 
-            for nodeName in result['NodesDeleted']:
-                # Remove the Puppet cert
-                self._bhm.deletePuppetNodeCert(nodeName)
-
-                self._bhm.nodeCleanup(nodeName)
-
-                self._logger.info('Node [%s] deleted' % (nodeName))
+            self.__cleanup_deleted_nodes(result['NodesDeleted'])
 
             # Schedule a cluster update
             self.__scheduleUpdate()
 
+            #
+            # Report the nodes that could not be deleted, now that the
+            # nodes of the other hardware profiles have been taken care of
+            #
+            if result['DeleteNodeFailed']:
+                raise DeleteNodeFailed(
+                    'Error deleting node(s) [{}]'.format(
+                        ' '.join(result['DeleteNodeFailed'])))
+
             return result
         except Exception:
             session.rollback()
@@ -528,8 +533,12 @@ class NodeManager(TortugaObjectManager): \
             raise OperationFailed('\n'.join(errors))
 
     def __delete_node(self, session: Session, dbNodes: List[NodeModel]) \
-            -> Dict[str, List[NodeModel]]:
+            -> Tuple[Dict[str, List[str]], List[dict]]:
         """
+        Returns the names of the nodes, keyed on the result of the delete
+        operation, and a dict for each deleted node, as used by
+        __postDeleteHost().
+
         Raises:
             DeleteNodeFailed
         """
@@ -544,10 +553,14 @@ class NodeManager(TortugaObjectManager): \
         nodes: Dict[HardwareProfileModel, List[NodeModel]] = {}
         events_to_fire: List[dict] = []
 
+        node_ids: List[int] = []
+
         #
         # Mark node states as deleted in the database
         #
         for dbNode in dbNodes:
+            node_ids.append(dbNode.id)
+
             #
             # Capture previous state and node data as a dict for firing
             # the event later on
@@ -567,41 +580,85 @@ class NodeManager(TortugaObjectManager): \
 
         session.commit()
 
+        #
+        # Committing expired the nodes, so reload them in bulk, along with
+        # the relations used to delete them, rather than one at a time
+        #
+        self._nodesDbHandler.getNodesByIds(
+            session, node_ids, options=[selectinload(NodeModel.instance)])
+
         #
         # Fire node state change events
         #
-        for event in events_to_fire:
-            NodeStateChanged.fire(node=event['node'],
-                                  previous_state=event['previous_state'])
+        with batch_listeners():
+            for event in events_to_fire:
+                NodeStateChanged.fire(node=event['node'],
+                                      previous_state=event['previous_state'])
 
         #
         # Call resource adapter with batch(es) of node lists keyed on
-        # hardware profile.
+        # hardware profile. Each batch is deleted in its own transaction,
+        # so that a failing resource adapter does not prevent the nodes
+        # of other hardware profiles from being deleted.
         #
+        nodes_deleted: List[dict] = []
+
         for hwprofile, hwprofile_nodes in nodes.items():
-            # Get the ResourceAdapter
-            adapter = self.__get_resource_adapter(session, hwprofile)
+            node_names = [dbNode.name for dbNode in hwprofile_nodes]
 
-            # Call the resource adapter
-            adapter.deleteNode(hwprofile_nodes)
+            try:
+                #
+                # Deleted nodes are detached once committed, so capture
+                # the node data first
+                #
+                hwprofile_nodes_deleted = [
+                    self.__get_deleted_node_dict(dbNode)
+                    for dbNode in hwprofile_nodes
+                ]
 
-            # Iterate over all nodes in hardware profile, completing the
-            # delete operation.
-            for dbNode in hwprofile_nodes:
-                for tag in dbNode.tags:
-                    if len(tag.nodes) == 1 and \
-                            not tag.softwareprofiles and \
-                            not tag.hardwareprofiles:
-                        session.delete(tag)
+                self.__delete_hardware_profile_nodes(
+                    session, hwprofile, hwprofile_nodes)
 
-                # Delete the Node
-                self._logger.debug('Deleting node [%s]' % (dbNode.name))
+                session.commit()
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception(
+                    'Error deleting nodes from hardware profile [%s]' % (
+                        hwprofile.name))
 
-                session.delete(dbNode)
+                session.rollback()
 
-                result['NodesDeleted'].append(dbNode)
+                result['DeleteNodeFailed'].extend(node_names)
 
-        return result
+                continue
+
+            result['NodesDeleted'].extend(node_names)
+            nodes_deleted.extend(hwprofile_nodes_deleted)
+
+        return result, nodes_deleted
+
+    def __delete_hardware_profile_nodes(
+            self, session: Session, hwprofile: HardwareProfileModel,
+            hwprofile_nodes: List[NodeModel]) -> None:
+        # Get the ResourceAdapter
+        adapter = self.__get_resource_adapter(session, hwprofile)
+
+        # Call the resource adapter
+        adapter.deleteNode(hwprofile_nodes)
+
+        # Iterate over all nodes in hardware profile, completing the
+        # delete operation.
+        for dbNode in hwprofile_nodes:
+            # Release the name and IP addresses of the node
+            self._nodeNameDbHandler.release(session, dbNode.name)
+
+            for dbNic in dbNode.nics:
+                self._ipAllocationDbHandler.release(
+                    session, dbNic.network, dbNic.ip)
+
+            # Delete the Node
+            self._logger.debug('Deleting node [%s]' % (dbNode.name))
+
+            session.delete(dbNode)
 
     def __get_resource_adapter(self, session: Session,
                                hardwareProfile: HardwareProfileModel):
@@ -622,42 +679,25 @@ class NodeManager(TortugaObjectManager): \
 
         return adapter
 
-    def __process_delete_node_result(self, nodeErrorDict):
-        # REALLY!?!? Convert a list of Nodes objects into a list of
-        # node names so we can report the list back to the end-user.
-        # This needs to be FIXED!
-
-        result = {}
-        nodes_deleted = []
-
-        for key, nodeList in nodeErrorDict.items():
-            result[key] = [dbNode.name for dbNode in nodeList]
-
-            if key == 'NodesDeleted':
-                for node in nodeList:
-                    node_deleted = {
-                        'name': node.name,
-                        'hardwareprofile': node.hardwareprofile.name,
-                    }
-
-                    if node.softwareprofile:
-                        node_deleted['softwareprofile'] = \
-                            node.softwareprofile.name
-
-                    nodes_deleted.append(node_deleted)
-
-        return result, nodes_deleted
-
     def __preDeleteHost(self, kitmgr: KitActionsManager, nodes):
         self._logger.debug(
             '__preDeleteHost(): nodes=[%s]' % (
                 ' '.join([node.name for node in nodes])))
 
-        for node in nodes:
+        node_dicts = [
+            {
+                'name': node.name,
+                'hardwareprofile': node.hardwareprofile.name,
+                'softwareprofile': node.softwareprofile.name
+                                   if node.softwareprofile else None,
+            }
+            for node in nodes
+        ]
+
+        for (hwprofile_name, swprofile_name), node_names in \
+                group_nodes_by_profiles(node_dicts).items():
             kitmgr.pre_delete_host(
-                node.hardwareprofile.name,
-                node.softwareprofile.name if node.softwareprofile else None,
-                nodes=[node.name])
+                hwprofile_name, swprofile_name, nodes=node_names)
 
     def __postDeleteHost(self, kitmgr, nodes_deleted):
         # 'nodes_deleted' is a list of dicts of the following format:
@@ -679,12 +719,30 @@ class NodeManager(TortugaObjectManager): \
 
             return
 
-        for node_dict in nodes_deleted:
+        for (hwprofile_name, swprofile_name), node_names in \
+                group_nodes_by_profiles(nodes_deleted).items():
             kitmgr.post_delete_host(
-                node_dict['hardwareprofile'],
-                node_dict['softwareprofile']
-                if 'softwareprofile' in node_dict else None,
-                nodes=[node_dict['name']])
+                hwprofile_name, swprofile_name, nodes=node_names)
+
+    def __cleanup_deleted_nodes(self, node_names: List[str]) -> None:
+        """
+        Removes the Puppet certificates and files of deleted nodes, using
+        a bounded pool of workers.
+
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=DELETE_NODE_CLEANUP_WORKERS) as executor:
+            # Consume the results, raising the first exception, if any
+            for _ in executor.map(self.__cleanup_deleted_node, node_names):
+                pass
+
+    def __cleanup_deleted_node(self, nodeName: str) -> None:
+        # Remove the Puppet cert
+        self._bhm.deletePuppetNodeCert(nodeName)
+
+        self._bhm.nodeCleanup(nodeName)
+
+        self._logger.info('Node [%s] deleted' % (nodeName))
 
     def __scheduleUpdate(self):
         self._syncApi.scheduleClusterUpdate()
@@ -883,13 +941,11 @@ def get_default_relations(relations: Optional[OptionDict]):
 
     result = relations.copy() if relations else {}
 
-    # ensure software and hardware profile relations are loaded
-    result.update({
-        'hardwareprofile': True,
-        'softwareprofile': True,
-        'tags': True,
-        'instance': True,
-    })
+    # ensure software and hardware profile relations are loaded, unless
+    # they are explicitly excluded
+    for relation in ['hardwareprofile', 'softwareprofile', 'tags',
+                     'instance']:
+        result.setdefault(relation, True)
 
     return result
 
@@ -909,3 +965,26 @@ def init_async_node_request(action: str, data: Any, *,
     )
 
     return request
+
+
+def group_nodes_by_profiles(node_dicts: List[dict]) \
+        -> Dict[Tuple[str, Optional[str]], List[str]]:
+    """
+    Group node names by hardware profile and software profile names, so
+    that kit actions are run once per group rather than once per node.
+
+    :param List[dict] node_dicts: dicts with the 'name', 'hardwareprofile'
+                                  and (optional) 'softwareprofile' of
+                                  each node
+
+    :return Dict[Tuple[str, Optional[str]], List[str]]: node names keyed
+        on (hardware profile name, software profile name)
+
+    """
+    groups: Dict[Tuple[str, Optional[str]], List[str]] = defaultdict(list)
+
+    for node_dict in node_dicts:
+        groups[(node_dict['hardwareprofile'],
+                node_dict.get('softwareprofile'))].append(node_dict['name'])
+
+    return groups
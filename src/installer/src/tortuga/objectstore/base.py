@@ -13,7 +13,7 @@
 # limitations under the License.
 
 import logging
-from typing import Any, Dict, Iterator, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from tortuga.logging import OBJECT_STORE_NAMESPACE
 
@@ -39,6 +39,27 @@ COMPARATORS = {
 }
 
 
+def parse_filter(name: str) -> Tuple[List[str], str]:
+    """
+    Splits a filter name into its attribute path and comparator. See
+    matches_filters for the filter syntax.
+
+    :param str name: the filter name, i.e. attr__attr__gt
+
+    :return Tuple[List[str], str]: a tuple containing the list of
+                                   (nested) attribute names, and the
+                                   comparator name
+
+    """
+    parts = name.split('__')
+    if parts[-1] in COMPARATORS.keys():
+        comparator = parts.pop()
+    else:
+        comparator = 'eq'
+
+    return parts, comparator
+
+
 def matches_filters(obj: Union[object, dict],
                     filters: Dict[str, Any]) -> bool:
     """
@@ -66,11 +87,7 @@ def matches_filters(obj: Union[object, dict],
     result = True
 
     for k, right in filters.items():
-        parts = k.split('__')
-        if parts[-1] in COMPARATORS.keys():
-            comparator = parts.pop()
-        else:
-            comparator = 'eq'
+        parts, comparator = parse_filter(k)
 
         left = obj
         for attr in parts:
@@ -110,12 +127,14 @@ class ObjectStore:
         """
         return '{}:{}'.format(self._namespace, key)
 
-    def set(self, key: str, value: dict):
+    def set(self, key: str, value: dict, ttl: Optional[int] = None):
         """
         Saves the object to the object store.
 
         :param str key:    the key name to use for the object
         :param dict value: the object to store, stores {} if None
+        :param int ttl:    the number of seconds after which the object
+                           expires, or None to keep it until it is deleted
 
         """
         raise NotImplementedError()
@@ -159,9 +178,10 @@ class ObjectStore:
         )
 
         count = 0
-        for key, obj in self.list_sorted(order_by=order_by,
-                                         order_desc=order_desc,
-                                         order_alpha=order_alpha):
+        for key, obj in self.list_candidates(order_by=order_by,
+                                             order_desc=order_desc,
+                                             order_alpha=order_alpha,
+                                             **filters):
             if matches_filters(obj, filters):
                 count += 1
                 if limit and count == limit:
@@ -170,6 +190,32 @@ class ObjectStore:
 
                 yield (key, obj)
 
+    def list_candidates(
+            self,
+            order_by: Optional[str] = None,
+            order_desc: bool = False,
+            order_alpha: bool = False,
+            **filters) -> Iterator[Tuple[str, dict]]:
+        """
+        Returns a sorted iterator of the objects that may match the filters.
+        This method is designed to be called by the list() method, which
+        still applies the filters to every object returned, so
+        implementations are free to return a superset of the matching
+        objects. The default implementation returns all objects.
+
+        :param int order_by:     the name of the object attribue to order by
+        :param bool order_desc:  sort in descending order
+        :param bool order_alpha: order alphabetically (instead of numerically)
+        :param filters:          the filters that will be applied
+
+        :return List[Tuple[str, dict]]: a sorted iterator of tuples,
+                                        containing (key, object)
+
+        """
+        return self.list_sorted(order_by=order_by,
+                                order_desc=order_desc,
+                                order_alpha=order_alpha)
+
     def list_sorted(
             self,
             order_by: Optional[str] = None,
@@ -190,6 +236,32 @@ class ObjectStore:
         """
         raise NotImplementedError()
 
+    def list_page(
+            self,
+            order_by: str,
+            order_desc: bool = False,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            **filters) -> Tuple[List[Tuple[str, dict]], Optional[str]]:
+        """
+        Gets a single page of objects from the object store, starting
+        after the position described by an (opaque) cursor.
+
+        :param str order_by:    the name of the object attribute to order by
+        :param bool order_desc: sort in descending order
+        :param int limit:       the maximum number of objects in the page
+        :param str cursor:      the cursor returned with the previous page,
+                                or None to get the first page
+        :param filters:         one or more filters to apply to the list
+
+        :return Tuple[List[Tuple[str, dict]], Optional[str]]:
+            a tuple containing the list of (key, object) tuples in the
+            page, and the cursor for the next page, which is None if there
+            are no more objects
+
+        """
+        raise NotImplementedError()
+
     def delete(self, key: str):
         """
         Deletes an object from the object store.
@@ -199,6 +271,46 @@ class ObjectStore:
         """
         raise NotImplementedError()
 
+    def reindex(self, force: bool = False) -> int:
+        """
+        Builds the index entries of objects that were stored before their
+        indexes existed. This is only done once for each set of index
+        definitions, unless forced, and is designed to be called
+        periodically, or when the object store is first used.
+
+        :param bool force: reindex even if the objects have already been
+                           indexed
+
+        :return int: the number of objects reindexed
+
+        """
+        raise NotImplementedError()
+
+    def sweep(self) -> int:
+        """
+        Cleans up after objects that have expired. This is designed to be
+        called periodically.
+
+        :return int: the number of expired objects cleaned up
+
+        """
+        raise NotImplementedError()
+
+    def trim(self, order_by: str, max_count: int, **filters) -> int:
+        """
+        Deletes the objects matching the filters, that have the lowest
+        values for order_by, until at most max_count remain.
+
+        :param str order_by:  the name of the object attribute to order by
+        :param int max_count: the maximum number of objects to keep
+        :param filters:       one or more filters selecting the objects to
+                              trim
+
+        :return int: the number of objects deleted
+
+        """
+        raise NotImplementedError()
+
     def exists(self, key: str) -> bool:
         """
         Determines whether or not a key exists.
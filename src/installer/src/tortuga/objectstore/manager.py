@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import List, Optional
+
 from redis import Redis
 from tortuga.config.configManager import ConfigManager
 
@@ -28,11 +30,19 @@ class ObjectStoreManager:
     _config_manager: ConfigManager = ConfigManager()
 
     @classmethod
-    def get(cls, namespace: str) -> ObjectStore:
+    def get(cls, namespace: str,
+            equality_indexes: Optional[List[str]] = None,
+            ordered_indexes: Optional[List[str]] = None) -> ObjectStore:
         """
         Get an object store for a specified namespace.
 
-        :param str namespace: the namespace for the object store
+        :param str namespace:              the namespace for the object store
+        :param List[str] equality_indexes: the names of the object
+                                           attributes to maintain equality
+                                           indexes for
+        :param List[str] ordered_indexes:  the names of the object
+                                           attributes to maintain ordered
+                                           indexes for
         :return ObjectStore:  the object store instance
 
         """
@@ -40,4 +50,6 @@ class ObjectStoreManager:
             cls._redis_client = Redis(
                 password=cls._config_manager.getRedisPassword())
         return RedisObjectStore(namespace=namespace,
-                                redis_client=cls._redis_client)
+                                redis_client=cls._redis_client,
+                                equality_indexes=equality_indexes,
+                                ordered_indexes=ordered_indexes)
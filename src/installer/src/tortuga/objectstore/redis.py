@@ -12,14 +12,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import base64
+import binascii
 import json
 import logging
-from typing import Iterator, Optional, Tuple
+import math
+import time
+import uuid
+from typing import (Any, Callable, Dict, Iterator, List, Optional, Set,
+                    Tuple)
 
-from redis.exceptions import ResponseError
+from dateutil.parser import isoparse
+from redis.exceptions import ResponseError, WatchError
 
 from tortuga.logging import OBJECT_STORE_NAMESPACE
-from .base import ObjectStore
+from .base import ObjectStore, matches_filters, parse_filter
 
 logger = logging.getLogger(OBJECT_STORE_NAMESPACE)
 
@@ -29,22 +36,63 @@ class RedisObjectStore(ObjectStore):
     An implementation of the ObjectStore that stores objects in an Redis
     KV store.
 
+    Secondary indexes can be declared for top-level object attributes,
+    which are used to narrow down the objects loaded by list() when
+    filtering:
+
+    - equality indexes are stored as one Redis set per attribute value,
+      and are used for attr=value filters
+    - ordered indexes are stored as a Redis sorted set per attribute,
+      scored by the numeric (or ISO 8601 date/time) attribute value, and
+      are used for attr=value, attr__gt=value and attr__lt=value filters,
+      where value is a number, as well as for paging through objects using
+      list_page()
+
+    Filters on attributes that are not indexed are evaluated by scanning
+    the objects, as usual.
+
     """
     #
-    # A list of reserved keys, that are required for internal use
+    # A list of reserved keys, that are required for internal use. Keys
+    # prefixed with a reserved key (i.e. INDEX:...) are also reserved.
+    #
+    RESERVED_KEYS = ['INDEX', 'QUERY']
+
+    #
+    # The default number of objects fetched per pipeline round trip when
+    # listing objects
     #
-    RESERVED_KEYS = ['INDEX']
+    DEFAULT_FETCH_CHUNK_SIZE = 500
 
-    def __init__(self, namespace: str, redis_client):
+    def __init__(self, namespace: str, redis_client,
+                 fetch_chunk_size: int = DEFAULT_FETCH_CHUNK_SIZE,
+                 equality_indexes: Optional[List[str]] = None,
+                 ordered_indexes: Optional[List[str]] = None):
         """
         Initialization.
 
-        :param str namespace:      the namespace to use for storing objects
-        :param Redis redis_client: the (initialized) redis client to use
+        :param str namespace:        the namespace to use for storing objects
+        :param Redis redis_client:   the (initialized) redis client to use
+        :param int fetch_chunk_size: the maximum number of objects to fetch
+                                     in a single pipelined round trip when
+                                     listing objects
+        :param List[str] equality_indexes: the names of the attributes to
+                                           maintain equality indexes for
+        :param List[str] ordered_indexes:  the names of the attributes to
+                                           maintain ordered indexes for
 
         """
         super().__init__(namespace)
         self._redis = redis_client
+        self._equality_indexes: List[str] = list(equality_indexes or [])
+        self._ordered_indexes: List[str] = list(ordered_indexes or [])
+
+        if fetch_chunk_size < 1:
+            raise ValueError(
+                'fetch_chunk_size must be greater than 0: {}'.format(
+                    fetch_chunk_size)
+            )
+        self._fetch_chunk_size = fetch_chunk_size
 
     def _get_index_key_name(self) -> str:
         """
@@ -55,15 +103,263 @@ class RedisObjectStore(ObjectStore):
         """
         return self.get_key_name('INDEX')
 
-    def set(self, key: str, value: dict):
+    def _get_equality_index_key_name(self, attr: str, value: str) -> str:
+        """
+        Gets the key name for the Redis set indexing the objects that have
+        a specific attribute value.
+
+        :param str attr:  the name of the indexed attribute
+        :param str value: the index value of the attribute
+
+        :return str: the key name
+
+        """
+        return self.get_key_name('INDEX:EQ:{}:{}'.format(attr, value))
+
+    def _get_ordered_index_key_name(self, attr: str) -> str:
+        """
+        Gets the key name for the Redis sorted set indexing the objects
+        by an attribute.
+
+        :param str attr: the name of the indexed attribute
+
+        :return str: the key name
+
+        """
+        return self.get_key_name('INDEX:ORD:{}'.format(attr))
+
+    def _get_expiry_key_name(self) -> str:
+        """
+        Gets the key name for the Redis sorted set indexing the objects
+        that have a ttl by the time they expire.
+
+        :return str: the key name
+
+        """
+        return self.get_key_name('INDEX:EXPIRY')
+
+    def _get_recorded_values_key_name(self) -> str:
+        """
+        Gets the key name for the Redis hash recording the equality index
+        values of each object, so that the index entries of an object can
+        still be removed once Redis has expired it.
+
+        :return str: the key name
+
+        """
+        return self.get_key_name('INDEX:VALUES')
+
+    def _get_index_version_key_name(self) -> str:
+        """
+        Gets the key name for the Redis string recording the index
+        definitions that the existing objects have been indexed for.
+
+        :return str: the key name
+
+        """
+        return self.get_key_name('INDEX:VERSION')
+
+    def _get_index_version(self) -> str:
+        """
+        Gets a description of the index definitions, which changes when
+        indexes are added or removed.
+
+        :return str: the index version
+
+        """
+        return json.dumps([sorted(self._equality_indexes),
+                           sorted(self._ordered_indexes)])
+
+    def _get_indexed_attrs(self) -> List[str]:
+        """
+        Gets the names of all indexed attributes.
+
+        :return List[str]: the attribute names
+
+        """
+        attrs = list(self._equality_indexes)
+        for attr in self._ordered_indexes:
+            if attr not in attrs:
+                attrs.append(attr)
+
+        return attrs
+
+    @staticmethod
+    def _get_index_value(value: Any) -> Optional[str]:
+        """
+        Gets the value used for an equality index entry. This matches the
+        value as it is stored in the Redis hash.
+
+        :param Any value: the attribute value
+
+        :return Optional[str]: the index value, or None if the attribute
+                               value can not be indexed
+
+        """
+        if isinstance(value, bytes):
+            value = value.decode()
+        if isinstance(value, (dict, list, tuple)):
+            return None
+        if value is None:
+            return 'NULL'
+        value = str(value)
+        if value.startswith('JSON:'):
+            return None
+
+        return value
+
+    @staticmethod
+    def _get_index_score(value: Any) -> Optional[float]:
+        """
+        Gets the score used for an ordered index entry.
+
+        :param Any value: the attribute value
+
+        :return Optional[float]: the score, or None if the attribute value
+                                 is not numeric
+
+        """
+        if isinstance(value, bytes):
+            value = value.decode()
+
+        try:
+            score = float(value)
+
+        except (TypeError, ValueError):
+            #
+            # Date/time values, such as timestamps, are scored by their
+            # POSIX timestamp
+            #
+            if not isinstance(value, str):
+                return None
+            try:
+                score = isoparse(value).timestamp()
+            except (ValueError, OverflowError):
+                return None
+
+        if math.isnan(score):
+            return None
+
+        return score
+
+    def _write_indexed(
+            self, key: str,
+            queue_commands: Callable[[Any, Dict[str, Any]], None]):
+        """
+        Writes an object, and its index entries, in a single MULTI/EXEC
+        transaction.
+
+        The index entries to remove depend on the values currently stored
+        for the object, so the object is watched while they are read, and
+        the transaction is retried if the object is changed before it is
+        executed. Otherwise, concurrent writes could each remove the wrong
+        entries, leaving stale entries that point at the object.
+
+        :param str key:                 the key of the object, namespace
+                                        prefixed
+        :param Callable queue_commands: called with the pipeline, and the
+                                        stored values of the indexed
+                                        attributes, to queue the commands
+                                        of the transaction
+
+        """
+        attrs = self._get_indexed_attrs()
+
+        with self._redis.pipeline(transaction=True) as pipeline:
+            while True:
+                try:
+                    old_values: Dict[str, Any] = {}
+
+                    if attrs:
+                        pipeline.watch(key)
+                        values = pipeline.hmget(key, attrs)
+                        old_values = {
+                            attr: value
+                            for attr, value in zip(attrs, values)
+                            if value is not None
+                        }
+                        pipeline.multi()
+
+                    queue_commands(pipeline, old_values)
+                    pipeline.execute()
+
+                    return
+
+                except WatchError:
+                    logger.debug(
+                        '{} changed while being written, retrying'.format(
+                            key))
+
+    def _update_indexes(self, pipeline, key: str,
+                        old_values: Dict[str, Any],
+                        new_values: Dict[str, Any]):
+        """
+        Queues the commands required to update the secondary indexes for an
+        object.
+
+        :param Pipeline pipeline:           the pipeline to queue the index
+                                            commands on
+        :param str key:                     the key of the object, namespace
+                                            prefixed
+        :param Dict[str, Any] old_values:   the previously stored values of
+                                            the indexed attributes
+        :param Dict[str, Any] new_values:   the new values of the indexed
+                                            attributes, attributes that
+                                            are not present are removed
+                                            from the indexes
+
+        """
+        for attr in self._equality_indexes:
+            if attr in old_values:
+                old_value = self._get_index_value(old_values[attr])
+                if old_value is not None:
+                    pipeline.srem(
+                        self._get_equality_index_key_name(attr, old_value),
+                        key
+                    )
+            if attr in new_values:
+                new_value = self._get_index_value(new_values[attr])
+                if new_value is not None:
+                    pipeline.sadd(
+                        self._get_equality_index_key_name(attr, new_value),
+                        key
+                    )
+
+        for attr in self._ordered_indexes:
+            score = None
+            if attr in new_values:
+                score = self._get_index_score(new_values[attr])
+            if score is None:
+                pipeline.zrem(self._get_ordered_index_key_name(attr), key)
+            else:
+                pipeline.zadd(self._get_ordered_index_key_name(attr),
+                              **{key: score})
+
+        recorded_values = {}
+        for attr in self._equality_indexes:
+            if attr in new_values:
+                new_value = self._get_index_value(new_values[attr])
+                if new_value is not None:
+                    recorded_values[attr] = new_value
+        if recorded_values:
+            pipeline.hset(self._get_recorded_values_key_name(), key,
+                          json.dumps(recorded_values))
+        elif self._equality_indexes:
+            pipeline.hdel(self._get_recorded_values_key_name(), key)
+
+    def set(self, key: str, value: dict, ttl: Optional[int] = None):
         """
         See superclass.
 
+        Expiry is handled by Redis. The index entries of expired objects
+        are cleaned up by sweep().
+
         :param key:
         :param value:
+        :param ttl:
 
         """
-        if key in self.RESERVED_KEYS:
+        if key.split(':')[0] in self.RESERVED_KEYS:
             raise Exception('Key reserved for internal use: {}'.format(key))
 
         if not value:
@@ -85,12 +381,29 @@ class RedisObjectStore(ObjectStore):
                 to_store[k] = v
 
         key = self.get_key_name(key)
-        self._redis.hmset(key, to_store)
 
-        #
-        # Create a Redis set for the purposes of indexing, sorting, etc.
-        #
-        self._redis.sadd(self._get_index_key_name(), key)
+        def queue_commands(pipeline, old_values: Dict[str, Any]):
+            pipeline.hmset(key, to_store)
+
+            #
+            # Create a Redis set for the purposes of indexing, sorting, etc.
+            #
+            pipeline.sadd(self._get_index_key_name(), key)
+
+            #
+            # Attributes not present in the value are left untouched in the
+            # hash, so their index entries are also left untouched
+            #
+            new_values = dict(old_values)
+            new_values.update(value)
+            self._update_indexes(pipeline, key, old_values, new_values)
+
+            if ttl is not None:
+                pipeline.expire(key, ttl)
+                pipeline.zadd(self._get_expiry_key_name(),
+                              **{key: time.time() + ttl})
+
+        self._write_indexed(key, queue_commands)
 
     def get(self, key: str) -> Optional[dict]:
         """
@@ -164,9 +477,8 @@ class RedisObjectStore(ObjectStore):
         # Un-ordered list
         #
         if not order_by:
-            for key in self._redis.smembers(self._get_index_key_name()):
-                key = key.decode()
-                yield (self._remove_namespace(key), self._get(key))
+            keys = self._redis.smembers(self._get_index_key_name())
+            yield from self._get_many(keys)
 
             return
 
@@ -175,26 +487,413 @@ class RedisObjectStore(ObjectStore):
         #
         try:
             sort_by = '*->{}'.format(order_by)
-            for key in self._redis.sort(self._get_index_key_name(),
-                                        by=sort_by, desc=order_desc,
-                                        alpha=order_alpha):
-                key = key.decode()
-                yield (self._remove_namespace(key), self._get(key))
+            keys = self._redis.sort(self._get_index_key_name(),
+                                    by=sort_by, desc=order_desc,
+                                    alpha=order_alpha)
+
+        except ResponseError as e:
+            self._raise_sort_error(e, order_by)
+
+        yield from self._get_many(keys)
+
+    def list_candidates(
+            self,
+            order_by: Optional[str] = None,
+            order_desc: bool = False,
+            order_alpha: bool = False,
+            **filters) -> Iterator[Tuple[str, dict]]:
+        """
+        See superclass.
+
+        If any of the filters can be answered using the secondary indexes,
+        only the objects found in the intersection of the matching index
+        entries are loaded.
+
+        :param str order_by:
+        :param bool order_desc:
+        :param bool order_alpha:
+        :param filters:
+
+        :return Iterator[Tuple[str, dict]]:
+
+        """
+        keys = self._query_indexes(filters)
+
+        #
+        # None of the filters are indexed, fall back to loading all objects
+        #
+        if keys is None:
+            yield from self.list_sorted(order_by=order_by,
+                                        order_desc=order_desc,
+                                        order_alpha=order_alpha)
 
             return
 
-        except ResponseError as e:
+        logger.debug('list_candidates({}) -> {} candidates'.format(
+            filters, len(keys)))
+
+        if not keys:
+            return
+
+        if order_by:
+            keys = self._sort_keys(keys, order_by=order_by,
+                                   order_desc=order_desc,
+                                   order_alpha=order_alpha)
+
+        yield from self._get_many(list(keys))
+
+    def _query_indexes(self, filters: Dict[str, Any]) -> Optional[Set[str]]:
+        """
+        Finds the keys of the objects that may match the filters, using the
+        secondary indexes.
+
+        :param Dict[str, Any] filters: the filters to query for
+
+        :return Optional[Set[str]]: the keys of the objects that may match
+                                    the filters, or None if none of the
+                                    filters can be answered by an index
+
+        """
+        equality_keys: List[str] = []
+        ranges: List[Tuple[str, Any, Any]] = []
+
+        for name, value in filters.items():
+            parts, comparator = parse_filter(name)
+            if len(parts) != 1:
+                continue
+            attr = parts[0]
+
+            if comparator == 'eq' and attr in self._equality_indexes:
+                index_value = self._get_index_value(value)
+                if index_value is not None:
+                    equality_keys.append(
+                        self._get_equality_index_key_name(attr, index_value))
+                continue
+
             #
-            # This error means that Redis can't sort this attribute
-            # as a double, which is it's default behavior. We need to
-            # specify order_alpha instead
+            # Only filter values that are actual numbers are answered by
+            # the ordered indexes, as anything else is not compared
+            # numerically by matches_filters
             #
-            if str(e) == "One or more scores can't be converted into double":
-                raise Exception(
-                    '{} must be sorted using order_alpha'.format(order_by)
-                )
+            if attr not in self._ordered_indexes or \
+                    isinstance(value, bool) or \
+                    not isinstance(value, (int, float)):
+                continue
+            score = self._get_index_score(value)
+            if score is None:
+                continue
+
+            index_key = self._get_ordered_index_key_name(attr)
+            if comparator == 'eq':
+                ranges.append((index_key, score, score))
+            elif comparator == 'gt':
+                ranges.append((index_key, '({}'.format(score), '+inf'))
+            elif comparator == 'lt':
+                ranges.append((index_key, '-inf', '({}'.format(score)))
+
+        if not equality_keys and not ranges:
+            return None
+
+        pipeline = self._redis.pipeline(transaction=False)
+        if equality_keys:
+            pipeline.sinter(equality_keys)
+        for index_key, min_score, max_score in ranges:
+            pipeline.zrangebyscore(index_key, min_score, max_score)
+
+        keys: Optional[Set[str]] = None
+        for result in pipeline.execute():
+            result_keys = {k.decode() if isinstance(k, bytes) else k
+                           for k in result}
+            if keys is None:
+                keys = result_keys
             else:
-                raise
+                keys &= result_keys
+
+        return keys
+
+    def _sort_keys(self, keys: Set[str], order_by: str,
+                   order_desc: bool = False,
+                   order_alpha: bool = False) -> List[bytes]:
+        """
+        Sorts a set of object keys by an object attribute. The keys are
+        stored in a temporary set, so that they can be sorted by Redis
+        exactly as the objects in the full index are.
+
+        :param Set[str] keys:    the keys of the objects to sort, namespace
+                                 prefixed
+        :param str order_by:     the name of the object attribute to order by
+        :param bool order_desc:  sort in descending order
+        :param bool order_alpha: order alphabetically (instead of numerically)
+
+        :return List[bytes]: the sorted keys
+
+        """
+        query_key = self.get_key_name('QUERY:{}'.format(uuid.uuid4()))
+
+        pipeline = self._redis.pipeline(transaction=True)
+        pipeline.sadd(query_key, *keys)
+        pipeline.sort(query_key, by='*->{}'.format(order_by),
+                      desc=order_desc, alpha=order_alpha)
+        pipeline.delete(query_key)
+
+        try:
+            _, result, _ = pipeline.execute()
+
+        except ResponseError as e:
+            self._raise_sort_error(e, order_by)
+
+        return result
+
+    def _raise_sort_error(self, e: ResponseError, order_by: str):
+        """
+        Raises a more helpful exception for the errors returned by the
+        Redis SORT command.
+
+        :param ResponseError e: the error returned by Redis
+        :param str order_by:    the name of the object attribute that was
+                                being ordered by
+
+        """
+        #
+        # This error means that Redis can't sort this attribute
+        # as a double, which is it's default behavior. We need to
+        # specify order_alpha instead
+        #
+        if str(e) == "One or more scores can't be converted into double":
+            raise Exception(
+                '{} must be sorted using order_alpha'.format(order_by)
+            )
+
+        raise e
+
+    def _get_many(self, keys: List[bytes]) -> Iterator[Tuple[str, dict]]:
+        """
+        Fetches objects for a list of (namespace prefixed) keys, using a
+        pipeline to batch up to fetch_chunk_size hgetall commands per
+        round trip to Redis. Keys that no longer have an object stored
+        are skipped.
+
+        :param List[bytes] keys: the keys of the objects to fetch
+
+        :return Iterator[Tuple[str, dict]]: an iterator of tuples,
+                                            containing (key, object), in the
+                                            same order as keys
+
+        """
+        keys = [k.decode() if isinstance(k, bytes) else k for k in keys]
+
+        for start in range(0, len(keys), self._fetch_chunk_size):
+            chunk = keys[start:start + self._fetch_chunk_size]
+
+            pipeline = self._redis.pipeline(transaction=False)
+            for key in chunk:
+                pipeline.hgetall(key)
+            results = pipeline.execute()
+
+            for key, result in zip(chunk, results):
+                if not result:
+                    continue
+                yield (self._remove_namespace(key), self._deserialize(result))
+
+    def list_page(
+            self,
+            order_by: str,
+            order_desc: bool = False,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            **filters) -> Tuple[List[Tuple[str, dict]], Optional[str]]:
+        """
+        See superclass.
+
+        Pages are read from the ordered index for order_by, so each page
+        costs O(log N + limit) Redis operations, plus the objects that
+        are skipped by the filters. Objects that do not have a numeric
+        (or date/time) value for order_by are not included.
+
+        :param str order_by:
+        :param bool order_desc:
+        :param int limit:
+        :param str cursor:
+        :param filters:
+
+        :return Tuple[List[Tuple[str, dict]], Optional[str]]:
+
+        """
+        if order_by not in self._ordered_indexes:
+            raise Exception(
+                '{} must have an ordered index to be paged'.format(order_by)
+            )
+
+        if limit < 1:
+            raise Exception('limit must be greater than 0')
+
+        position = self._decode_cursor(cursor, order_by, order_desc) \
+            if cursor else None
+
+        index_key = self._get_ordered_index_key_name(order_by)
+        page: List[Tuple[str, dict]] = []
+
+        while len(page) < limit:
+            #
+            # One extra entry is read, so that it is known whether or not
+            # there is a next page once this one is full
+            #
+            count = limit - len(page) + 1
+            entries = self._get_index_range(index_key, position, count,
+                                            order_desc=order_desc)
+            objs = dict(self._get_many([k for k, _ in entries]))
+
+            consumed = 0
+            for key, score in entries:
+                consumed += 1
+                position = (score, key)
+                key = self._remove_namespace(key)
+                obj = objs.get(key)
+                if obj is not None and matches_filters(obj, filters):
+                    page.append((key, obj))
+                    if len(page) == limit:
+                        break
+
+            #
+            # The end of the index has been reached, so there is no next
+            # page
+            #
+            if len(entries) < count and consumed == len(entries):
+                position = None
+                break
+
+        logger.debug(
+            'list_page(order_by={}, order_desc={}, limit={}, cursor={}, '
+            'filters={}) -> {} objects'.format(
+                order_by, order_desc, limit, cursor, filters, len(page))
+        )
+
+        if position is None:
+            return page, None
+
+        return page, self._encode_cursor(position, order_by, order_desc)
+
+    def _get_index_range(
+            self, index_key: str,
+            position: Optional[Tuple[float, str]],
+            count: int,
+            order_desc: bool = False) -> List[Tuple[str, float]]:
+        """
+        Gets a range of entries from an ordered index, following a position
+        in the index. Entries with the same score are ordered by key, as
+        they are by Redis.
+
+        :param str index_key:                     the key of the ordered
+                                                  index
+        :param Tuple[float, str] position:        the (score, key) position
+                                                  to start after, or None
+                                                  to start at the beginning
+        :param int count:                         the maximum number of
+                                                  entries to get
+        :param bool order_desc:                   walk the index in
+                                                  descending order
+
+        :return List[Tuple[str, float]]: a list of (key, score) tuples
+
+        """
+        if order_desc:
+            range_command = 'zrevrangebyscore'
+            first, last = '+inf', '-inf'
+        else:
+            range_command = 'zrangebyscore'
+            first, last = '-inf', '+inf'
+
+        if position is None:
+            entries = getattr(self._redis, range_command)(
+                index_key, first, last, start=0, num=count, withscores=True)
+            return [(self._decode_key(k), score) for k, score in entries]
+
+        score, key = position
+
+        #
+        # Entries with the same score as the position need to be filtered
+        # by key, the rest of the range can be read starting with the
+        # next score
+        #
+        pipeline = self._redis.pipeline(transaction=False)
+        pipeline.zrangebyscore(index_key, score, score, withscores=True)
+        getattr(pipeline, range_command)(
+            index_key, '({}'.format(score), last, start=0, num=count,
+            withscores=True)
+        ties, following = pipeline.execute()
+
+        ties = sorted(self._decode_key(k) for k, _ in ties)
+        if order_desc:
+            ties = [(k, score) for k in reversed(ties) if k < key]
+        else:
+            ties = [(k, score) for k in ties if k > key]
+
+        following = [(self._decode_key(k), s) for k, s in following]
+
+        return (ties + following)[:count]
+
+    @staticmethod
+    def _decode_key(key) -> str:
+        """
+        Decodes a key returned by Redis.
+
+        :param key: the key, as bytes or str
+
+        :return str: the decoded key
+
+        """
+        return key.decode() if isinstance(key, bytes) else key
+
+    def _encode_cursor(self, position: Tuple[float, str], order_by: str,
+                       order_desc: bool) -> str:
+        """
+        Encodes a position in an ordered index as an opaque cursor.
+
+        :param Tuple[float, str] position: the (score, key) position
+        :param str order_by:               the name of the attribute being
+                                           ordered by
+        :param bool order_desc:            whether or not the order is
+                                           descending
+
+        :return str: the cursor
+
+        """
+        score, key = position
+        data = json.dumps([order_by, order_desc, score,
+                           self._remove_namespace(key)])
+
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def _decode_cursor(self, cursor: str, order_by: str,
+                       order_desc: bool) -> Tuple[float, str]:
+        """
+        Decodes an opaque cursor into a position in an ordered index.
+
+        :param str cursor:      the cursor
+        :param str order_by:    the name of the attribute being ordered by
+        :param bool order_desc: whether or not the order is descending
+
+        :return Tuple[float, str]: the (score, key) position
+
+        :raises Exception: if the cursor is invalid, or was not created
+                           for the same order
+
+        """
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            data = json.loads(
+                base64.urlsafe_b64decode(cursor + padding).decode())
+            cursor_order_by, cursor_order_desc, score, key = data
+            score = float(score)
+
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise Exception('Invalid cursor: {}'.format(cursor))
+
+        if cursor_order_by != order_by or cursor_order_desc != order_desc:
+            raise Exception(
+                'Cursor does not match order: {}'.format(cursor))
+
+        return score, self.get_key_name(key)
 
     def _remove_namespace(self, key: str) -> str:
         """
@@ -216,7 +915,345 @@ class RedisObjectStore(ObjectStore):
 
         """
         logger.debug('delete({})'.format(key))
-        self._redis.delete(self.get_key_name(key))
+
+        key = self.get_key_name(key)
+
+        def queue_commands(pipeline, old_values: Dict[str, Any]):
+            self._queue_delete(pipeline, key, old_values)
+
+        self._write_indexed(key, queue_commands)
+
+    def _queue_delete(self, pipeline, key: str, old_values: Dict[str, Any]):
+        """
+        Queues the commands required to delete an object, and its index
+        entries.
+
+        :param Pipeline pipeline:         the pipeline to queue the commands
+                                          on
+        :param str key:                   the key of the object, namespace
+                                          prefixed
+        :param Dict[str, Any] old_values: the stored values of the indexed
+                                          attributes of the object
+
+        """
+        pipeline.delete(key)
+        pipeline.srem(self._get_index_key_name(), key)
+        pipeline.zrem(self._get_expiry_key_name(), key)
+        self._update_indexes(pipeline, key, old_values, {})
+
+    def _delete_chunk(self, keys: List[str],
+                      get_old_values: Callable[[List[str]],
+                                               Dict[str, Dict[str, Any]]]):
+        """
+        Deletes a chunk of objects, and their index entries, in a single
+        MULTI/EXEC transaction. As in _write_indexed(), the objects are
+        watched while their index values are read, and the transaction is
+        retried if any of them are changed before it is executed.
+
+        :param List[str] keys:          the keys of the objects to delete,
+                                        namespace prefixed
+        :param Callable get_old_values: called with the keys, once they are
+                                        watched, to get the stored values
+                                        of the indexed attributes of each
+                                        object. Objects it does not return
+                                        values for are not deleted.
+
+        :return List[str]: the keys of the deleted objects
+
+        """
+        with self._redis.pipeline(transaction=True) as pipeline:
+            while True:
+                try:
+                    pipeline.watch(*keys)
+                    old_values = get_old_values(keys)
+                    pipeline.multi()
+
+                    for key in keys:
+                        if key in old_values:
+                            self._queue_delete(pipeline, key,
+                                               old_values[key])
+                    pipeline.execute()
+
+                    return [key for key in keys if key in old_values]
+
+                except WatchError:
+                    logger.debug(
+                        'Objects changed while being deleted, retrying')
+
+    def reindex(self, force: bool = False) -> int:
+        """
+        See superclass.
+
+        The objects are found by scanning the index set with SSCAN, and
+        their index entries are added with SADD and ZADD, so reindexing
+        is idempotent, and can run while objects are being written. Once
+        all objects have been indexed, the index definitions are recorded,
+        so that they are not reindexed again until the definitions change.
+
+        :param force:
+
+        :return int:
+
+        """
+        version = self._get_index_version()
+        version_key = self._get_index_version_key_name()
+
+        stored_version = self._redis.get(version_key)
+        if isinstance(stored_version, bytes):
+            stored_version = stored_version.decode()
+        if not force and stored_version == version:
+            return 0
+
+        reindexed = 0
+
+        if self._get_indexed_attrs():
+            chunk: List[str] = []
+            for key in self._redis.sscan_iter(self._get_index_key_name(),
+                                              count=self._fetch_chunk_size):
+                chunk.append(self._decode_key(key))
+                if len(chunk) == self._fetch_chunk_size:
+                    reindexed += self._reindex_chunk(chunk)
+                    chunk = []
+            if chunk:
+                reindexed += self._reindex_chunk(chunk)
+
+        self._redis.set(version_key, version)
+
+        logger.debug('reindex() -> {}'.format(reindexed))
+
+        return reindexed
+
+    def _reindex_chunk(self, keys: List[str]) -> int:
+        """
+        Adds the index entries for a chunk of objects.
+
+        Objects may be updated by set() between reading their values and
+        adding the index entries, so the values are read again afterwards,
+        and the entries of any objects that have changed are corrected.
+
+        :param List[str] keys: the keys of the objects, namespace prefixed
+
+        :return int: the number of objects indexed
+
+        """
+        values = self._get_many_indexed_values(keys)
+
+        pipeline = self._redis.pipeline(transaction=False)
+        for key in keys:
+            if values[key]:
+                self._update_indexes(pipeline, key, {}, values[key])
+        pipeline.execute()
+
+        while True:
+            current = self._get_many_indexed_values(keys)
+            changed = [key for key in keys if current[key] != values[key]]
+            if not changed:
+                break
+
+            pipeline = self._redis.pipeline(transaction=False)
+            for key in changed:
+                self._update_indexes(pipeline, key, values[key],
+                                     current[key])
+            pipeline.execute()
+
+            values = current
+
+        return len([key for key in keys if values[key]])
+
+    def _get_many_indexed_values(
+            self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Gets the currently stored values of all indexed attributes of a
+        list of objects, using a single pipeline.
+
+        :param List[str] keys: the keys of the objects, namespace prefixed
+
+        :return Dict[str, Dict[str, Any]]: the stored values of the indexed
+                                           attributes of each object
+
+        """
+        attrs = self._get_indexed_attrs()
+        if not attrs:
+            return {key: {} for key in keys}
+
+        pipeline = self._redis.pipeline(transaction=False)
+        for key in keys:
+            pipeline.hmget(key, attrs)
+
+        return {
+            key: {attr: value for attr, value in zip(attrs, result)
+                  if value is not None}
+            for key, result in zip(keys, pipeline.execute())
+        }
+
+    def sweep(self) -> int:
+        """
+        See superclass.
+
+        Removes the index entries of objects that have been expired by
+        Redis. The objects due to expire are found by score range in the
+        expiry index, and as the values of expired objects are no longer
+        available, their equality index entries are removed using the
+        values recorded when they were stored.
+
+        :return int:
+
+        """
+        swept = 0
+        offset = 0
+        now = time.time()
+
+        while True:
+            keys = [
+                self._decode_key(key) for key in self._redis.zrangebyscore(
+                    self._get_expiry_key_name(), '-inf', now,
+                    start=offset, num=self._fetch_chunk_size)
+            ]
+            if not keys:
+                break
+
+            deleted = self._delete_chunk(keys, self._get_expired_values)
+            swept += len(deleted)
+
+            #
+            # Objects that have not expired yet, as Redis expires keys
+            # lazily, are left in the expiry index for the next sweep
+            #
+            offset += len(keys) - len(deleted)
+
+        logger.debug('sweep() -> {}'.format(swept))
+
+        return swept
+
+    def _get_expired_values(
+            self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Gets the recorded equality index values of the objects, from a
+        list of keys, that no longer exist.
+
+        :param List[str] keys: the keys to check, namespace prefixed
+
+        :return Dict[str, Dict[str, Any]]: the recorded values of each
+                                           expired object
+
+        """
+        expired = self._find_expired(keys)
+        if not expired:
+            return {}
+
+        recorded_values = self._redis.hmget(
+            self._get_recorded_values_key_name(), expired)
+
+        result = {}
+        for key, values in zip(expired, recorded_values):
+            if isinstance(values, bytes):
+                values = values.decode()
+            result[key] = json.loads(values) if values else {}
+
+        return result
+
+    def _find_expired(self, keys: List[str]) -> List[str]:
+        """
+        Finds the keys, from a list of keys, of the objects that no longer
+        exist.
+
+        :param List[str] keys: the keys to check, namespace prefixed
+
+        :return List[str]: the keys that no longer exist
+
+        """
+        pipeline = self._redis.pipeline(transaction=False)
+        for key in keys:
+            pipeline.exists(key)
+
+        return [key for key, exists in zip(keys, pipeline.execute())
+                if not exists]
+
+    def trim(self, order_by: str, max_count: int, **filters) -> int:
+        """
+        See superclass.
+
+        The objects are counted and trimmed using the indexes, so order_by
+        must have an ordered index, and the filters must all be equality
+        filters on attributes with equality indexes.
+
+        :param order_by:
+        :param max_count:
+        :param filters:
+
+        :return int:
+
+        """
+        if order_by not in self._ordered_indexes:
+            raise Exception(
+                '{} must have an ordered index to be trimmed'.format(
+                    order_by)
+            )
+
+        index_keys = []
+        for name, value in filters.items():
+            parts, comparator = parse_filter(name)
+            index_value = self._get_index_value(value)
+            if len(parts) != 1 or comparator != 'eq' or \
+                    parts[0] not in self._equality_indexes or \
+                    index_value is None:
+                raise Exception(
+                    'Filter can not be used for trimming: {}'.format(name))
+            index_keys.append(
+                self._get_equality_index_key_name(parts[0], index_value))
+
+        if len(index_keys) == 1:
+            count = self._redis.scard(index_keys[0])
+        elif index_keys:
+            count = len(self._redis.sinter(index_keys))
+        else:
+            count = self._redis.zcard(self._get_ordered_index_key_name(
+                order_by))
+
+        excess = count - max_count
+        if excess <= 0:
+            return 0
+
+        #
+        # Walk the ordered index from the lowest value up, deleting
+        # matching objects until enough have been deleted
+        #
+        deleted = 0
+        position = None
+        index_key = self._get_ordered_index_key_name(order_by)
+        while deleted < excess:
+            entries = self._get_index_range(index_key, position,
+                                            self._fetch_chunk_size)
+            if not entries:
+                break
+            position = (entries[-1][1], entries[-1][0])
+
+            keys = [key for key, _ in entries]
+            if index_keys:
+                pipeline = self._redis.pipeline(transaction=False)
+                for key in keys:
+                    for filter_key in index_keys:
+                        pipeline.sismember(filter_key, key)
+                results = pipeline.execute()
+                keys = [
+                    key for i, key in enumerate(keys)
+                    if all(results[i * len(index_keys):
+                                   (i + 1) * len(index_keys)])
+                ]
+
+            #
+            # The matching objects in the chunk are deleted in a single
+            # transaction
+            #
+            keys = keys[:excess - deleted]
+            if keys:
+                deleted += len(self._delete_chunk(
+                    keys, self._get_many_indexed_values))
+
+        logger.debug('trim(order_by={}, max_count={}, filters={}) -> {}'.format(
+            order_by, max_count, filters, deleted))
+
+        return deleted
 
     def exists(self, key: str) -> bool:
         """
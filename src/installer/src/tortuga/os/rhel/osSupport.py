@@ -19,7 +19,6 @@ import time
 from random import choice
 from typing import Any, Dict, List, Optional
 
-from jinja2 import Template
 from sqlalchemy.orm.session import Session
 
 from tortuga.config.configManager import getfqdn
@@ -34,6 +33,7 @@ from tortuga.exceptions.nicNotFound import NicNotFound
 from tortuga.exceptions.nodeNotFound import NodeNotFound
 from tortuga.exceptions.parameterNotFound import ParameterNotFound
 from tortuga.os.osSupportBase import OsSupportBase
+from tortuga.os.templates import get_template
 from tortuga.utility.bootParameters import getBootParameters
 from tortuga.objects.osFamilyInfo import OsFamilyInfo
 
@@ -500,10 +500,9 @@ dd if=/dev/zero of=$d%s bs=512 count=1
         template_subst_dict = self.__get_template_subst_dict(
             session, node, hardwareprofile, softwareprofile)
 
-        with open(self.__get_kickstart_template(softwareprofile)) as fp:
-            tmpl = fp.read()
-
-        return Template(tmpl).render(template_subst_dict)
+        return get_template(
+            self.__get_kickstart_template(softwareprofile)
+        ).render(template_subst_dict)
 
     @staticmethod
     def _generatePassword() -> str:
@@ -0,0 +1,60 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process-wide cache of compiled templates, such as kickstart templates"""
+
+import functools
+import os.path
+
+from jinja2 import (Environment, FileSystemBytecodeCache, FileSystemLoader,
+                    Template)
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_environment(searchpath: str) -> Environment:
+    """
+    Returns the template environment for a directory of templates.
+
+    Templates are compiled once per process, and reloaded when the
+    modification time of the template file changes. The compiled templates
+    are also cached on disk, so that other processes do not have to compile
+    them again.
+
+    :param str searchpath: the template directory
+
+    :return Environment: the template environment
+
+    """
+    return Environment(
+        loader=FileSystemLoader(searchpath),
+        auto_reload=True,
+        bytecode_cache=FileSystemBytecodeCache(),
+    )
+
+
+def get_template(path: str) -> Template:
+    """
+    Returns the compiled template for a template file.
+
+    :param str path: the path of the template file
+
+    :return Template: the template
+
+    Raises:
+        TemplateNotFound
+
+    """
+    searchpath, name = os.path.split(os.path.abspath(path))
+
+    return get_template_environment(searchpath).get_template(name)
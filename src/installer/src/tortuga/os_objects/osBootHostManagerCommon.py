@@ -14,9 +14,11 @@
 
 # pylint: disable=no-member
 
+import hashlib
 import os
 import pwd
 import shutil
+from typing import Dict, List, Tuple
 
 from sqlalchemy.orm.session import Session
 
@@ -47,6 +49,62 @@ class OsBootHostManagerCommon(OsObjectManager):
 
         self._cm = configManager
 
+        #
+        # Content hashes of the files written by this instance, keyed on
+        # file name, along with the inode, modification time, and size of
+        # the file when it was last checked
+        #
+        self._file_hashes: Dict[str, Tuple[Tuple[int, int, int], bytes]] = {}
+
+    def _is_file_current(self, filename: str, digest: bytes) -> bool:
+        """
+        Checks whether a file already has the contents with the given
+        hash. The file is only read when it has been modified since it was
+        last checked.
+
+        :param str filename: the file name
+        :param bytes digest: the content hash of the new contents
+
+        :return bool: True if the file contents are the same
+
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        cached = self._file_hashes.get(filename)
+        if cached is None or cached[0] != key:
+            try:
+                with open(filename, 'rb') as fp:
+                    cached = key, get_content_hash(fp.read())
+            except OSError:
+                return False
+
+            self._file_hashes[filename] = cached
+
+        return cached[1] == digest
+
+    def _file_written(self, filename: str, digest: bytes) -> None:
+        """
+        Records the content hash of a file that has just been written.
+
+        :param str filename: the file name
+        :param bytes digest: the content hash of the file contents
+
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            self._file_hashes.pop(filename, None)
+
+            return
+
+        self._file_hashes[filename] = \
+            (stat.st_ino, stat.st_mtime_ns, stat.st_size), digest
+
     def deletePuppetNodeCert(self, nodeName: str) -> None:
         # Remove the Puppet certificate when the node is reinstalled
 
@@ -96,12 +154,19 @@ class OsBootHostManagerCommon(OsObjectManager):
             shutil.rmtree(private_dir)
 
     def addDhcpLease(self, node: Node, nic: Nic):
-        # Add DHCP lease to DHCP server
+        self.addDhcpLeases([(node, nic)])
+
+    def addDhcpLeases(self, leases: List[Tuple[Node, Nic]]) -> None: \
+            # pylint: disable=unused-argument
+        # Add DHCP leases to DHCP server
         pass
 
-    def removeDhcpLease(self, node: Node) -> None: \
+    def removeDhcpLease(self, node: Node) -> None:
+        self.removeDhcpLeases([node])
+
+    def removeDhcpLeases(self, nodes: List[Node]) -> None: \
             # pylint: disable=unused-argument
-        # Remove the DHCP lease from the DHCP server.  This will be
+        # Remove the DHCP leases from the DHCP server.  This will be
         # a no-op on any platform that doesn't support the operation
         # (ie. any platform not running ISC DHCPD)
         pass
@@ -114,3 +179,7 @@ class OsBootHostManagerCommon(OsObjectManager):
         dbNode.bootFrom = 0
 
         self.deletePuppetNodeCert(dbNode.name)
+
+
+def get_content_hash(contents: bytes) -> bytes:
+    return hashlib.sha256(contents).digest()
@@ -14,10 +14,10 @@
 
 # pylint: disable=no-member
 
+import functools
+import importlib
 import os
-import subprocess
-from textwrap import dedent
-from typing import List, Optional
+from typing import List, Optional, Tuple, Type
 
 from sqlalchemy.orm.session import Session
 
@@ -28,7 +28,10 @@ from tortuga.db.models.softwareProfile import SoftwareProfile
 from tortuga.exceptions.nicNotFound import NicNotFound
 from tortuga.exceptions.osNotSupported import OsNotSupported
 from tortuga.objects.osFamilyInfo import OsFamilyInfo
-from tortuga.os_objects.osBootHostManagerCommon import OsBootHostManagerCommon
+from tortuga.os.osSupportBase import OsSupportBase
+from tortuga.os_objects.osBootHostManagerCommon import \
+    OsBootHostManagerCommon, get_content_hash
+from tortuga.os_objects.rhel.omapiClient import OmapiClient, OmapiError
 from tortuga.resourceAdapter.utility import get_provisioning_nic
 from tortuga.utility.bootParameters import getBootParameters
 
@@ -174,25 +177,16 @@ label Reinstall
 
                 # Call the external support module
                 try:
-                    osSupport = __import__(
-                        'tortuga.os.%s.osSupport' % (osFamilyInfo.name),
-                        globals(), locals(), ['osSupport'], 0)
-
-                    if not hasattr(osSupport, 'OSSupport'):
-                        self._logger.error(
-                            'Invalid OS support module for [%s]' % (
-                                osFamilyInfo.name))
-
-                        return
-
-                    result += osSupport.OSSupport(
-                        osFamilyInfo).getPXEReinstallSnippet(
-                            ksurl, node, hardwareprofile=hwprofile,
-                            softwareprofile=swprofile) + '\n'
-                except ImportError:
+                    OSSupport = get_ossupport_class(osFamilyInfo.name)
+                except OsNotSupported:
                     self._logger.warning(
                         'OS support module not found for [%s]' % (
                             osFamilyInfo.name))
+                else:
+                    result += OSSupport(
+                        osFamilyInfo).getPXEReinstallSnippet(
+                            ksurl, node, hardwareprofile=hwprofile,
+                            softwareprofile=swprofile) + '\n'
             else:
                 bootParams = getBootParameters(hwprofile, swprofile)
 
@@ -202,27 +196,37 @@ label Reinstall
                                           node.name,
                                           bootParams['kernelParams'])
 
-        # Write file contents
+        # Write file contents, unless they have not changed
         filename = self.__getPxelinuxBootFilePath(nic.mac)
 
-        current_euid = os.geteuid()
-        current_egid = os.getegid()
+        contents = result.encode()
+        digest = get_content_hash(contents)
 
-        try:
-            # The PXE file needs to be owned by the 'apache' user, so the
-            # WS API can update it.
-            os.setegid(self.passdata.pw_gid)
-            os.seteuid(self.passdata.pw_uid)
+        if self._is_file_current(filename, digest):
+            self._logger.debug(
+                'PXE file [%s] for node [%s] is unchanged' % (
+                    filename, node.name))
+        else:
+            current_euid = os.geteuid()
+            current_egid = os.getegid()
+
+            try:
+                # The PXE file needs to be owned by the 'apache' user, so
+                # the WS API can update it.
+                os.setegid(self.passdata.pw_gid)
+                os.seteuid(self.passdata.pw_uid)
+
+                fp = os.open(
+                    filename, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o644)
 
-            fp = os.open(
-                filename, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o644)
+                os.write(fp, contents)
 
-            os.write(fp, result.encode())
+                os.close(fp)
+            finally:
+                os.seteuid(current_euid)
+                os.setegid(current_egid)
 
-            os.close(fp)
-        finally:
-            os.seteuid(current_euid)
-            os.setegid(current_egid)
+            self._file_written(filename, digest)
 
         if hwprofile.installType == 'package':
             # Now write out the kickstart file
@@ -241,18 +245,7 @@ label Reinstall
         Raises:
             OsNotSupported
         """
-        osFamilyName = softwareprofile.os.family.name
-
-        try:
-            osSupportModule = __import__(
-                'tortuga.os.%s.osSupport' % (osFamilyName),
-                fromlist=['OSSupport'])
-        except ImportError:
-            raise OsNotSupported(
-                'Operating system family [%s] not supported' % (
-                    osFamilyName))
-
-        OSSupport = osSupportModule.OSSupport
+        OSSupport = get_ossupport_class(softwareprofile.os.family.name)
 
         tmpOsFamilyInfo = OsFamilyInfo(
             softwareprofile.os.family.name,
@@ -262,78 +255,105 @@ label Reinstall
         contents = OSSupport(tmpOsFamilyInfo).getKickstartFileContents(
             session, node, hardwareprofile, softwareprofile)
 
-        with open(self.__get_kickstart_file_path(node), 'w') as fp:
-            fp.write(contents)
+        filename = self.__get_kickstart_file_path(node)
+
+        data = contents.encode()
+        digest = get_content_hash(data)
+
+        if self._is_file_current(filename, digest):
+            self._logger.debug(
+                'Kickstart file [%s] for node [%s] is unchanged' % (
+                    filename, node.name))
+
+            return
+
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+
+        self._file_written(filename, digest)
 
     def _getDhcpNodeName(self, node: Node, nic: Nic): \
             # pylint: disable=unused-argument,no-self-use
         return node.name
 
-    def addDhcpLease(self, node: Node, nic: Nic) -> None:
-        self._logger.debug(
-            'Adding DHCP lease for node [%s] MAC [%s]' % (node.name, nic.mac))
+    def addDhcpLeases(self, leases: List[Tuple[Node, Nic]]) -> None:
+        """
+        Adds host declarations to the running DHCP server, using a single
+        OMAPI connection for all of them.
 
-        dhcpName = self._getDhcpNodeName(node, nic)
+        :param list leases: tuples of the node, and its provisioning nic
 
-        cmds = dedent("""\
-            connect
-            new host
-            set name = "{name}"
-            set hardware-address = {mac}
-            set hardware-type = 1
-            set ip-address = {ip}
-            create
-            """)
+        """
+        if not leases:
+            return
 
-        cmds = cmds.format(name=dhcpName, mac=nic.mac, ip=nic.ip)
+        hosts = []
 
-        p = subprocess.Popen(['/usr/bin/omshell'],
-                             stdin=subprocess.PIPE,
-                             stdout=subprocess.PIPE, encoding='utf-8')
+        for node, nic in leases:
+            self._logger.debug(
+                'Adding DHCP lease for node [%s] MAC [%s]' % (
+                    node.name, nic.mac))
 
-        stdout, _ = p.communicate(cmds)
+            hosts.append((self._getDhcpNodeName(node, nic), nic.mac, nic.ip))
 
-        if p.poll() != 0:
+        try:
+            with OmapiClient() as client:
+                errors = client.add_hosts(hosts)
+        except (OSError, OmapiError) as exc:
             self._logger.error(
-                'Error adding DHCP lease for node [%s] (retval=%d): %s' % (
-                    node.name, p.returncode, stdout))
+                'Error adding DHCP leases for node(s) [%s]: %s' % (
+                    ' '.join(node.name for node, _ in leases), exc))
 
-    def removeDhcpLease(self, node: Node) -> None:
-        # Find first provisioning NIC
-        try:
-            nic = get_provisioning_nic(node)
-        except NicNotFound:
             return
 
-        self._logger.debug(
-            'Removing DHCP lease for node [%s] MAC [%s]' % (
-                node.name, nic.mac))
+        for (node, _), error in zip(leases, errors):
+            if error:
+                self._logger.error(
+                    'Error adding DHCP lease for node [%s]: %s' % (
+                        node.name, error))
 
-        dhcpName = self._getDhcpNodeName(node, nic)
+    def removeDhcpLeases(self, nodes: List[Node]) -> None:
+        """
+        Removes the host declarations of nodes from the running DHCP
+        server, using a single OMAPI connection for all of them. Nodes
+        without a provisioning nic are skipped.
 
-        cmds = dedent("""\
-            connect
-            new host
-            set name = "{name}"
-            set hardware-address = {mac}
-            set hardware-type = 1
-            set ip-address = {ip}
-            open
-            remove
-        """)
+        :param list nodes: the nodes
 
-        cmds = cmds.format(name=dhcpName, mac=nic.mac, ip=nic.ip)
+        """
+        leases = []
 
-        p = subprocess.Popen(['/usr/bin/omshell'],
-                             stdin=subprocess.PIPE,
-                             stdout=subprocess.PIPE, encoding='utf-8')
+        for node in nodes:
+            # Find first provisioning NIC
+            try:
+                nic = get_provisioning_nic(node)
+            except NicNotFound:
+                continue
 
-        stdout, _ = p.communicate(cmds)
+            self._logger.debug(
+                'Removing DHCP lease for node [%s] MAC [%s]' % (
+                    node.name, nic.mac))
+
+            leases.append((node, nic))
+
+        if not leases:
+            return
 
-        if p.poll() != 0:
+        try:
+            with OmapiClient() as client:
+                errors = client.remove_hosts([nic.mac for _, nic in leases])
+        except (OSError, OmapiError) as exc:
             self._logger.error(
-                'Error removing DHCP lease for node [%s] (retval=%d): %s' % (
-                    node.name, p.returncode, stdout))
+                'Error removing DHCP leases for node(s) [%s]: %s' % (
+                    ' '.join(node.name for node, _ in leases), exc))
+
+            return
+
+        for (node, _), error in zip(leases, errors):
+            if error:
+                self._logger.error(
+                    'Error removing DHCP lease for node [%s]: %s' % (
+                        node.name, error))
 
     def getTftproot(self): \
             # pylint: disable=no-self-use
@@ -343,25 +363,8 @@ label Reinstall
 
         return '/var/lib/tftpboot'
 
-    def __get_ossupport_module(self, osFamilyName): \
-            # pylint: disable=no-self-use
-        """
-        Raises:
-            OsNotSupported
-        """
-
-        try:
-            return __import__(
-                'tortuga.os.%s.osSupport' % (osFamilyName),
-                fromlist=['OSSupport']).OSSupport
-        except ImportError:
-            raise OsNotSupported(
-                'Operating system family [%s] not supported' % (
-                    osFamilyName))
-
     def __get_ossupport(self, softwareprofile):
-        OSSupport = self.__get_ossupport_module(
-            softwareprofile.os.family.name)
+        OSSupport = get_ossupport_class(softwareprofile.os.family.name)
 
         tmpOsFamilyInfo = OsFamilyInfo(
             softwareprofile.os.family.name,
@@ -415,3 +418,22 @@ label Reinstall
 
         # Write the updated file
         self.writePXEFile(session, dbNode)
+
+
+@functools.lru_cache(maxsize=None)
+def get_ossupport_class(osFamilyName: str) -> Type[OsSupportBase]:
+    """
+    Returns the OS support class for an operating system family. The
+    class is only looked up once per process.
+
+    Raises:
+        OsNotSupported
+    """
+
+    try:
+        return importlib.import_module(
+            'tortuga.os.%s.osSupport' % (osFamilyName)).OSSupport
+    except (ImportError, AttributeError):
+        raise OsNotSupported(
+            'Operating system family [%s] not supported' % (
+                osFamilyName))
@@ -0,0 +1,364 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Client for the OMAPI protocol of the ISC DHCP server, used to manage host
+declarations in the running server without spawning omshell.
+
+"""
+
+import ipaddress
+import socket
+import struct
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+OMAPI_PROTOCOL_VERSION = 100
+OMAPI_HEADER_SIZE = 24
+
+OMAPI_OP_OPEN = 1
+OMAPI_OP_REFRESH = 2
+OMAPI_OP_UPDATE = 3
+OMAPI_OP_NOTIFY = 4
+OMAPI_OP_STATUS = 5
+OMAPI_OP_DELETE = 6
+
+#
+# The number of requests sent ahead of their responses. The server stops
+# reading requests when its responses are not read, so the number of
+# outstanding requests is bounded.
+#
+PIPELINE_DEPTH = 64
+
+HEADER = struct.Struct('!IIIIII')
+STARTUP = struct.Struct('!II')
+
+#
+# A list of name/value pairs
+#
+Values = List[Tuple[bytes, bytes]]
+
+
+class OmapiError(Exception):
+    pass
+
+
+class OmapiMessage:
+    """
+    An OMAPI message, made up of a header, the message and object values,
+    and a signature, which is empty as messages are not authenticated.
+
+    """
+    def __init__(self, op: int, handle: int = 0, tid: int = 0,
+                 rid: int = 0, message: Optional[Values] = None,
+                 obj: Optional[Values] = None):
+        self.op = op
+        self.handle = handle
+        self.tid = tid
+        self.rid = rid
+        self.message: Values = message or []
+        self.obj: Values = obj or []
+
+    def get_message_value(self, name: bytes) -> Optional[bytes]:
+        return dict(self.message).get(name)
+
+    def get_error(self) -> str:
+        message = self.get_message_value(b'message')
+
+        return message.decode(errors='replace') if message else \
+            'OMAPI operation failed'
+
+    def pack(self) -> bytes:
+        return b''.join([
+            HEADER.pack(0, 0, self.op, self.handle, self.tid, self.rid),
+            pack_values(self.message),
+            pack_values(self.obj),
+        ])
+
+    @classmethod
+    def unpack(cls, buf: bytes) -> Tuple[Optional['OmapiMessage'], int]:
+        """
+        Unpacks a message from the beginning of a buffer.
+
+        :return: a tuple of the message, and its length, or (None, 0) if
+                 the buffer does not hold a complete message
+
+        """
+        if len(buf) < HEADER.size:
+            return None, 0
+
+        authid, authlen, op, handle, tid, rid = HEADER.unpack_from(buf)
+
+        message, offset = unpack_values(buf, HEADER.size)
+        if message is None:
+            return None, 0
+
+        obj, offset = unpack_values(buf, offset)
+        if obj is None or len(buf) < offset + authlen:
+            return None, 0
+
+        return cls(op, handle, tid, rid, message, obj), offset + authlen
+
+
+def pack_values(values: Values) -> bytes:
+    buf = bytearray()
+
+    for name, value in values:
+        buf += struct.pack('!H', len(name)) + name
+        buf += struct.pack('!I', len(value)) + value
+
+    buf += struct.pack('!H', 0)
+
+    return bytes(buf)
+
+
+def unpack_values(buf: bytes,
+                  offset: int) -> Tuple[Optional[Values], int]:
+    values: Values = []
+
+    while True:
+        if len(buf) < offset + 2:
+            return None, 0
+
+        name_len, = struct.unpack_from('!H', buf, offset)
+        offset += 2
+
+        if not name_len:
+            return values, offset
+
+        if len(buf) < offset + name_len + 4:
+            return None, 0
+
+        name = buf[offset:offset + name_len]
+        offset += name_len
+
+        value_len, = struct.unpack_from('!I', buf, offset)
+        offset += 4
+
+        if len(buf) < offset + value_len:
+            return None, 0
+
+        values.append((name, buf[offset:offset + value_len]))
+        offset += value_len
+
+
+def pack_mac(mac: str) -> bytes:
+    return bytes(int(octet, 16) for octet in mac.split(':'))
+
+
+def pack_ip(ip: str) -> bytes:
+    return ipaddress.IPv4Address(ip).packed
+
+
+class OmapiClient:
+    """
+    A connection to the OMAPI port of a DHCP server.
+
+    Requests are pipelined: they are sent without waiting for the
+    responses to earlier requests, so that many host declarations can be
+    added or removed in a single round of the connection.
+
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 7911,
+                 timeout: float = 30.0):
+        self._address = (host, port)
+        self._timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._buf = b''
+        self._tid = 0
+
+    def __enter__(self):
+        self.connect()
+
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self) -> None:
+        """
+        Connects to the server, and exchanges the protocol version.
+
+        Raises:
+            OSError
+            OmapiError
+
+        """
+        self._socket = socket.create_connection(
+            self._address, timeout=self._timeout)
+
+        self._socket.sendall(
+            STARTUP.pack(OMAPI_PROTOCOL_VERSION, OMAPI_HEADER_SIZE))
+
+        version, header_size = STARTUP.unpack(self._recv(STARTUP.size))
+        if (version, header_size) != \
+                (OMAPI_PROTOCOL_VERSION, OMAPI_HEADER_SIZE):
+            raise OmapiError(
+                'Unsupported OMAPI protocol version {}'.format(version))
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def add_hosts(self, hosts: Iterable[Tuple[str, str, str]]) \
+            -> List[Optional[str]]:
+        """
+        Adds host declarations to the server.
+
+        :param hosts: tuples of the name, MAC address, and IP address of
+                      each host
+
+        :return: the error of each host, or None if it was added
+
+        Raises:
+            OSError
+            OmapiError
+
+        """
+        requests = []
+
+        for name, mac, ip in hosts:
+            requests.append(OmapiMessage(
+                OMAPI_OP_OPEN,
+                message=[
+                    (b'type', b'host'),
+                    (b'create', struct.pack('!I', 1)),
+                    (b'exclusive', struct.pack('!I', 1)),
+                ],
+                obj=[
+                    (b'name', name.encode()),
+                    (b'hardware-address', pack_mac(mac)),
+                    (b'hardware-type', struct.pack('!I', 1)),
+                    (b'ip-address', pack_ip(ip)),
+                ]))
+
+        return [
+            None if response.op == OMAPI_OP_UPDATE else response.get_error()
+            for response in self._pipeline(requests)
+        ]
+
+    def remove_hosts(self, macs: Iterable[str]) -> List[Optional[str]]:
+        """
+        Removes the host declarations of MAC addresses from the server.
+        The hosts are looked up, and then deleted by handle.
+
+        :param macs: the MAC addresses
+
+        :return: the error of each host, or None if it was removed
+
+        Raises:
+            OSError
+            OmapiError
+
+        """
+        requests = [
+            OmapiMessage(
+                OMAPI_OP_OPEN,
+                message=[(b'type', b'host')],
+                obj=[
+                    (b'hardware-address', pack_mac(mac)),
+                    (b'hardware-type', struct.pack('!I', 1)),
+                ])
+            for mac in macs
+        ]
+
+        errors: List[Optional[str]] = []
+        handles: Dict[int, int] = {}
+
+        for index, response in enumerate(self._pipeline(requests)):
+            if response.op != OMAPI_OP_UPDATE or not response.handle:
+                errors.append(response.get_error())
+            else:
+                errors.append(None)
+                handles[index] = response.handle
+
+        responses = self._pipeline(
+            [OmapiMessage(OMAPI_OP_DELETE, handle=handle)
+             for handle in handles.values()])
+
+        for index, response in zip(handles, responses):
+            if response.op != OMAPI_OP_STATUS or \
+                    response.get_message_value(b'result') not in \
+                    (None, struct.pack('!I', 0)):
+                errors[index] = response.get_error()
+
+        return errors
+
+    def _pipeline(self, requests: List[OmapiMessage]) -> List[OmapiMessage]:
+        """
+        Sends requests, keeping up to PIPELINE_DEPTH of them outstanding,
+        and returns their responses in the same order.
+
+        """
+        responses: Dict[int, OmapiMessage] = {}
+        tids: List[int] = []
+        pending: Set[int] = set()
+
+        sent = 0
+        while len(responses) < len(requests):
+            batch = []
+
+            while sent < len(requests) and \
+                    sent - len(responses) < PIPELINE_DEPTH:
+                request = requests[sent]
+                request.tid = self._next_tid()
+                tids.append(request.tid)
+                pending.add(request.tid)
+                batch.append(request.pack())
+                sent += 1
+
+            if batch:
+                self._socket.sendall(b''.join(batch))
+
+            response = self._recv_message()
+            if response.rid not in pending:
+                raise OmapiError(
+                    'Unexpected OMAPI response {}'.format(response.rid))
+
+            pending.remove(response.rid)
+            responses[response.rid] = response
+
+        return [responses[tid] for tid in tids]
+
+    def _next_tid(self) -> int:
+        self._tid = (self._tid + 1) & 0xffffffff or 1
+
+        return self._tid
+
+    def _recv_message(self) -> OmapiMessage:
+        while True:
+            message, length = OmapiMessage.unpack(self._buf)
+            if message is not None:
+                self._buf = self._buf[length:]
+
+                return message
+
+            self._fill()
+
+    def _recv(self, size: int) -> bytes:
+        while len(self._buf) < size:
+            self._fill()
+
+        data, self._buf = self._buf[:size], self._buf[size:]
+
+        return data
+
+    def _fill(self) -> None:
+        data = self._socket.recv(65536)
+        if not data:
+            raise OmapiError('OMAPI connection closed by server')
+
+        self._buf += data
+
@@ -128,16 +128,17 @@ class Default(ResourceAdapter):
     def deleteNode(self, nodes: List[Node]) -> None:
         """Remove boot configuration for deleted nodes
         """
-        for node in nodes:
-            self.__delete_boot_configuration(node)
+        self.__delete_boot_configuration(nodes)
 
         self.hookAction('delete', [node.name for node in nodes])
 
-    def __delete_boot_configuration(self, node: Node) -> None:
+    def __delete_boot_configuration(self, nodes: List[Node]) -> None:
         """Remove PXE boot files and DHCP configuration
         """
-        self._bhm.rmPXEFile(node)
-        self._bhm.removeDhcpLease(node)
+        for node in nodes:
+            self._bhm.rmPXEFile(node)
+
+        self._bhm.removeDhcpLeases(nodes)
 
     def rebootNode(self, nodes: List[Node],
                    bSoftReset: Optional[bool] = False):
@@ -198,10 +199,6 @@ class Default(ResourceAdapter):
             addNodesRequest, dbSession, dbHardwareProfile, dbSoftwareProfile,
             dns_zone=dns_zone)
 
-        # This is a necessary evil for the time being, until there's
-        # a proper context manager implemented.
-        self.addHostApi.clear_session_nodes(nodes)
-
         return nodes
 
     def validate_start_arguments(self, addNodesRequest: dict,
@@ -289,8 +286,17 @@ class Default(ResourceAdapter):
         bGenerateIp = dbHardwareProfile.location != 'remote'
 
         newNodes = []
+        leases = []
+
+        #
+        # Validate the MAC addresses of all nodes at once, rather than
+        # one query per nic while each node is created
+        #
+        nic_defs_list = self.addHostApi.validate_mac_addresses(
+            dbSession, dbHardwareProfile,
+            [nodeDict.get('nics', []) for nodeDict in nodeDetails])
 
-        for nodeDict in nodeDetails:
+        for nodeDict, nic_defs in zip(nodeDetails, nic_defs_list):
             addNodeRequest = {}
 
             addNodeRequest['addHostSession'] = self.addHostSession
@@ -301,20 +307,24 @@ class Default(ResourceAdapter):
                 addNodeRequest['rack'] = addNodesRequest['rack']
 
             if 'nics' in nodeDict:
-                addNodeRequest['nics'] = nodeDict['nics']
+                addNodeRequest['nics'] = nic_defs
 
             if 'name' in nodeDict:
                 addNodeRequest['name'] = nodeDict['name']
 
             node = self.nodeApi.createNewNode(
                 dbSession, addNodeRequest, dbHardwareProfile,
-                dbSoftwareProfile, bGenerateIp=bGenerateIp, dns_zone=dns_zone)
+                dbSoftwareProfile, bGenerateIp=bGenerateIp, dns_zone=dns_zone,
+                validateMac=False)
 
             dbSession.add(node)
 
-            # Create DHCP/PXE configuration
-            self.writeLocalBootConfiguration(
-                node, dbHardwareProfile, dbSoftwareProfile)
+            # Create PXE configuration
+            nic = self.writeLocalBootConfiguration(
+                node, dbHardwareProfile, dbSoftwareProfile,
+                addDhcpLease=False)
+            if nic is not None:
+                leases.append((node, nic))
 
             # Get the provisioning nic
             nics = get_provisioning_nics(node)
@@ -327,6 +337,9 @@ class Default(ResourceAdapter):
 
             newNodes.append(node)
 
+        # Add the DHCP leases of all nodes at once
+        self._bhm.addDhcpLeases(leases)
+
         return newNodes
 
     def stop(self, hardwareProfileName, deviceName): \
@@ -448,8 +448,17 @@ class ResourceAdapter(UserDataMixin): \
 
     def writeLocalBootConfiguration(self, node: Node,
                                     hardwareprofile: HardwareProfile,
-                                    softwareprofile: SoftwareProfile):
+                                    softwareprofile: SoftwareProfile,
+                                    addDhcpLease: bool = True) \
+            -> Optional[Nic]:
         """
+        :param bool addDhcpLease: add the DHCP lease of the node, or leave
+                                  it to the caller, so that the leases of
+                                  many nodes can be added at once
+
+        :return: the provisioning nic of the node, or None if no boot
+                 configuration was written
+
         Raises:
             NicNotFound
         """
@@ -491,7 +500,10 @@ class ResourceAdapter(UserDataMixin): \
             softwareprofile=softwareprofile, localboot=False)
 
         # Add a DHCP lease
-        bhm.addDhcpLease(node, nic)
+        if addDhcpLease:
+            bhm.addDhcpLease(node, nic)
+
+        return nic
 
     def removeLocalBootConfiguration(self, node: Node) -> None:
         bhm = self.osObject.getOsBootHostManager(self._cm)
@@ -31,6 +31,17 @@ logging.getLogger(ROOT_NAMESPACE).setLevel(logging.DEBUG)
 logging.getLogger(KIT_NAMESPACE).setLevel(logging.DEBUG)
 
 
+#
+# The number of seconds between event store compactions
+#
+EVENT_STORE_COMPACT_INTERVAL = 300.0
+
+#
+# The number of seconds between checks for node provisioning timeouts
+#
+NODE_PROVISIONING_CHECK_INTERVAL = 30.0
+
+
 class TortugaCeleryApp(Celery):
     """
     Tortuga main celery app.
@@ -85,6 +96,20 @@ else:
         ] + kits_task_modules
     )
 
+    #
+    # Periodic tasks, run by the celery beat scheduler
+    #
+    app.conf.beat_schedule = {
+        'compact-event-store': {
+            'task': 'tortuga.events.tasks.compact_event_store',
+            'schedule': EVENT_STORE_COMPACT_INTERVAL,
+        },
+        'check-node-provisioning-timeouts': {
+            'task': 'tortuga.events.tasks.check_node_provisioning_timeouts',
+            'schedule': NODE_PROVISIONING_CHECK_INTERVAL,
+        },
+    }
+
 
 if __name__ == '__main__':
     app.start()
@@ -58,3 +58,21 @@ def make_options_from_query_string(
     merged_options.update(addl_options)
 
     return merged_options
+
+
+def make_fields_from_query_string(
+        value: Union[list, str, None]) -> Optional[List[str]]:
+    # take a comma separated string, or list of strings, of field names and
+    # convert into a list of field names, or None if no fields were
+    # requested
+
+    if not value:
+        return None
+
+    fields = []
+
+    for fields_ in value if isinstance(value, list) else [value]:
+        fields.extend(
+            field.strip() for field in fields_.split(',') if field.strip())
+
+    return fields or None
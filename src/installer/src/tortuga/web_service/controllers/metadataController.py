@@ -16,6 +16,8 @@ import cherrypy
 from tortuga.db.instanceMetadataDbHandler import InstanceMetadataDbHandler
 from tortuga.schema import InstanceMetadataSchema
 from tortuga.web_service.auth.decorators import authentication_required
+from tortuga.web_service.tools.ndjson import NdjsonStream, \
+    json_or_ndjson_handler, wants_ndjson
 
 from .tortugaController import TortugaController
 
@@ -41,9 +43,21 @@ class MetadataController(TortugaController):
         },
     ]
 
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_ndjson_handler)
     @authentication_required()
     def list(self, **kwargs):
+        if wants_ndjson():
+            return NdjsonStream(
+                lambda session: (
+                    InstanceMetadataSchema().dump(metadata).data
+                    for metadata in instanceMetadataDbHandler.iterate(
+                        session,
+                        filter_key=kwargs.get('filter_key'),
+                        filter_value=kwargs.get('filter_value'),
+                    )
+                )
+            )
+
         try:
             response = InstanceMetadataSchema().dump(
                 instanceMetadataDbHandler.list(
@@ -14,6 +14,8 @@
 
 # pylint: disable=no-member
 
+from typing import Optional
+
 from marshmallow import Schema, ValidationError, fields, validates
 
 import cherrypy
@@ -25,11 +27,28 @@ from tortuga.objects.tortugaObject import TortugaObjectList
 from tortuga.schema import NodeSchema
 from tortuga.utility.helper import str2bool
 from tortuga.web_service.auth.decorators import authentication_required
+from tortuga.web_service.tools.ndjson import NdjsonStream, \
+    json_or_ndjson_handler, wants_ndjson
 
-from .common import make_options_from_query_string, parse_tag_query_string
+from .common import make_fields_from_query_string, \
+    make_options_from_query_string, parse_tag_query_string
 from .tortugaController import TortugaController
 
 
+#
+# Node relations, these are only loaded when they are included in the
+# requested fields
+#
+NODE_RELATIONS = ['hardwareprofile', 'softwareprofile', 'nics', 'tags',
+                  'instance']
+
+
+#
+# The number of nodes loaded at a time when streaming node lists
+#
+NODE_STREAM_BATCH_SIZE = 500
+
+
 class UpdateNodeRequestSchema(Schema):
     state = fields.String(255)
     bootFrom = fields.Integer()
@@ -105,12 +124,21 @@ class NodeController(TortugaController):
         },
     ]
 
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_ndjson_handler)
     @authentication_required()
     def getNodes(self, **kwargs):
         """
         Return list of all available nodes
 
+        The list can be paged through in node id order using the limit
+        and after parameters, where after is the id of the last node of
+        the previous page (returned as "next"). The fields parameter
+        limits the returned fields, and node relations that are not
+        included are not loaded.
+
+        If the client accepts application/x-ndjson, nodes are streamed in
+        node id order, one per line, and loaded in batches.
+
         """
 
         tagspec = []
@@ -119,10 +147,47 @@ class NodeController(TortugaController):
             tagspec.extend(parse_tag_query_string(kwargs['tag']))
 
         try:
-            options = make_options_from_query_string(
-                kwargs['include']
-                if 'include' in kwargs else None,
-                ['softwareprofile', 'hardwareprofile'])
+            limit = self._get_int_param(kwargs, 'limit')
+            after = self._get_int_param(kwargs, 'after')
+            fields = make_fields_from_query_string(kwargs.get('fields'))
+
+            if fields:
+                invalid_fields = set(fields) - set(NodeSchema().fields)
+                if invalid_fields:
+                    raise InvalidArgument(
+                        'Invalid field(s): {}'.format(
+                            ', '.join(sorted(invalid_fields))))
+
+                options = {
+                    relation: relation in fields
+                    for relation in NODE_RELATIONS
+                }
+            else:
+                options = make_options_from_query_string(
+                    kwargs['include']
+                    if 'include' in kwargs else None,
+                    ['softwareprofile', 'hardwareprofile'])
+
+            if limit == 0:
+                raise InvalidArgument('limit must be at least 1')
+
+            paged = limit is not None or after is not None
+
+            if paged and any(kwargs.get(key) for key in
+                             ['addHostSession', 'name', 'installer', 'ip']):
+                raise InvalidArgument(
+                    'limit and after are only supported when listing all'
+                    ' nodes, or nodes by tag')
+
+            if wants_ndjson() and not any(
+                    kwargs.get(key) for key in
+                    ['addHostSession', 'name', 'installer', 'ip']):
+                return NdjsonStream(
+                    lambda session: self._stream_nodes(
+                        session, tagspec,
+                        optionDict=options if fields else None,
+                        fields=fields, limit=limit, after=after)
+                )
 
             if 'addHostSession' in kwargs and kwargs['addHostSession']:
                 nodeList = self.app.node_api.getNodesByAddHostSession(
@@ -140,11 +205,19 @@ class NodeController(TortugaController):
                         cherrypy.request.db, kwargs['ip'])])
             else:
                 nodeList = self.app.node_api.getNodeList(
-                    cherrypy.request.db, tags=tagspec)
+                    cherrypy.request.db, tags=tagspec,
+                    optionDict=options if fields else None,
+                    limit=limit, after=after)
+
+            schema = NodeSchema(only=fields) if fields else NodeSchema()
 
             response = {
-                'nodes': NodeSchema().dump(nodeList, many=True).data
+                'nodes': schema.dump(nodeList, many=True).data
             }
+
+            if paged:
+                response['next'] = nodeList[-1].getId() \
+                    if limit and len(nodeList) == limit else None
         except Exception as ex:  # noqa pylint: disable=broad-except
             self._logger.exception('node WS API getNodes() failed')
             self.handleException(ex)
@@ -152,6 +225,61 @@ class NodeController(TortugaController):
 
         return self.formatResponse(response)
 
+    def _stream_nodes(self, session, tagspec, optionDict=None, fields=None,
+                      limit=None, after=None):
+        """
+        Generates serialized nodes in node id order, loading them in
+        batches of NODE_STREAM_BATCH_SIZE.
+
+        """
+        schema = NodeSchema(only=fields) if fields else NodeSchema()
+        count = 0
+
+        while True:
+            batch_size = NODE_STREAM_BATCH_SIZE
+            if limit is not None:
+                batch_size = min(batch_size, limit - count)
+                if batch_size < 1:
+                    return
+
+            nodeList = self.app.node_api.getNodeList(
+                session, tags=tagspec, optionDict=optionDict,
+                limit=batch_size, after=after)
+
+            for node in nodeList:
+                yield schema.dump(node).data
+
+            count += len(nodeList)
+
+            if len(nodeList) < batch_size:
+                return
+
+            after = nodeList[-1].getId()
+
+            #
+            # Release the nodes that have already been sent
+            #
+            session.expunge_all()
+
+    @staticmethod
+    def _get_int_param(kwargs: dict, name: str) -> Optional[int]:
+        value = kwargs.get(name)
+
+        if value is None or value == '':
+            return None
+
+        try:
+            result = int(value)
+        except ValueError:
+            raise InvalidArgument(
+                '{} must be an integer'.format(name))
+
+        if result < 0:
+            raise InvalidArgument(
+                '{} must not be negative'.format(name))
+
+        return result
+
     @cherrypy.tools.json_out()
     @authentication_required()
     def getNodeById(self, node_id: str, **kwargs):
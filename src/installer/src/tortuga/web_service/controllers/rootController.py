@@ -15,6 +15,8 @@
 import cherrypy
 
 from tortuga.web_service.auth.decorators import authentication_required
+from tortuga.web_service.database import dbm
+from tortuga.web_service.websocket.dispatcher import EventDispatcher
 
 from .tortugaController import TortugaController
 
@@ -31,6 +33,18 @@ class RootController(TortugaController):
             'action': 'ping',
             'method': ['GET']
         },
+        {
+            'name': 'getDatabaseMetrics',
+            'path': '/v1/metrics/database',
+            'action': 'getDatabaseMetrics',
+            'method': ['GET']
+        },
+        {
+            'name': 'getWebsocketMetrics',
+            'path': '/v1/metrics/websocket',
+            'action': 'getWebsocketMetrics',
+            'method': ['GET']
+        },
     ]
 
     @cherrypy.tools.json_out()
@@ -39,3 +53,27 @@ class RootController(TortugaController):
         """
         """
         return {'message': 'hello'}
+
+    @cherrypy.tools.json_out()
+    @authentication_required()
+    def getDatabaseMetrics(self, **kwargs):
+        """
+        Return the web service database connection pool metrics.
+
+        """
+        return dbm.get_pool_stats()
+
+    @cherrypy.tools.json_out()
+    @authentication_required()
+    def getWebsocketMetrics(self, **kwargs):
+        """
+        Return the message queue metrics of the websocket sessions
+        subscribed to events.
+
+        """
+        dispatcher = EventDispatcher.get(create=False)
+
+        return {
+            'sessions': dispatcher.get_queue_stats_threadsafe()
+            if dispatcher else [],
+        }
@@ -21,6 +21,8 @@ import cherrypy
 from tortuga.logging import WEBSERVICE_NAMESPACE
 from tortuga.web_service.auth.decorators import authentication_required
 
+logger = logging.getLogger(WEBSERVICE_NAMESPACE)
+
 
 class Controller(object):
     """
@@ -30,6 +32,7 @@ class Controller(object):
     name = None
     methods = ['GET']
     object_store = None
+    default_page_size = 100
 
     def __init__(self):
         self._logger = logging.getLogger(WEBSERVICE_NAMESPACE)
@@ -82,9 +85,9 @@ class Controller(object):
             elif v.strip().lower() == 'false':
                 params[k] = False
             #
-            # The limit keyword should always be an integer
+            # The limit and page_size keywords should always be integers
             #
-            elif k == 'limit':
+            elif k in ['limit', 'page_size']:
                 params[k] = int(v)
             else:
                 params[k] = v
@@ -105,12 +108,13 @@ class Controller(object):
         try:
             params = self.build_params(query)
 
-            response = []
-            for obj in self.object_store.list(**params):
-                if hasattr(obj, 'schema'):
-                    response.append(obj.schema().dump(obj).data)
-                else:
-                    response.append(obj)
+            if 'page_size' in params or 'cursor' in params:
+                response = self.list_page(params)
+
+            else:
+                response = []
+                for obj in self.object_store.list(**params):
+                    response.append(self.dump_object(obj))
 
         except Exception as ex:
             logger.error(str(ex))
@@ -118,6 +122,60 @@ class Controller(object):
 
         return self.format_response(response)
 
+    def list_page(self, params: dict) -> dict:
+        """
+        Gets a single page of objects from the configured object store.
+        Pages are requested using the page_size and cursor parameters, and
+        the cursor for the next page is returned in the response, i.e.:
+
+            {"items": [...], "next": "<cursor>"}
+
+        The next cursor is null when there are no more objects.
+
+        :param dict params: the list parameters
+
+        :return dict: the page, in dict form
+
+        """
+        #
+        # Pages are read in the order of the (numeric) ordered indexes, so
+        # they can neither be limited, nor ordered alphabetically. These
+        # parameters are not filters, so they are removed either way.
+        #
+        for key in ['limit', 'order_alpha']:
+            if params.pop(key, False):
+                raise Exception(
+                    '{} can not be used with page_size/cursor'.format(key))
+
+        params['limit'] = params.pop('page_size', self.default_page_size)
+
+        #
+        # An empty cursor requests the first page
+        #
+        if not params.get('cursor'):
+            params.pop('cursor', None)
+
+        objs, next_cursor = self.object_store.list_page(**params)
+
+        return {
+            'items': [self.dump_object(obj) for obj in objs],
+            'next': next_cursor,
+        }
+
+    def dump_object(self, obj: Any) -> dict:
+        """
+        Dumps an object from the object store into dict form.
+
+        :param Any obj: the object to dump
+
+        :return dict: the object, in dict form
+
+        """
+        if hasattr(obj, 'schema'):
+            return obj.schema().dump(obj).data
+
+        return obj
+
     @authentication_required()
     @cherrypy.tools.json_out()
     def get(self, id: str) -> dict:
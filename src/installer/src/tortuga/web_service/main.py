@@ -124,7 +124,9 @@ def run_server(daemonize: bool = False, pidfile: str = None,
         app.cm.getWebsocketScheme(),
         app.cm.getWebsocketPort(),
         cherrypy.engine,
-        debug=debug
+        debug=debug,
+        queue_size=app.cm.get_websocket_queue_size(),
+        queue_policy=app.cm.get_websocket_queue_policy()
     ).subscribe()
 
     #
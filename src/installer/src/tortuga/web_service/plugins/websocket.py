@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import asyncio
+import functools
 import logging
 import os
 import ssl
@@ -36,12 +37,16 @@ class WebsocketPlugin(plugins.SimplePlugin):
     A CherryPy plugin that opens a websocket for sending event notifications.
 
     """
-    def __init__(self, scheme: str, port: int, bus, debug: bool = False) -> None:
+    def __init__(self, scheme: str, port: int, bus, debug: bool = False,
+                 queue_size: Optional[int] = None,
+                 queue_policy: Optional[str] = None) -> None:
         super().__init__(bus)
         self._debug = debug
 
         self.scheme = scheme
         self.port = port
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
 
         self._loop: Optional[asyncio.AbstractEventLoop] = None
         self._thread: Optional[threading.Thread] = None
@@ -109,7 +114,7 @@ class WebsocketPlugin(plugins.SimplePlugin):
         ssl_context = self._get_ssl_context()
 
         return websockets.serve(
-            websocket_handler, port=self.port, ssl=ssl_context)
+            self._get_handler(), port=self.port, ssl=ssl_context)
 
     def _get_ssl_context(self) -> ssl.SSLContext:
         cherrypy_cert = cherrypy.config.get('server.ssl_certificate', '')
@@ -135,7 +140,12 @@ class WebsocketPlugin(plugins.SimplePlugin):
             'Starting websocket with SSL/TLS disabled on port {}'.format(
                 self.port))
 
-        return websockets.serve(websocket_handler, port=self.port)
+        return websockets.serve(self._get_handler(), port=self.port)
+
+    def _get_handler(self):
+        return functools.partial(websocket_handler,
+                                 queue_size=self.queue_size,
+                                 queue_policy=self.queue_policy)
 
 
 async def memory_stats():
@@ -152,18 +162,26 @@ async def memory_stats():
             logger.debug('Memory: {}'.format(stat))
 
 
-async def websocket_handler(websocket, path):
+async def websocket_handler(websocket, path,
+                            queue_size: Optional[int] = None,
+                            queue_policy: Optional[str] = None):
     """
     The main websocket handler.
 
-    :param websocket: the websocket server instance
-    :param path:      the path requested on the websocket (unused)
+    :param websocket:        the websocket server instance
+    :param path:             the path requested on the websocket (unused)
+    :param int queue_size:   the maximum number of outbound messages queued
+                             for the session
+    :param str queue_policy: the policy applied when the outbound message
+                             queue is full
 
     """
     logger.debug('New websocket connection established')
 
     try:
-        state_manager = StateManager(websocket=websocket)
+        state_manager = StateManager(websocket=websocket,
+                                     message_queue_size=queue_size,
+                                     message_queue_policy=queue_policy)
         consumer_task = asyncio.ensure_future(
             state_manager.consumer_handler())
         producer_task = asyncio.ensure_future(
@@ -182,4 +200,9 @@ async def websocket_handler(websocket, path):
     for task in pending:
         task.cancel()
 
+    #
+    # Make sure the session no longer receives events
+    #
+    state_manager.state.unsubscribe()
+
     logger.debug('Websocket connection exited')
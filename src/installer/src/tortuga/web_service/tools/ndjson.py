@@ -0,0 +1,101 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+from typing import Callable, Iterable, Iterator
+
+import cherrypy
+from cherrypy.lib import jsontools
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session
+
+from tortuga.logging import WEBSERVICE_NAMESPACE
+
+
+logger = logging.getLogger(WEBSERVICE_NAMESPACE)
+
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+class NdjsonStream:
+    """
+    A response that is streamed to the client as newline delimited JSON,
+    one object per line.
+
+    Request database sessions are closed before streamed response bodies
+    are sent, so the stream is given its own session, which is bound to
+    the same engine as the request session, and closed once the stream
+    ends.
+
+    """
+    def __init__(self, generator: Callable[[Session], Iterable[dict]]):
+        """
+        Initialization.
+
+        :param Callable generator: a callable that takes a database session
+                                   and returns an iterable of
+                                   JSON-serializable objects
+
+        """
+        self._generator = generator
+        self._bind = cherrypy.request.db.get_bind()
+
+    def __iter__(self) -> Iterator[bytes]:
+        session = sessionmaker(bind=self._bind)()
+
+        try:
+            for obj in self._generator(session):
+                yield (json.dumps(obj) + '\n').encode()
+
+        except Exception as ex:
+            #
+            # The response status has already been sent, so the error is
+            # reported as the last line of the stream
+            #
+            logger.exception('Streamed response failed')
+            yield (json.dumps({'error': {'message': str(ex)}}) +
+                   '\n').encode()
+
+        finally:
+            session.close()
+
+
+def wants_ndjson() -> bool:
+    """
+    Whether or not the client asked for a newline delimited JSON response.
+
+    :return bool: True if NDJSON was requested, False otherwise
+
+    """
+    return NDJSON_CONTENT_TYPE in cherrypy.request.headers.get('Accept', '')
+
+
+def json_or_ndjson_handler(*args, **kwargs):
+    """
+    A handler for the json_out tool that streams NdjsonStream responses,
+    and encodes all other responses as JSON.
+
+    """
+    value = cherrypy.serving.request._json_inner_handler(*args, **kwargs)
+
+    if isinstance(value, NdjsonStream):
+        cherrypy.serving.response.headers['Content-Type'] = \
+            NDJSON_CONTENT_TYPE
+        cherrypy.serving.response.stream = True
+
+        return iter(value)
+
+    return jsontools.json.encode(value)
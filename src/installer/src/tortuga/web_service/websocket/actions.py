@@ -16,11 +16,11 @@ from typing import Dict, Type
 
 from marshmallow import fields, Schema
 
-from tortuga.events.manager import PubSubManager
 from tortuga.exceptions.authenticationFailed import AuthenticationFailed
 from tortuga.auth.methods import MultiAuthentionMethod
 from ..auth.methods import WsUsernamePasswordAuthenticationMethod, \
     WsJwtAuthenticationMethod
+from .dispatcher import EventDispatcher
 from .exceptions import AuthenticationRequired, ActionNotFoundError
 from .messages import AuthenticationFailedMessage, \
     AuthenticationSucceededMessage, SubscribeSucceededMessage, \
@@ -204,11 +204,10 @@ class SubscribeAction(BaseAction):
             raise AuthenticationRequired()
 
         #
-        # Don't re-subscribe if they are already subscribed
+        # Subscribe to the shared event subscription of the process. This
+        # does nothing if they are already subscribed.
         #
-        if not self._state.pubsub:
-            self._state.pubsub = PubSubManager.get()
-            self._state.pubsub.subscribe()
+        self._state.subscribe(EventDispatcher.get())
 
         #
         # Enqueue a subscription success message
@@ -238,12 +237,9 @@ class UnsubscribeAction(BaseAction):
             raise AuthenticationRequired()
 
         #
-        # Don't bother unsubcribing them if they currently don't have a
-        # subscription
+        # This does nothing if they currently don't have a subscription
         #
-        if self._state.pubsub:
-            self._state.pubsub.unsubscribe()
-            self._state.pubsub = None
+        self._state.unsubscribe()
 
         #
         # Enqueue a unsubscribe success message
@@ -0,0 +1,240 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from tortuga.events.manager import PubSubManager
+from tortuga.events.pubsub import EventPubSub
+from tortuga.events.types import BaseEvent
+from tortuga.logging import WEBSERVICE_NAMESPACE
+from .state import State
+
+
+logger = logging.getLogger(WEBSERVICE_NAMESPACE)
+
+
+class EventDispatcher:
+    """
+    Delivers events to all subscribed websocket sessions of the process,
+    using a single, shared, event subscription.
+
+    The subscription is read by a background thread, which waits for
+    events, up to POLL_TIMEOUT seconds at a time, and hands each event
+    over to the asyncio event loop, where it is enqueued on the message
+    queue of every subscribed session.
+
+    """
+    #
+    # The number of seconds to wait before re-subscribing, if reading the
+    # subscription fails
+    #
+    RETRY_DELAY = 1
+    #
+    # The maximum number of seconds the subscription is read for at a
+    # time, before checking whether the dispatcher has been stopped
+    #
+    POLL_TIMEOUT = 1
+    #
+    # The maximum number of seconds to wait for the event loop to gather
+    # the message queue metrics, when requested from another thread
+    #
+    STATS_TIMEOUT = 5
+
+    _instance: 'EventDispatcher' = None
+
+    @classmethod
+    def get(cls, create: bool = True) -> Optional['EventDispatcher']:
+        """
+        Gets the event dispatcher for the current event loop, creating it
+        if required.
+
+        :param bool create: whether to create the event dispatcher, if it
+                            does not exist yet
+
+        :return Optional[EventDispatcher]: the event dispatcher instance,
+                                           or None if it does not exist
+                                           and create is False
+
+        """
+        if not cls._instance and create:
+            cls._instance = cls(loop=asyncio.get_event_loop())
+        return cls._instance
+
+    def __init__(self, loop: asyncio.AbstractEventLoop,
+                 pubsub_factory: Callable[[], EventPubSub] =
+                 PubSubManager.get):
+        """
+        Initialization.
+
+        :param AbstractEventLoop loop:   the event loop the websocket
+                                         sessions run on
+        :param Callable pubsub_factory: a callable that returns a new
+                                         event pub/sub instance
+
+        """
+        self._loop = loop
+        self._pubsub_factory = pubsub_factory
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event: Optional[threading.Event] = None
+        self._subscribers: Set[State] = set()
+
+    def subscribe(self, state: State):
+        """
+        Subscribes a websocket session to events. The shared subscription
+        is started with the first subscriber.
+
+        :param State state: the state of the websocket session
+
+        """
+        self._subscribers.add(state)
+
+        if not self._thread:
+            self.start()
+
+    def unsubscribe(self, state: State):
+        """
+        Unsubscribes a websocket session from events.
+
+        :param State state: the state of the websocket session
+
+        """
+        self._subscribers.discard(state)
+
+    def start(self):
+        """
+        Starts the thread that reads the shared subscription.
+
+        """
+        logger.debug('Starting websocket event dispatcher')
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self.worker,
+                                        args=(self._stop_event,),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops reading the shared subscription. The subscription is read,
+        and closed, by the thread only, as pub/sub connections are not
+        thread-safe, so the thread stops within POLL_TIMEOUT seconds.
+
+        """
+        logger.debug('Stopping websocket event dispatcher')
+
+        if self._stop_event:
+            self._stop_event.set()
+        self._stop_event = None
+        self._thread = None
+
+    def worker(self, stop_event: threading.Event):
+        """
+        The thread worker that reads events from the shared subscription.
+
+        :param Event stop_event: the event that is set when the dispatcher
+                                 is stopped
+
+        """
+        while not stop_event.is_set():
+            pubsub: Optional[EventPubSub] = None
+
+            try:
+                pubsub = self._pubsub_factory()
+                pubsub.subscribe()
+
+                #
+                # Events are read with a timeout, rather than by blocking
+                # until the next one arrives, so that the thread notices
+                # when it is stopped, and closes the subscription itself
+                #
+                while not stop_event.is_set():
+                    event = pubsub.get_message(timeout=self.POLL_TIMEOUT)
+                    if event:
+                        self._loop.call_soon_threadsafe(self.dispatch,
+                                                        event)
+
+            except Exception as ex:
+                logger.error(
+                    'Websocket event subscription failed: {}'.format(ex))
+
+            finally:
+                #
+                # Close the subscription before it is replaced, or the
+                # dispatcher is stopped
+                #
+                if pubsub:
+                    try:
+                        pubsub.unsubscribe()
+                    except Exception as ex:
+                        logger.debug(
+                            'Closing websocket event subscription failed: '
+                            '{}'.format(ex))
+
+            stop_event.wait(self.RETRY_DELAY)
+
+    def dispatch(self, event: BaseEvent):
+        """
+        Enqueues an event for all subscribed websocket sessions. This must
+        be called from the event loop.
+
+        :param BaseEvent event: the event to enqueue
+
+        """
+        #
+        # Sessions may be unsubscribed while the event is enqueued, when
+        # their message queue overflows, so iterate over a copy
+        #
+        for state in list(self._subscribers):
+            if state.authenticated:
+                state.enqueue_message(event)
+
+    def get_queue_stats(self) -> List[Dict[str, Any]]:
+        """
+        Gets the message queue metrics for all subscribed websocket
+        sessions.
+
+        :return List[Dict[str, Any]]: a list of queue metrics, one for each
+                                      session
+
+        """
+        stats = []
+        for state in list(self._subscribers):
+            session_stats = state.get_message_queue_stats()
+            session_stats['username'] = state.username
+            stats.append(session_stats)
+
+        return stats
+
+    def get_queue_stats_threadsafe(self) -> List[Dict[str, Any]]:
+        """
+        Gets the message queue metrics for all subscribed websocket
+        sessions, from a thread other than the one running the event loop.
+
+        :return List[Dict[str, Any]]: a list of queue metrics, one for each
+                                      session
+
+        """
+        if not self._loop.is_running():
+            return []
+
+        async def get_queue_stats():
+            return self.get_queue_stats()
+
+        future = asyncio.run_coroutine_threadsafe(get_queue_stats(),
+                                                  self._loop)
+
+        return future.result(self.STATS_TIMEOUT)
@@ -0,0 +1,199 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from tortuga.events.types import BaseEvent
+
+
+#
+# Backpressure policies, applied when a message is enqueued on a full queue
+#
+# drop-oldest: the oldest message in the queue is discarded
+# coalesce:    the message replaces a queued event for the same object, if
+#              there is one, otherwise the oldest message is discarded
+# disconnect:  the message is rejected, and the session is expected to
+#              disconnect the client
+#
+POLICY_DROP_OLDEST = 'drop-oldest'
+POLICY_COALESCE = 'coalesce'
+POLICY_DISCONNECT = 'disconnect'
+
+POLICIES = [POLICY_DROP_OLDEST, POLICY_COALESCE, POLICY_DISCONNECT]
+
+
+class MessageQueue:
+    """
+    A bounded, single consumer, message queue for websocket sessions. All
+    operations are O(1).
+
+    """
+    def __init__(self, maxsize: int, policy: str = POLICY_DROP_OLDEST):
+        """
+        Initialization.
+
+        :param int maxsize: the high-water mark of the queue
+        :param str policy:  the backpressure policy to apply when the
+                            queue is full
+
+        """
+        if maxsize < 1:
+            raise Exception('Message queue size must be at least 1')
+
+        if policy not in POLICIES:
+            raise Exception('Unknown message queue policy: {}'.format(policy))
+
+        self.maxsize = maxsize
+        self.policy = policy
+
+        #
+        # Each queued message is wrapped in a single item list (a slot), so
+        # that coalesced messages can be replaced in place
+        #
+        self._queue: Deque[List[Any]] = deque()
+        self._coalesce_slots: Dict[str, List[Any]] = {}
+        self._ready = asyncio.Event()
+
+        #
+        # Metrics
+        #
+        self.max_depth: int = 0
+        self.dropped: int = 0
+        self.coalesced: int = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def empty(self) -> bool:
+        return not self._queue
+
+    def full(self) -> bool:
+        return len(self._queue) >= self.maxsize
+
+    def put(self, msg: Any, force: bool = False) -> bool:
+        """
+        Adds a message to the end of the queue, applying the backpressure
+        policy if the queue is full.
+
+        :param Any msg:    the message to add
+        :param bool force: add the message even if the queue is full
+
+        :return bool: True if the message was added, False if it was rejected
+
+        """
+        key = self._get_coalesce_key(msg)
+
+        if self.full() and not force:
+            if self.policy == POLICY_DISCONNECT:
+                self.dropped += 1
+                return False
+
+            if self.policy == POLICY_COALESCE and \
+                    key in self._coalesce_slots:
+                self._coalesce_slots[key][0] = msg
+                self.coalesced += 1
+                return True
+
+            self._pop()
+            self.dropped += 1
+
+        slot = [msg]
+        self._queue.append(slot)
+        if key is not None:
+            self._coalesce_slots[key] = slot
+
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._ready.set()
+
+        return True
+
+    def get_nowait(self) -> Any:
+        """
+        Removes and returns the message at the front of the queue.
+
+        :return Any: the message
+
+        :raises IndexError: if the queue is empty
+
+        """
+        msg = self._pop()
+
+        if not self._queue:
+            self._ready.clear()
+
+        return msg
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Waits for a message, and removes and returns it.
+
+        :param Optional[float] timeout: the maximum number of seconds to
+                                        wait, or None to wait until there
+                                        is a message
+
+        :return Optional[Any]: the message, or None if the timeout expired
+
+        """
+        if not self._queue:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+
+            except asyncio.TimeoutError:
+                return None
+
+        return self.get_nowait()
+
+    def clear(self):
+        """
+        Removes all messages from the queue.
+
+        """
+        self._queue.clear()
+        self._coalesce_slots.clear()
+        self._ready.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Gets the metrics for the queue.
+
+        :return Dict[str, Any]: the queue metrics
+
+        """
+        return {
+            'depth': len(self._queue),
+            'max_depth': self.max_depth,
+            'maxsize': self.maxsize,
+            'policy': self.policy,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced
+        }
+
+    def _pop(self) -> Any:
+        slot = self._queue.popleft()
+        msg = slot[0]
+
+        key = self._get_coalesce_key(msg)
+        if key is not None and self._coalesce_slots.get(key) is slot:
+            del self._coalesce_slots[key]
+
+        return msg
+
+    def _get_coalesce_key(self, msg: Any) -> Optional[str]:
+        if self.policy != POLICY_COALESCE or \
+                not isinstance(msg, BaseEvent):
+            return None
+
+        return msg.get_coalesce_key()
@@ -12,12 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
 from datetime import datetime, timedelta
-from typing import List, Union, Optional
+from typing import Any, Dict, Union, Optional
 
 from tortuga.events.types import BaseEvent
-from tortuga.events.pubsub import EventPubSub
-from .messages import BaseMessage
+from tortuga.logging import WEBSERVICE_NAMESPACE
+from .message_queue import MessageQueue, POLICY_DROP_OLDEST
+from .messages import BaseMessage, ErrorMessage
+
+
+logger = logging.getLogger(WEBSERVICE_NAMESPACE)
 
 
 class State:
@@ -26,11 +31,21 @@ class State:
 
     """
     AUTHENTICATION_TIMEOUT = 30  # Seconds
+    MESSAGE_QUEUE_SIZE = 1000
+    MESSAGE_QUEUE_POLICY = POLICY_DROP_OLDEST
 
-    def __init__(self):
+    def __init__(self, message_queue_size: Optional[int] = None,
+                 message_queue_policy: Optional[str] = None):
         """
         Initializer.
 
+        :param int message_queue_size:   the maximum number of messages
+                                         queued for the client, defaults to
+                                         MESSAGE_QUEUE_SIZE
+        :param str message_queue_policy: the policy applied when the message
+                                         queue is full, defaults to
+                                         MESSAGE_QUEUE_POLICY
+
         """
         #
         # Authentication state
@@ -42,8 +57,11 @@ class State:
         #
         # Message queue state
         #
-        self._message_queue: List[Union[BaseMessage, BaseEvent]] = []
-        self.pubsub: EventPubSub = None
+        self._message_queue: MessageQueue = MessageQueue(
+            maxsize=message_queue_size or self.MESSAGE_QUEUE_SIZE,
+            policy=message_queue_policy or self.MESSAGE_QUEUE_POLICY
+        )
+        self.dispatcher: 'EventDispatcher' = None
 
         #
         # Websocket state
@@ -67,6 +85,22 @@ class State:
         """
         self._authentication_timeout = None
 
+    def get_authentication_time_remaining(self) -> Optional[float]:
+        """
+        Gets the number of seconds remaining until the authentication
+        period expires.
+
+        :returns Optional[float]: the number of seconds, or None if there
+                                  is no authentication timeout set
+
+        """
+        if not self._authentication_timeout:
+            return None
+
+        remaining = self._authentication_timeout - datetime.now()
+
+        return max(remaining.total_seconds(), 0)
+
     def is_authentication_timed_out(self) -> bool:
         """
         Determines whether or not the authentication period has expired.
@@ -81,33 +115,77 @@ class State:
 
     def enqueue_message(self, msg: Union[BaseMessage, BaseEvent]):
         """
-        Enqueues a message to be sent to the websocket client.
+        Enqueues a message to be sent to the websocket client. This must be
+        called from the event loop.
 
         :param Union[BaseMessage, BaseEvent] msg: the message to send
 
         """
-        self._message_queue.insert(0, msg)
+        if self._message_queue.put(msg):
+            return
 
-    def next_message(self) -> Optional[Union[BaseMessage, BaseEvent]]:
+        #
+        # The queue is full, and the policy is to disconnect the client,
+        # so we clear the message queue, set the state to exit, set the
+        # reason, and send a final message down the pipe.
+        #
+        logger.warning(
+            'Websocket message queue full, disconnecting {}'.format(
+                self.username))
+
+        self.clear_message_queue()
+        self.exit = True
+        self.exit_reason = 'Message queue full'
+        self._message_queue.put(ErrorMessage(reason=self.exit_reason),
+                                force=True)
+
+    async def next_message(
+            self, timeout: Optional[float] = None
+    ) -> Optional[Union[BaseMessage, BaseEvent]]:
         """
-        Gets the next message to send from the queue.
+        Waits for the next message to send from the queue.
+
+        :param Optional[float] timeout: the maximum number of seconds to
+                                        wait, or None to wait until there
+                                        is a message
 
         :return Optional[Union[BaseMessage, BaseEvent]]: the next message if
-                                                         any, None otherwise
+                                                         any, None if the
+                                                         timeout expired
         """
-        #
-        # Queued messages take priority over pubsub messages
-        #
-        if self._message_queue:
-            return self._message_queue.pop()
+        return await self._message_queue.get(timeout)
 
-        #
-        # If there are no queued messages, check for pubsub messages
-        #
-        if self.authenticated and self.pubsub:
-            return self.pubsub.get_message()
+    def get_message_queue_stats(self) -> Dict[str, Any]:
+        """
+        Gets the message queue metrics for the session.
+
+        :return Dict[str, Any]: the message queue metrics
+
+        """
+        return self._message_queue.get_stats()
+
+    def subscribe(self, dispatcher: 'EventDispatcher'):
+        """
+        Subscribes the user to events.
 
-        return None
+        :param EventDispatcher dispatcher: the dispatcher to receive events
+                                           from
+
+        """
+        if self.dispatcher:
+            return
+
+        self.dispatcher = dispatcher
+        self.dispatcher.subscribe(self)
+
+    def unsubscribe(self):
+        """
+        Unsubscribes the user from events, if subscribed.
+
+        """
+        if self.dispatcher:
+            self.dispatcher.unsubscribe(self)
+        self.dispatcher = None
 
     def clear_message_queue(self):
         """
@@ -116,13 +194,11 @@ class State:
 
         """
         #
-        # Unsubscribe from the event pubsub
+        # Unsubscribe from events
         #
-        if self.pubsub:
-            self.pubsub.unsubscribe()
-        self.pubsub = None
+        self.unsubscribe()
 
         #
         # Clear out the message queue
         #
-        self._message_queue = []
+        self._message_queue.clear()
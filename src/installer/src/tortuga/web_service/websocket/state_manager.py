@@ -12,10 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import asyncio
 import json
 import logging
-from typing import Type, Union
+from typing import Optional, Type, Union
 
 import websockets
 from marshmallow import UnmarshalResult
@@ -37,14 +36,23 @@ class StateManager:
     websocket session.
 
     """
-    def __init__(self, websocket: websockets.WebSocketServerProtocol):
+    def __init__(self, websocket: websockets.WebSocketServerProtocol,
+                 message_queue_size: Optional[int] = None,
+                 message_queue_policy: Optional[str] = None):
         """
         Initializer.
 
+        :param websocket:                the websocket session
+        :param int message_queue_size:   the maximum number of outbound
+                                         messages queued for the session
+        :param str message_queue_policy: the policy applied when the
+                                         outbound message queue is full
+
         """
         logger.debug('Initializing websocket state manager')
         self._websocket = websocket
-        self.state = State()
+        self.state = State(message_queue_size=message_queue_size,
+                           message_queue_policy=message_queue_policy)
         #
         # Enqueue an authentication message to be sent immediately upon
         # the websocket session being established
@@ -151,7 +159,7 @@ class StateManager:
         msg: Union[BaseMessage, BaseEvent] = None
 
         #
-        # This loops spins until there is a message to return
+        # This loop waits until there is a message to return
         #
         while not msg:
             #
@@ -164,19 +172,19 @@ class StateManager:
             #
             if self.state.is_authentication_timed_out():
                 self.state.clear_message_queue()
+                self.state.clear_authentication_timeout()
                 self.state.exit = True
                 self.state.exit_reason = 'Authentication timeout'
                 self.state.enqueue_message(
                     ErrorMessage(reason='Authentication timeout')
                 )
 
-            msg = self.state.next_message()
-
             #
-            # If there is no message to send, we wait for a short period of
-            # time before trying again.
+            # Wait for the next message, but no longer than the time
+            # remaining until the authentication timeout (if any)
             #
-            if not msg:
-                await asyncio.sleep(1)
+            msg = await self.state.next_message(
+                timeout=self.state.get_authentication_time_remaining()
+            )
 
         return msg
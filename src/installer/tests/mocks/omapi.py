@@ -0,0 +1,147 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socketserver
+import threading
+from typing import Dict
+
+from tortuga.os_objects.rhel.omapiClient import (OMAPI_OP_DELETE,
+                                                 OMAPI_OP_OPEN,
+                                                 OMAPI_OP_STATUS,
+                                                 OMAPI_OP_UPDATE, STARTUP,
+                                                 OmapiMessage)
+
+
+class MockOmapiServer(socketserver.ThreadingTCPServer):
+    """
+    An OMAPI server that keeps host declarations in memory, keyed by
+    hardware address.
+
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), MockOmapiHandler)
+
+        self.hosts: Dict[bytes, Dict[bytes, bytes]] = {}
+        self.handles: Dict[int, bytes] = {}
+        self.connections = 0
+        self._next_handle = 1
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def process(self, request: OmapiMessage) -> OmapiMessage:
+        with self._lock:
+            if request.op == OMAPI_OP_OPEN:
+                return self._open(request)
+
+            if request.op == OMAPI_OP_DELETE:
+                return self._delete(request)
+
+            return self._status(request, 'not implemented')
+
+    def _open(self, request: OmapiMessage) -> OmapiMessage:
+        if request.get_message_value(b'type') != b'host':
+            return self._status(request, 'unknown object type')
+
+        obj = dict(request.obj)
+
+        mac = obj.get(b'hardware-address')
+        if mac is None:
+            return self._status(request, 'no key specified')
+
+        if request.get_message_value(b'create'):
+            if mac in self.hosts:
+                return self._status(request, 'already exists')
+
+            self.hosts[mac] = obj
+        elif mac not in self.hosts:
+            return self._status(request, 'not found')
+
+        handle = self._next_handle
+        self._next_handle += 1
+        self.handles[handle] = mac
+
+        return OmapiMessage(OMAPI_OP_UPDATE, handle=handle, rid=request.tid,
+                            obj=list(self.hosts[mac].items()))
+
+    def _delete(self, request: OmapiMessage) -> OmapiMessage:
+        mac = self.handles.pop(request.handle, None)
+        if mac is None or mac not in self.hosts:
+            return self._status(request, 'invalid handle')
+
+        del self.hosts[mac]
+
+        return self._status(request)
+
+    def _status(self, request: OmapiMessage, error: str = None) \
+            -> OmapiMessage:
+        message = [(b'result', b'\x00\x00\x00\x00' if error is None
+                    else b'\x00\x00\x00\x01')]
+        if error is not None:
+            message.append((b'message', error.encode()))
+
+        return OmapiMessage(OMAPI_OP_STATUS, rid=request.tid,
+                            message=message)
+
+
+class MockOmapiHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+
+        buf = self._recv(b'', STARTUP.size)
+        self.request.sendall(buf[:STARTUP.size])
+        buf = buf[STARTUP.size:]
+
+        while True:
+            request, length = OmapiMessage.unpack(buf)
+            if request is None:
+                data = self.request.recv(65536)
+                if not data:
+                    return
+
+                buf += data
+
+                continue
+
+            buf = buf[length:]
+
+            self.request.sendall(self.server.process(request).pack())
+
+    def _recv(self, buf: bytes, size: int) -> bytes:
+        while len(buf) < size:
+            data = self.request.recv(65536)
+            if not data:
+                break
+
+            buf += data
+
+        return buf
@@ -13,16 +13,29 @@
 # limitations under the License.
 
 import fnmatch
-from typing import Dict, List, Union
+import threading
+from typing import Dict, List, Set, Union
 import re
 
+from redis.exceptions import WatchError
+
 
 class MockRedis:
     def __init__(self, *args, **kwargs):
         self._data_store: Dict[bytes, Union[bytes, dict]] = {}
+        self._expires: Dict[bytes, int] = {}
         self._channels: List[bytes] = []
         self._pubsubs: List[PubSub] = []
 
+        #
+        # Incremented whenever a hash is written, so that watched keys can
+        # be checked for changes
+        #
+        self._versions: Dict[bytes, int] = {}
+
+    def _changed(self, bkey: bytes):
+        self._versions[bkey] = self._versions.get(bkey, 0) + 1
+
     def delete(self, key: str):
         bkey = key.encode()
 
@@ -30,22 +43,75 @@ class MockRedis:
             self._data_store.pop(bkey)
         except KeyError:
             pass
+        self._expires.pop(bkey, None)
+        self._changed(bkey)
 
     def exists(self, key: str) -> bool:
         bkey = key.encode()
 
         return bkey in self._data_store.keys()
 
+    def expire(self, key: str, seconds: int):
+        bkey = key.encode()
+
+        self._expires[bkey] = seconds
+
+    def ttl(self, key: str) -> int:
+        bkey = key.encode()
+
+        return self._expires.get(bkey, -1)
+
+    def scan_iter(self, match: str = None, count: int = None):
+        for bkey in list(self._data_store.keys()):
+            if match is None or fnmatch.fnmatch(bkey.decode(), match):
+                yield bkey
+
+    def get(self, key: str) -> bytes:
+        bkey = key.encode()
+
+        return self._data_store.get(bkey, None)
+
+    def set(self, key: str, value: str):
+        bkey = key.encode()
+
+        self._data_store[bkey] = value.encode()
+
     def hmset(self, key: str, value: dict):
         bkey = key.encode()
 
-        self._data_store[bkey] = value
+        hsh = self._data_store.get(bkey, {})
+        hsh.update(value)
+        self._data_store[bkey] = hsh
+        self._changed(bkey)
+
+    def hset(self, key: str, field: str, value: str):
+        bkey = key.encode()
+
+        hsh = self._data_store.get(bkey, {})
+        hsh[field] = value
+        self._data_store[bkey] = hsh
+        self._changed(bkey)
+
+    def hdel(self, key: str, *fields: str):
+        bkey = key.encode()
+
+        hsh = self._data_store.get(bkey, {})
+        for field in fields:
+            hsh.pop(field, None)
+        self._changed(bkey)
 
     def hgetall(self, key: str) -> dict:
         bkey = key.encode()
 
         return self._data_store.get(bkey, None)
 
+    def hmget(self, key: str, fields: List[str]) -> list:
+        bkey = key.encode()
+
+        hsh = self._data_store.get(bkey, {})
+
+        return [hsh.get(field, None) for field in fields]
+
     def keys(self, pattern: str) -> List[bytes]:
         keys: List[bytes] = []
 
@@ -68,24 +134,120 @@ class MockRedis:
         for pubsub in self._pubsubs:
             pubsub._new_message(bchannel, bvalue)
 
+    def pipeline(self, transaction: bool = True) -> 'Pipeline':
+        return Pipeline(self)
+
     def pubsub(self) -> 'PubSub':
         p = PubSub(self)
         self._pubsubs.append(p)
 
         return p
 
-    def sadd(self, key: str, value: str):
+    def sadd(self, key: str, *values: str):
         bkey = key.encode()
 
         set_ = self._data_store.get(bkey, [])
-        set_.append(value.encode())
+        for value in values:
+            bvalue = value.encode()
+            if bvalue not in set_:
+                set_.append(bvalue)
         self._data_store[bkey] = set_
 
+    def srem(self, key: str, *values: str):
+        bkey = key.encode()
+
+        set_ = self._data_store.get(bkey, [])
+        for value in values:
+            bvalue = value.encode()
+            if bvalue in set_:
+                set_.remove(bvalue)
+
     def smembers(self, key: str) -> List[bytes]:
         bkey = key.encode()
 
         return self._data_store.get(bkey, [])
 
+    def sismember(self, key: str, value: str) -> bool:
+        return value.encode() in self.smembers(key)
+
+    def scard(self, key: str) -> int:
+        return len(self.smembers(key))
+
+    def sscan_iter(self, key: str, count: int = None):
+        yield from list(self.smembers(key))
+
+    def sinter(self, keys: List[str]) -> Set[bytes]:
+        result = set(self.smembers(keys[0]))
+        for key in keys[1:]:
+            result &= set(self.smembers(key))
+
+        return result
+
+    def zadd(self, key: str, **scores: float):
+        bkey = key.encode()
+
+        zset = self._data_store.get(bkey, {})
+        for value, score in scores.items():
+            zset[value.encode()] = float(score)
+        self._data_store[bkey] = zset
+
+    def zcard(self, key: str) -> int:
+        bkey = key.encode()
+
+        return len(self._data_store.get(bkey, {}))
+
+    def zrem(self, key: str, *values: str):
+        bkey = key.encode()
+
+        removed = 0
+        zset = self._data_store.get(bkey, {})
+        for value in values:
+            if zset.pop(value.encode(), None) is not None:
+                removed += 1
+
+        return removed
+
+    def zrangebyscore(self, key: str, min_score, max_score,
+                      start: int = None, num: int = None,
+                      withscores: bool = False) -> list:
+        return self._zrange(key, min_score, max_score, start=start, num=num,
+                            withscores=withscores)
+
+    def zrevrangebyscore(self, key: str, max_score, min_score,
+                         start: int = None, num: int = None,
+                         withscores: bool = False) -> list:
+        return self._zrange(key, min_score, max_score, start=start, num=num,
+                            withscores=withscores, desc=True)
+
+    def _zrange(self, key: str, min_score, max_score, start: int = None,
+                num: int = None, withscores: bool = False,
+                desc: bool = False) -> list:
+        bkey = key.encode()
+
+        def parse(score):
+            score = str(score)
+            if score.startswith('('):
+                return float(score[1:]), True
+            return float(score), False
+
+        min_score, min_exclusive = parse(min_score)
+        max_score, max_exclusive = parse(max_score)
+
+        result = []
+        zset = self._data_store.get(bkey, {})
+        for value, score in sorted(zset.items(), key=lambda i: (i[1], i[0]),
+                                   reverse=desc):
+            if score < min_score or (min_exclusive and score == min_score):
+                continue
+            if score > max_score or (max_exclusive and score == max_score):
+                continue
+            result.append((value, score) if withscores else value)
+
+        if start is not None:
+            result = result[start:start + num]
+
+        return result
+
     def sort(self, key: str, by: str = None, desc: bool = False,
              alpha: bool = False) -> List[bytes]:
         result = self.smembers(key)
@@ -106,19 +268,80 @@ class MockRedis:
         return result
 
 
+class Pipeline:
+    def __init__(self, redis_client: MockRedis):
+        self._redis: MockRedis = redis_client
+        self._commands: List[tuple] = []
+        self._watched: Dict[bytes, int] = {}
+        self._watching = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.reset()
+
+    def __getattr__(self, name: str):
+        method = getattr(self._redis, name)
+
+        #
+        # Commands run immediately while keys are being watched, until
+        # multi() is called
+        #
+        if self._watching:
+            return method
+
+        def queue_command(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue_command
+
+    def watch(self, *keys: str):
+        self._watching = True
+        for key in keys:
+            bkey = key.encode()
+            self._watched[bkey] = self._redis._versions.get(bkey, 0)
+
+    def multi(self):
+        self._watching = False
+
+    def reset(self):
+        self._commands = []
+        self._watched = {}
+        self._watching = False
+
+    def execute(self) -> list:
+        for bkey, version in self._watched.items():
+            if self._redis._versions.get(bkey, 0) != version:
+                self.reset()
+                raise WatchError('Watched variable changed.')
+
+        commands = self._commands
+        self.reset()
+
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
 class PubSub:
     def __init__(self, redis_client: MockRedis):
         self._redis: MockRedis = redis_client
         self._patterns: List[bytes] = []
         self._subscriptions: List[bytes] = []
         self._messages: List[dict] = []
+        self._condition = threading.Condition()
 
-    def get_message(self, ignore_subscribe_messages: bool = True):
-        try:
-            return self._messages.pop()
+    def get_message(self, ignore_subscribe_messages: bool = True,
+                    timeout: float = 0):
+        with self._condition:
+            if not self._messages and timeout:
+                self._condition.wait(timeout)
 
-        except IndexError:
-            return None
+            try:
+                return self._messages.pop()
+
+            except IndexError:
+                return None
 
     def psubscribe(self, pattern: str):
         bpattern = pattern.encode()
@@ -139,9 +362,14 @@ class PubSub:
         self._subscriptions.append(bchannel)
 
     def unsubscribe(self):
-        self._patterns = []
-        self._subscriptions = []
-        self._messages = []
+        with self._condition:
+            self._patterns = []
+            self._subscriptions = []
+            self._messages = []
+            self._condition.notify_all()
+
+    def close(self):
+        self.unsubscribe()
 
     def _new_channel(self):
         """
@@ -164,7 +392,10 @@ class PubSub:
             return
 
         msg = {
+            'type': 'message',
             'data': message
         }
-        self._messages.insert(0, msg)
+        with self._condition:
+            self._messages.insert(0, msg)
+            self._condition.notify_all()
 
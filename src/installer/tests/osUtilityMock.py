@@ -35,6 +35,30 @@ class MockBootHostManager:
             # pylint: disable=unused-argument
         pass
 
+    def addDhcpLeases(self, *args, **kwargs): \
+            # pylint: disable=unused-argument
+        pass
+
+    def rmPXEFile(self, *args, **kwargs): \
+            # pylint: disable=unused-argument
+        pass
+
+    def removeDhcpLease(self, *args, **kwargs): \
+            # pylint: disable=unused-argument
+        pass
+
+    def removeDhcpLeases(self, *args, **kwargs): \
+            # pylint: disable=unused-argument
+        pass
+
+    def deletePuppetNodeCert(self, *args, **kwargs): \
+            # pylint: disable=unused-argument
+        pass
+
+    def nodeCleanup(self, *args, **kwargs): \
+            # pylint: disable=unused-argument
+        pass
+
 
 class MockOsObjectFactory:
     def getOsBootHostManager(self, configManager: ConfigManager): \
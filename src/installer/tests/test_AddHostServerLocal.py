@@ -15,6 +15,7 @@
 # pylint: disable=protected-access
 
 import pytest
+from sqlalchemy import event
 
 from tortuga.addhost.addHostServerLocal import (AddHostServerLocal,
                                                 get_host_name)
@@ -24,6 +25,8 @@ from tortuga.db.networksDbHandler import NetworksDbHandler
 from tortuga.db.softwareProfilesDbHandler import SoftwareProfilesDbHandler
 from tortuga.exceptions.invalidArgument import InvalidArgument
 from tortuga.exceptions.invalidMacAddress import InvalidMacAddress
+from tortuga.exceptions.macAddressAlreadyExists import \
+    MacAddressAlreadyExists
 from tortuga.exceptions.networkNotFound import NetworkNotFound
 
 
@@ -44,7 +47,7 @@ def test_generate_node_name(dbm):
 
         assert name1 != name2, 'failed to generate unique node name'
 
-        api.clear_session_node(Node(name=name1))
+        api.release_node_name(session, Node(name=name1))
 
         name3 = api.generate_node_name(session, name_format)
 
@@ -55,7 +58,7 @@ def test_generate_provisioning_ip_address(dbm):
     with dbm.session() as session:
         networks = NetworksDbHandler().getNetworkList(session)
 
-        result = api.generate_provisioning_ip_address(networks[0])
+        result = api.generate_provisioning_ip_address(session, networks[0])
 
         assert result
 
@@ -124,6 +127,48 @@ def test_validate_mac_address(dbm, mac):
         api._validate_mac_address(session, mac, prov_network)
 
 
+def test_validate_mac_addresses(dbm):
+    with dbm.session() as session:
+        hardware_profile = HardwareProfilesDbHandler().getHardwareProfile(
+            session, 'localiron'
+        )
+
+        # ensure hardware profile networks are loaded before counting
+        assert hardware_profile.hardwareprofilenetworks[0].network
+
+        nic_defs_list = [
+            [{'mac': '02{:010x}'.format(n)}] for n in range(5000)
+        ]
+
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args)
+
+        event.listen(dbm.engine, 'before_cursor_execute', count_statement)
+        try:
+            result = api.validate_mac_addresses(
+                session, hardware_profile, nic_defs_list)
+        finally:
+            event.remove(dbm.engine, 'before_cursor_execute',
+                         count_statement)
+
+        # 5000 MAC addresses are looked up 500 at a time
+        assert len(statements) == 10
+        assert result[1] == [{'mac': '02:00:00:00:00:01'}]
+
+        with pytest.raises(MacAddressAlreadyExists):
+            api.validate_mac_addresses(
+                session, hardware_profile,
+                [[{'mac': '02:00:00:00:00:01'}],
+                 [{'mac': '02-00-00-00-00-01'}]])
+
+        with pytest.raises(MacAddressAlreadyExists):
+            api.validate_mac_addresses(
+                session, hardware_profile,
+                [[{'mac': 'FF:00:00:00:00:00:65'}]])
+
+
 def test_get_host_name():
     assert get_host_name('host.domain') == 'host'
 
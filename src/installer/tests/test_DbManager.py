@@ -19,3 +19,215 @@ import pytest
 def test_instantiation(dbm):
     with dbm.session() as session:
         pass
+
+
+def test_migrate_node_indexes():
+    from sqlalchemy import create_engine, inspect
+
+    from tortuga.db.migrations import migrate_database
+
+    #
+    # A nodes table, as created by earlier releases
+    #
+    engine = create_engine('sqlite:///:memory:')
+    engine.execute(
+        'CREATE TABLE nodes (id INTEGER PRIMARY KEY,'
+        ' name VARCHAR(255) NOT NULL UNIQUE, state VARCHAR(255),'
+        ' hardwareProfileId INTEGER, softwareProfileId INTEGER,'
+        ' addHostSession VARCHAR(36))')
+    engine.execute("INSERT INTO nodes (name) VALUES ('Compute-01.Private')")
+
+    #
+    # Ensure migrating adds and populates the lowercase name column, and
+    # creates the indexes, and that migrating again is a no-op
+    #
+    migrate_database(engine)
+    migrate_database(engine)
+
+    assert list(engine.execute('SELECT name_lower FROM nodes')) == \
+        [('compute-01.private',)]
+    assert {index['name'] for index in inspect(engine).get_indexes('nodes')} \
+        >= {'ix_nodes_name_lower', 'ix_nodes_state_softwareProfileId',
+            'ix_nodes_softwareProfileId', 'ix_nodes_hardwareProfileId',
+            'ix_nodes_addHostSession'}
+
+
+def test_migrate_node_name_collisions():
+    from sqlalchemy import create_engine, inspect
+
+    from tortuga.db.migrations import migrate_database
+    from tortuga.exceptions.dbError import DbError
+
+    engine = create_engine('sqlite:///:memory:')
+    engine.execute(
+        'CREATE TABLE nodes (id INTEGER PRIMARY KEY,'
+        ' name VARCHAR(255) NOT NULL UNIQUE, state VARCHAR(255),'
+        ' hardwareProfileId INTEGER, softwareProfileId INTEGER,'
+        ' addHostSession VARCHAR(36))')
+    engine.execute(
+        "INSERT INTO nodes (name) VALUES ('compute-01'), ('Compute-01'),"
+        " ('compute-02')")
+
+    #
+    # Ensure names that only differ by case are reported, rather than
+    # failing to create the unique index
+    #
+    with pytest.raises(DbError) as exc_info:
+        migrate_database(engine)
+
+    assert 'Compute-01, compute-01' in str(exc_info.value)
+    assert 'ix_nodes_name_lower' not in \
+        {index['name'] for index in inspect(engine).get_indexes('nodes')}
+
+
+def test_upgrade_database_on_first_session(dbm, tmpdir):
+    from sqlalchemy import create_engine, inspect
+
+    from tortuga.db.models.node import Node
+
+    #
+    # DbManager is replaced by a factory for the dbm fixture in tests
+    #
+    DbManager = dbm.__class__
+
+    #
+    # A database created by an earlier release, without the lowercase name
+    # column and the tables added since
+    #
+    engine = create_engine(
+        'sqlite:///{}'.format(tmpdir.join('upgrade.sqlite')))
+    engine.execute(
+        'CREATE TABLE nodes (id INTEGER PRIMARY KEY,'
+        ' name VARCHAR(255) NOT NULL UNIQUE, state VARCHAR(255),'
+        ' hardwareProfileId INTEGER, softwareProfileId INTEGER,'
+        ' addHostSession VARCHAR(36))')
+    engine.execute("INSERT INTO nodes (name) VALUES ('Compute-01')")
+
+    #
+    # Ensure the database is upgraded before the first session is used,
+    # without init_database() being called
+    #
+    upgrade_dbm = DbManager(engine)
+    assert 'name_lower' not in \
+        [column['name'] for column in inspect(engine).get_columns('nodes')]
+
+    with upgrade_dbm.session() as session:
+        assert session.query(Node.name).filter(
+            Node.name_lower == 'compute-01').scalar() == 'Compute-01'
+
+    tables = inspect(engine).get_table_names()
+    assert 'network_ip_allocations' in tables
+    assert 'node_name_counters' in tables
+
+    engine.dispose()
+
+
+def test_register_database_tables(dbm, monkeypatch):
+    from sqlalchemy import create_engine
+
+    import tortuga.db.dbManager
+
+    #
+    # DbManager is replaced by a factory for the dbm fixture in tests
+    #
+    DbManager = dbm.__class__
+
+    registered = []
+
+    def kit_installer_class(name):
+        class KitInstaller:
+            def register_database_tables(self):
+                registered.append(name)
+
+        return KitInstaller
+
+    kit_installer_classes = [kit_installer_class('kit1')]
+
+    monkeypatch.setattr(tortuga.db.dbManager, 'get_all_kit_installers',
+                        lambda: list(kit_installer_classes))
+    monkeypatch.setattr(DbManager, '_tables_kit_installer_count', None)
+
+    #
+    # Ensure kit tables are only registered once, no matter how many
+    # times the engine is accessed
+    #
+    dbm = DbManager(create_engine('sqlite:///:memory:'))
+    for _ in range(100):
+        assert dbm.engine
+
+    assert registered == ['kit1']
+
+    #
+    # Ensure tables are registered again once another kit is loaded
+    #
+    kit_installer_classes.append(kit_installer_class('kit2'))
+    for _ in range(100):
+        assert dbm.engine
+
+    assert registered == ['kit1', 'kit1', 'kit2']
+
+
+def test_get_pool_options():
+    from tortuga.db.dbManager import get_pool_options
+    from tortuga.db.pool import InstrumentedQueuePool
+
+    assert get_pool_options({'engine': 'sqlite'}) == {}
+
+    options = get_pool_options({
+        'engine': 'mysql',
+        'pool_size': 20,
+        'max_overflow': None,
+        'pool_pre_ping': False,
+    })
+
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert options['pool_size'] == 20
+    assert 'max_overflow' not in options
+    assert options['pool_pre_ping'] is False
+    assert options['pool_recycle'] == 3600
+
+
+def test_connection_pool_concurrency(dbm, tmpdir):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlalchemy import create_engine
+
+    from tortuga.db.pool import InstrumentedQueuePool
+
+    #
+    # DbManager is replaced by a factory for the dbm fixture in tests
+    #
+    DbManager = dbm.__class__
+
+    engine = create_engine(
+        'sqlite:///{}'.format(tmpdir.join('pool.sqlite')),
+        poolclass=InstrumentedQueuePool,
+        pool_size=4,
+        max_overflow=0,
+        pool_pre_ping=True,
+        connect_args={'check_same_thread': False}
+    )
+    pool_dbm = DbManager(engine)
+
+    def query(i):
+        with pool_dbm.session() as session:
+            return session.execute('SELECT {}'.format(i)).scalar()
+
+    #
+    # Ensure that many concurrent sessions share the pool, without
+    # exceeding it, and that every connection is returned to the pool
+    #
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(query, range(200)))
+
+    assert results == list(range(200))
+
+    stats = pool_dbm.get_pool_stats()
+    assert stats['checkouts'] >= 200
+    assert stats['checked_out'] == 0
+    assert 0 < stats['max_checked_out'] <= 4
+    assert stats['connections'] <= 4
+    assert stats['wait_time_max'] >= 0
+    assert engine.pool.checkedout() == 0
+
+    engine.dispose()
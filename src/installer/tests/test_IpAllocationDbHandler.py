@@ -0,0 +1,174 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+import multiprocessing
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tortuga.db.ipAllocationDbHandler import IpAllocationDbHandler
+from tortuga.db.models.base import ModelBase
+from tortuga.db.models.network import Network
+from tortuga.db.models.nic import Nic
+from tortuga.exceptions.invalidArgument import InvalidArgument
+
+
+@pytest.fixture()
+def session(dbm):
+    with dbm.session() as session:
+        yield session
+
+        session.rollback()
+
+
+def add_network(session, address, netmask, **kwargs) -> Network:
+    network = Network(address=address, netmask=netmask, type='provision',
+                      **kwargs)
+    session.add(network)
+    session.flush()
+
+    return network
+
+
+def add_nic(session, network, ip) -> Nic:
+    nic = Nic(nodeId=1, network=network, ip=ip)
+    session.add(nic)
+    session.flush()
+
+    return nic
+
+
+def test_allocate(session):
+    handler = IpAllocationDbHandler()
+    network = add_network(session, '10.3.0.0', '255.255.255.248')
+    add_nic(session, network, '10.3.0.1')
+
+    #
+    # Ensure addresses already in use are skipped, and that all others are
+    # allocated in order, up to the broadcast address
+    #
+    ips = [handler.allocate(session, network) for _ in range(5)]
+    assert ips == ['10.3.0.{}'.format(i) for i in range(2, 7)]
+
+    with pytest.raises(InvalidArgument):
+        handler.allocate(session, network)
+
+    #
+    # Ensure released addresses are allocated again
+    #
+    handler.release(session, network, '10.3.0.4')
+    assert handler.allocate(session, network) == '10.3.0.4'
+
+
+def test_allocate_with_start_ip_and_increment(session):
+    handler = IpAllocationDbHandler()
+    network = add_network(session, '10.4.0.0', '255.255.255.0',
+                          startIp='10.4.0.10', increment=5)
+    handler.reserve(session, network, '10.4.0.15')
+
+    assert [handler.allocate(session, network) for _ in range(3)] == \
+        ['10.4.0.10', '10.4.0.20', '10.4.0.25']
+
+
+def test_allocate_skips_unreserved_nics(session):
+    handler = IpAllocationDbHandler()
+    network = add_network(session, '10.5.0.0', '255.255.255.0')
+    assert handler.allocate(session, network) == '10.5.0.1'
+
+    #
+    # Ensure addresses assigned to nics without reserving them, before the
+    # allocation is next used by a transaction, are not allocated again
+    #
+    session.begin_nested()
+    add_nic(session, network, '10.5.0.2')
+    assert handler.allocate(session, network) == '10.5.0.3'
+
+
+def test_allocate_benchmark(session):
+    handler = IpAllocationDbHandler()
+    network = add_network(session, '10.6.0.0', '255.255.0.0')
+
+    #
+    # Allocating 10k addresses in a /16 must not depend on the number of
+    # addresses already allocated
+    #
+    start = time.time()
+    ips = [handler.allocate(session, network) for _ in range(10000)]
+    elapsed = time.time() - start
+
+    assert len(set(ips)) == 10000
+    assert all(ipaddress.IPv4Address(ip) in
+               ipaddress.IPv4Network('10.6.0.0/16') for ip in ips)
+    assert elapsed < 10
+
+
+def test_allocate_concurrent(tmpdir):
+    url = 'sqlite:///{}'.format(tmpdir.join('tortuga.sqlite'))
+
+    engine = create_engine(url)
+    ModelBase.metadata.create_all(engine)
+
+    session = sessionmaker(bind=engine)()
+    network_id = add_network(session, '10.7.0.0', '255.255.255.0').id
+    session.commit()
+    session.close()
+
+    #
+    # Ensure workers using the same database, each in their own process,
+    # create the allocation once, and never allocate the same address
+    #
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+
+    processes = [
+        context.Process(target=_allocate_ips,
+                        args=(url, network_id, 25, queue))
+        for _ in range(4)
+    ]
+
+    for process in processes:
+        process.start()
+
+    ips = []
+    for _ in processes:
+        ips.extend(queue.get(timeout=60))
+
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert sorted(ips, key=ipaddress.IPv4Address) == \
+        ['10.7.0.{}'.format(i) for i in range(1, 101)]
+
+
+def _allocate_ips(url, network_id, count, queue):
+    engine = create_engine(url, connect_args={'timeout': 30})
+    Session = sessionmaker(bind=engine)
+
+    handler = IpAllocationDbHandler()
+
+    ips = []
+    for _ in range(count):
+        session = Session()
+        try:
+            network = session.query(Network).get(network_id)
+            ips.append(handler.allocate(session, network))
+            session.commit()
+        finally:
+            session.close()
+
+    queue.put(ips)
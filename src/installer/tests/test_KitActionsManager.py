@@ -0,0 +1,93 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib
+import os
+import pkgutil
+
+from tortuga.db.models.kit import Kit
+from tortuga.kit import registry
+from tortuga.kit.actions import manager
+from tortuga.kit.actions.manager import KitActionsManager
+
+
+def test_component_installers_cached(monkeypatch, dbm):
+    monkeypatch.syspath_prepend(
+        os.path.join(os.path.dirname(__file__), 'fixtures', 'kit-test'))
+
+    monkeypatch.setattr(registry, 'KIT_INSTALLER_REGISTRY', {})
+    kit_installer_class = importlib.import_module(
+        'tortuga_kits.test_1_0_0.kit').ExampleKitInstaller
+    monkeypatch.setattr(registry, 'KIT_INSTALLER_REGISTRY', {
+        kit_installer_class.spec: kit_installer_class,
+    })
+
+    monkeypatch.setattr(manager, '_kit_installer_cache',
+                        manager._KitInstallerCache())
+
+    loaded = []
+    monkeypatch.setattr(manager, 'load_kits', lambda: loaded.append(True))
+
+    walked = []
+    walk_packages = pkgutil.walk_packages
+
+    def walk_packages_mock(*args, **kwargs):
+        walked.append(True)
+        return walk_packages(*args, **kwargs)
+
+    monkeypatch.setattr(pkgutil, 'walk_packages', walk_packages_mock)
+
+    with dbm.session() as session:
+        kitmgr = KitActionsManager()
+        kitmgr.session = session
+
+        #
+        # Ensure kits are loaded, and components searched for, only once
+        #
+        for _ in range(10):
+            component_installers = kitmgr._get_all_component_installers()
+            assert [ci.name for ci in component_installers] == \
+                ['mycomponent']
+            assert component_installers[0].session is session
+
+        assert len(loaded) == 1
+        assert len(walked) == 1
+
+        #
+        # Ensure each call gets its own component installers
+        #
+        assert kitmgr._get_all_component_installers()[0] is not \
+            component_installers[0]
+
+        #
+        # Ensure kits are loaded again when the installed kits change
+        #
+        session.add(Kit(name='test', version='1.0.0', iteration='0'))
+        session.flush()
+
+        kitmgr._get_all_component_installers()
+        assert len(loaded) == 2
+        assert len(walked) == 1
+
+        #
+        # Ensure components are searched for again when the kit installers
+        # are invalidated
+        #
+        registry.invalidate_kit_installers()
+
+        kitmgr._get_all_component_installers()
+        assert len(loaded) == 2
+        assert len(walked) == 2
+
+        session.rollback()
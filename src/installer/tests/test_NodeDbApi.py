@@ -74,3 +74,118 @@ def test_getNodeList(dbm):
     assert isinstance(result, TortugaObjectList)
 
     assert isinstance(result[0], Node)
+
+
+def test_getNodeList_paged(dbm):
+    with dbm.session() as session:
+        all_ids = sorted(node.getId()
+                         for node in NodeDbApi().getNodeList(session))
+
+        #
+        # Ensure paging through the nodes by id returns every node exactly
+        # once, in id order
+        #
+        ids = []
+        after = None
+        while True:
+            page = NodeDbApi().getNodeList(session, limit=3, after=after)
+            ids.extend(node.getId() for node in page)
+            if len(page) < 3:
+                break
+            after = page[-1].getId()
+
+    assert ids == all_ids
+
+
+def test_getNodeList_excluded_relations(dbm):
+    import json
+
+    from sqlalchemy import event
+
+    from tortuga.schema import NodeSchema
+
+    options = {
+        'hardwareprofile': False,
+        'softwareprofile': False,
+        'nics': False,
+        'tags': False,
+        'instance': False,
+    }
+
+    with dbm.session() as session:
+        full = NodeDbApi().getNodeList(session)
+
+    #
+    # Ensure that excluded relations are not loaded, and that a single
+    # query is used for the list
+    #
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args)
+
+    event.listen(dbm.engine, 'before_cursor_execute', count_statement)
+    try:
+        with dbm.session() as session:
+            projected = NodeDbApi().getNodeList(session, optionDict=options)
+    finally:
+        event.remove(dbm.engine, 'before_cursor_execute', count_statement)
+
+    assert len(statements) == 1
+    assert [node.getName() for node in projected] == \
+        [node.getName() for node in full]
+    assert all(not node.getNics() and not node.getTags() and
+               not node.getHardwareProfile() for node in projected)
+
+    #
+    # Ensure the projected payload is smaller than the full payload
+    #
+    fields = ('id', 'name', 'state')
+    full_size = len(json.dumps(NodeSchema().dump(full, many=True).data))
+    projected_data = NodeSchema(only=fields).dump(projected, many=True).data
+    assert all(set(node.keys()) == set(fields) for node in projected_data)
+    assert len(json.dumps(projected_data)) < full_size / 2
+
+
+def test_getNodeList_statement_count(dbm):
+    from sqlalchemy import event
+
+    options = {
+        'hardwareprofile': True,
+        'softwareprofile': True,
+        'nics': True,
+        'tags': True,
+        'instance': True,
+    }
+
+    def count_statements(**kwargs):
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args)
+
+        event.listen(dbm.engine, 'before_cursor_execute', count_statement)
+        try:
+            with dbm.session() as session:
+                nodes = NodeDbApi().getNodeList(
+                    session, optionDict=options, **kwargs)
+        finally:
+            event.remove(dbm.engine, 'before_cursor_execute',
+                         count_statement)
+
+        return nodes, len(statements)
+
+    #
+    # Ensure that the number of queries used to load a node list, and all
+    # of the requested relations, does not depend on the number of nodes
+    #
+    nodes, count = count_statements()
+    page, page_count = count_statements(limit=2)
+
+    assert len(nodes) > len(page)
+    assert count == page_count
+    assert count <= len(options) + 2
+
+    assert all(node.getSoftwareProfile() and
+               node.getHardwareProfile().getResourceAdapter()
+               for node in nodes if node.getName().startswith('compute-'))
@@ -12,14 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import time
+
 import mock
 import pytest
 
+from tortuga.config.configManager import ConfigManager
+from tortuga.db.hardwareProfilesDbHandler import HardwareProfilesDbHandler
 from tortuga.db.models.node import Node
+from tortuga.db.softwareProfilesDbHandler import SoftwareProfilesDbHandler
 from tortuga.db.models.softwareProfile import SoftwareProfile
+from tortuga.exceptions.deleteNodeFailed import DeleteNodeFailed
 from tortuga.exceptions.operationFailed import OperationFailed
 from tortuga.node.nodeManager import NodeManager
-from .osUtilityMock import get_os_object_factory
+from tortuga.os.rhel.osSupport import OSSupport
+from tortuga.os_objects.rhel.bootHostManager import BootHostManager
+from tortuga.resourceAdapter import resourceAdapterFactory
+from .osUtilityMock import MockBootHostManager, get_os_object_factory
 
 
 @mock.patch('tortuga.os_utility.osUtility.getOsObjectFactory',
@@ -111,3 +121,224 @@ class TestNodeManager:
         with pytest.raises(OperationFailed):
             NodeManager()._NodeManager__validate_delete_nodes_request(
                 nodes, False)
+
+
+@mock.patch('tortuga.os_utility.osUtility.getOsObjectFactory',
+            side_effect=get_os_object_factory)
+@mock.patch('tortuga.node.nodeManager.SyncApi')
+@mock.patch('tortuga.node.nodeManager.AddHostManager')
+@mock.patch('tortuga.node.nodeManager.KitActionsManager')
+def test_deleteNode_batched(kit_actions_manager_mock, add_host_manager_mock,
+                            sync_api_mock, get_os_object_factory_mock,
+                            dbm): \
+        # pylint: disable=unused-argument
+    """
+    Delete 2,000 nodes from the default resource adapter
+    """
+
+    num_nodes = 2000
+
+    with dbm.session() as session:
+        hwprofile = HardwareProfilesDbHandler().getHardwareProfile(
+            session, 'localiron')
+        swprofile = SoftwareProfilesDbHandler().getSoftwareProfile(
+            session, 'compute')
+
+        for n in range(num_nodes):
+            session.add(Node(name='bulk-{:04d}'.format(n), state='Installed',
+                             hardwareprofile=hwprofile,
+                             softwareprofile=swprofile))
+
+        session.commit()
+
+    def delete_puppet_node_cert(self, nodeName):
+        # stands in for the certificate revocation subprocess
+        time.sleep(0.001)
+
+    with mock.patch.object(MockBootHostManager, 'deletePuppetNodeCert',
+                           autospec=True,
+                           side_effect=delete_puppet_node_cert) \
+            as delete_puppet_node_cert_mock:
+        with dbm.session() as session:
+            start = time.time()
+
+            result = NodeManager().deleteNode(session, 'bulk-*')
+
+            elapsed = time.time() - start
+
+    assert len(result['NodesDeleted']) == num_nodes
+    assert not result['DeleteNodeFailed']
+    assert delete_puppet_node_cert_mock.call_count == num_nodes
+
+    # kit actions are run once per batch, rather than once per node
+    kitmgr = kit_actions_manager_mock.return_value
+    assert kitmgr.pre_delete_host.call_count == 1
+    assert kitmgr.post_delete_host.call_count == 1
+    assert len(kitmgr.pre_delete_host.call_args[1]['nodes']) == num_nodes
+
+    with dbm.session() as session:
+        assert not session.query(Node).filter(
+            Node.name.like('bulk-%')).count()
+
+    assert elapsed < 30
+
+
+@mock.patch('tortuga.os_utility.osUtility.getOsObjectFactory',
+            side_effect=get_os_object_factory)
+@mock.patch('tortuga.node.nodeManager.SyncApi')
+@mock.patch('tortuga.node.nodeManager.AddHostManager')
+@mock.patch('tortuga.node.nodeManager.KitActionsManager')
+def test_deleteNode_adapter_failed(kit_actions_manager_mock,
+                                   add_host_manager_mock, sync_api_mock,
+                                   get_os_object_factory_mock, dbm): \
+        # pylint: disable=unused-argument
+    """
+    The nodes of other hardware profiles are deleted when a resource
+    adapter fails, and the nodes it failed to delete are reported
+    """
+
+    with dbm.session() as session:
+        for name in ('localiron', 'localironalt'):
+            hwprofile = HardwareProfilesDbHandler().getHardwareProfile(
+                session, name)
+            swprofile = SoftwareProfilesDbHandler().getSoftwareProfile(
+                session, 'compute')
+
+            for n in range(2):
+                session.add(Node(name='{}-{:02d}'.format(name, n),
+                                 state='Installed',
+                                 hardwareprofile=hwprofile,
+                                 softwareprofile=swprofile))
+
+        session.commit()
+
+    adapter_class = resourceAdapterFactory.get_resourceadapter_class(
+        'default')
+    delete_node = adapter_class.deleteNode
+
+    def delete_node_mock(self, nodes):
+        if nodes[0].hardwareprofile.name == 'localironalt':
+            raise Exception('Resource adapter failure')
+
+        return delete_node(self, nodes)
+
+    with mock.patch.object(adapter_class, 'deleteNode', autospec=True,
+                           side_effect=delete_node_mock):
+        with dbm.session() as session:
+            with pytest.raises(DeleteNodeFailed) as exc_info:
+                NodeManager().deleteNode(session, 'localiron*-*')
+
+    assert 'localironalt-00 localironalt-01' in str(exc_info.value)
+
+    #
+    # Ensure the nodes of the other hardware profile were deleted, and
+    # their post delete actions run, before the failure was raised
+    #
+    kitmgr = kit_actions_manager_mock.return_value
+    assert kitmgr.post_delete_host.call_count == 1
+    assert kitmgr.post_delete_host.call_args[1]['nodes'] == \
+        ['localiron-00', 'localiron-01']
+
+    with dbm.session() as session:
+        nodes = session.query(Node).filter(
+            Node.name.like('localiron%-%')).order_by(Node.name).all()
+
+        assert [(node.name, node.state) for node in nodes] == [
+            ('localironalt-00', 'Deleted'),
+            ('localironalt-01', 'Deleted'),
+        ]
+
+        for node in nodes:
+            session.delete(node)
+
+        session.commit()
+
+
+@mock.patch('tortuga.os_utility.osUtility.getOsObjectFactory',
+            side_effect=get_os_object_factory)
+@mock.patch('tortuga.node.nodeManager.NodeStateChanged')
+@mock.patch.object(OSSupport, 'getKickstartFileContents',
+                   return_value='# kickstart\n')
+def test_updateNodeStatus_heartbeat(get_kickstart_file_contents_mock,
+                                    node_state_changed_mock,
+                                    get_os_object_factory_mock, dbm,
+                                    tmp_path): \
+        # pylint: disable=unused-argument
+    """
+    1,000 status updates that do not change the node write the PXE and
+    kickstart files once, and do not fire the state changed event
+    """
+
+    num_updates = 1000
+
+    tftproot = tmp_path / 'tftpboot'
+    (tftproot / 'tortuga' / 'pxelinux.cfg').mkdir(parents=True)
+
+    kickstarts_dir = tmp_path / 'kickstarts'
+    kickstarts_dir.mkdir()
+
+    nodeManager = NodeManager()
+    nodeManager._bhm = BootHostManager(ConfigManager())
+
+    with mock.patch.object(BootHostManager, 'getTftproot',
+                           return_value=str(tftproot)), \
+            mock.patch.object(ConfigManager, 'getKickstartsDir',
+                              return_value=str(kickstarts_dir)), \
+            mock.patch.object(BootHostManager, '_file_written',
+                              autospec=True,
+                              side_effect=BootHostManager._file_written) \
+            as file_written_mock:
+        with dbm.session() as session:
+            node = nodeManager._nodesDbHandler.getNode(
+                session, 'compute-01.private')
+            current_state = node.state
+            current_boot_from = node.bootFrom
+
+            try:
+                nodeManager.updateNodeStatus(
+                    session, 'compute-01.private', current_state, bootFrom=1)
+
+                # PXE and kickstart files are written by the first update
+                assert file_written_mock.call_count == 2
+
+                start = time.time()
+
+                for _ in range(num_updates):
+                    assert not nodeManager.updateNodeStatus(
+                        session, 'compute-01.private', current_state)
+
+                elapsed = time.time() - start
+
+                assert file_written_mock.call_count == 2
+                assert not node_state_changed_mock.fire.called
+
+                kickstart_file = kickstarts_dir / 'compute-01.private.ks'
+                assert kickstart_file.read_text() == '# kickstart\n'
+
+                # Files modified outside of the boot host manager are
+                # rewritten
+                kickstart_file.write_text('# modified\n')
+
+                nodeManager.updateNodeStatus(
+                    session, 'compute-01.private', current_state)
+
+                assert file_written_mock.call_count == 3
+                assert kickstart_file.read_text() == '# kickstart\n'
+
+                # Events are only fired on real state transitions
+                assert nodeManager.updateNodeStatus(
+                    session, 'compute-01.private', 'Provisioned')
+
+                assert node_state_changed_mock.fire.call_count == 1
+                assert node_state_changed_mock.fire.call_args[1][
+                    'previous_state'] == current_state
+
+                assert file_written_mock.call_count == 3
+            finally:
+                node.state = current_state
+                node.bootFrom = current_boot_from
+                session.commit()
+
+    assert len(os.listdir(str(tftproot / 'tortuga' / 'pxelinux.cfg'))) == 1
+
+    assert elapsed < 60
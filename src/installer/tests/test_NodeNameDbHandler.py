@@ -0,0 +1,161 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tortuga.db.models.base import ModelBase
+from tortuga.db.models.node import Node
+from tortuga.db.nodeNameDbHandler import NodeNameDbHandler, get_name_slot
+from tortuga.exceptions.invalidArgument import InvalidArgument
+
+
+@pytest.fixture()
+def session(dbm):
+    with dbm.session() as session:
+        yield session
+
+        session.rollback()
+
+
+def test_allocate(session):
+    handler = NodeNameDbHandler()
+
+    #
+    # Ensure the counter is built from the existing compute-01..10 nodes
+    #
+    assert handler.allocate(session, 'compute-#NN') == 'compute-11'
+
+    #
+    # Ensure names assigned to nodes without going through the counter,
+    # before the counter is next used by a transaction, are skipped
+    #
+    session.begin_nested()
+    session.add(Node(name='COMPUTE-12.private'))
+    session.flush()
+
+    assert handler.allocate(session, 'compute-#NN') == 'compute-13'
+
+    #
+    # Ensure the lowest released slot is reused first, unless its name is
+    # still in use
+    #
+    handler.release(session, 'compute-13')
+    handler.release(session, 'compute-11')
+    handler.release(session, 'compute-03.private')
+
+    assert handler.allocate(session, 'compute-#NN') == 'compute-11'
+    assert handler.allocate(session, 'compute-#NN') == 'compute-13'
+    assert handler.allocate(session, 'compute-#NN') == 'compute-14'
+
+
+def test_allocate_exhausted(session):
+    handler = NodeNameDbHandler()
+
+    assert [handler.allocate(session, 'small-#N') for _ in range(9)] == \
+        ['small-{}'.format(n) for n in range(1, 10)]
+
+    with pytest.raises(InvalidArgument):
+        handler.allocate(session, 'small-#N')
+
+    #
+    # Ensure names of nodes deleted without releasing them are reclaimed
+    # once the name format is exhausted
+    #
+    handler.release(session, 'small-5')
+    assert handler.allocate(session, 'small-#N') == 'small-5'
+
+
+@pytest.mark.parametrize('name_format,randomized,name,expected', [
+    ('compute-#NN', False, 'compute-07', 7),
+    ('compute-#NN', False, 'Compute-07.private', 7),
+    ('compute-#NN', False, 'compute-007', None),
+    ('compute-#NN', False, 'compute-00', None),
+    ('compute-#NN', True, 'compute-07-abcde.private', 7),
+    ('compute-#NN', True, 'compute-07', None),
+    ('rack1-#NNN.x', False, 'rack1-012.x', 12),
+    ('rack1-#NNN.x', False, 'rack1-012', None),
+    ('login', False, 'login.private', 1),
+])
+def test_get_name_slot(name_format, randomized, name, expected):
+    assert get_name_slot(name_format, randomized, name) == expected
+
+
+def test_allocate_benchmark(session):
+    handler = NodeNameDbHandler()
+
+    #
+    # Generating 10k names must not depend on the number of names already
+    # generated
+    #
+    start = time.time()
+    names = [handler.allocate(session, 'bench-#NNNNN')
+             for _ in range(10000)]
+    elapsed = time.time() - start
+
+    assert names == ['bench-{:05d}'.format(n) for n in range(1, 10001)]
+    assert elapsed < 10
+
+
+def _allocate_names(url, count, queue):
+    engine = create_engine(url, connect_args={'timeout': 30})
+    Session = sessionmaker(bind=engine)
+
+    handler = NodeNameDbHandler()
+
+    names = []
+    for _ in range(count):
+        session = Session()
+        try:
+            names.append(handler.allocate(session, 'worker-#NNNN'))
+            session.commit()
+        finally:
+            session.close()
+
+    queue.put(names)
+
+
+def test_allocate_concurrent(tmpdir):
+    url = 'sqlite:///{}'.format(tmpdir.join('tortuga.sqlite'))
+
+    ModelBase.metadata.create_all(create_engine(url))
+
+    #
+    # Ensure workers using the same database, each in their own process,
+    # never generate the same name
+    #
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+
+    processes = [
+        context.Process(target=_allocate_names, args=(url, 25, queue))
+        for _ in range(4)
+    ]
+
+    for process in processes:
+        process.start()
+
+    names = []
+    for _ in processes:
+        names.extend(queue.get(timeout=60))
+
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert sorted(names) == ['worker-{:04d}'.format(n) for n in range(1, 101)]
@@ -274,6 +274,50 @@ def test_expand_nodespec_default(dbm):
             installer in [node.name for node in result]
 
 
+@pytest.mark.parametrize('name', [
+    'compute-01',
+    'COMPUTE-01',
+    'compute-01.private',
+    'Compute-01.Private',
+])
+def test_getNode_case_insensitive(dbm, name):
+    with dbm.session() as session:
+        result = NodesDbHandler().getNode(session, name)
+
+        assert result.name == 'compute-01.private'
+
+
+@pytest.mark.parametrize('name', [
+    'compute-01',
+    'compute-01.private',
+])
+def test_getNode_uses_index(dbm, name):
+    from sqlalchemy import event
+
+    statements = []
+
+    def capture_statement(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(dbm.engine, 'before_cursor_execute', capture_statement)
+    try:
+        with dbm.session() as session:
+            NodesDbHandler().getNode(session, name)
+    finally:
+        event.remove(dbm.engine, 'before_cursor_execute', capture_statement)
+
+    #
+    # Ensure the node lookup uses the lowercase name index, rather than
+    # scanning the nodes table
+    #
+    statement, parameters = statements[0]
+    plan = [row[-1] for row in dbm.engine.execute(
+        'EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+    assert any('ix_nodes_name_lower' in detail for detail in plan)
+    assert not any(detail.startswith('SCAN') and 'nodes' in detail
+                   for detail in plan)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,14 +12,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import http.client
+
+import cherrypy
 from marshmallow import fields
+import mock
 import pytest
 import time
 
+from tortuga.config.configManager import ConfigManager
 from tortuga.events.types.base import BaseEvent, BaseEventSchema
-from tortuga.events.manager import EventStoreManager, PubSubManager
+from tortuga.events.types.node import NodeStateChanged
+from tortuga.events.manager import EventStoreManager, PubSubManager, \
+    TimerWheelManager
+from tortuga.events.pubsub import RedisEventPubSub
 from tortuga.events.store import ObjectStoreEventStore
+from tortuga.events.timers import RedisTimerWheel
+from tortuga.exceptions.tortugaException import TortugaException
 from tortuga.objectstore.redis import RedisObjectStore
+from .mocks.redis import MockRedis
 
 
 class ExampleEventSchema(BaseEventSchema):
@@ -40,9 +51,16 @@ class ExampleEvent(BaseEvent):
         return self.__dict__ == other.__dict__
 
 
+class RetainedEvent(ExampleEvent):
+    name = 'retained-event'
+    max_count = 10
+
+
 @pytest.fixture()
 def event_store(redis):
-    object_store = RedisObjectStore(namespace='events', redis_client=redis)
+    object_store = RedisObjectStore(namespace='events', redis_client=redis,
+                                    equality_indexes=['name'],
+                                    ordered_indexes=['timestamp'])
     store = ObjectStoreEventStore(object_store=object_store)
     #
     # Manually set the store on te store manager so that all calls to get()
@@ -104,6 +122,110 @@ def test_event_list_filter(event_store):
     assert integers == [5, 4]
 
 
+def test_event_list_indexed(event_store, monkeypatch):
+    for i in range(5):
+        ExampleEvent.fire(integer=i, string='testing')
+        RetainedEvent.fire(integer=i, string='testing')
+
+    #
+    # Ensure that filtering by name only loads the events with that name,
+    # using the index, rather than every event in the store
+    #
+    def list_sorted(*args, **kwargs):
+        raise AssertionError('All events loaded')
+
+    monkeypatch.setattr(event_store._store, 'list_sorted', list_sorted)
+
+    fetched = []
+    get_many = event_store._store._get_many
+
+    def get_many_mock(keys):
+        fetched.extend(keys)
+        return get_many(keys)
+
+    monkeypatch.setattr(event_store._store, '_get_many', get_many_mock)
+
+    integers = [evt.integer for evt in event_store.list(
+        order_by='integer', name='retained-event', integer__gt=1)]
+
+    assert integers == [2, 3, 4]
+    assert len(fetched) == 5
+
+
+def test_event_list_page(event_store):
+    events_in = [ExampleEvent.fire(integer=i, string='testing')
+                 for i in range(10)]
+
+    #
+    # Ensure that pages of events are returned in the order they were fired
+    #
+    events_out = []
+    cursor = None
+    while True:
+        page, cursor = event_store.list_page(limit=3, cursor=cursor,
+                                             name='example-event')
+        events_out.extend(page)
+        if cursor is None:
+            break
+
+    assert events_out == events_in
+
+
+def test_event_ttl(event_store):
+    redis = event_store._store._redis
+
+    #
+    # Ensure that events are kept until they are deleted by default
+    #
+    evt = ExampleEvent.fire(integer=1, string='testing')
+    assert redis.ttl('events:{}'.format(evt.id)) == -1
+
+    #
+    # Ensure that the ttl of each event type is read from the configuration
+    #
+    event_store._ttls = {}
+    with mock.patch.object(ConfigManager, 'get_event_ttl',
+                           side_effect={'example-event': 60,
+                                        'retained-event': 0}.get):
+        evt = ExampleEvent.fire(integer=2, string='testing')
+        assert redis.ttl('events:{}'.format(evt.id)) == 60
+
+        evt = RetainedEvent.fire(integer=3, string='testing')
+        assert redis.ttl('events:{}'.format(evt.id)) == -1
+
+
+def test_event_compact(event_store):
+    event_store._ttls = {'example-event': 60}
+
+    for i in range(100):
+        RetainedEvent.fire(integer=i, string='testing')
+        ExampleEvent.fire(integer=i, string='testing')
+
+    #
+    # Ensure that only the newest events are kept for event types with a
+    # max_count, and that other event types are left alone
+    #
+    assert event_store.compact() == 90
+    assert event_store.compact() == 0
+
+    integers = [evt.integer for evt in event_store.list(
+        order_by='integer', name='retained-event')]
+    assert integers == list(range(90, 100))
+    assert len(list(event_store.list(name='example-event'))) == 100
+
+    #
+    # Ensure that expired events are cleaned up
+    #
+    redis = event_store._store._redis
+    for evt in event_store.list(name='example-event', integer__lt=50):
+        redis.delete('events:{}'.format(evt.id))
+
+    with mock.patch('time.time', return_value=time.time() + 61):
+        assert event_store.compact() == 50
+    page, _ = event_store.list_page(limit=1000, name='example-event')
+    assert len(page) == 50
+
+
 def test_event_pubsub(event_store):
     pubsub = PubSubManager.get()
     pubsub.subscribe()
@@ -122,6 +244,46 @@ def test_event_pubsub(event_store):
         assert evt == evt_sub
 
 
+class CommandCountingRedis(MockRedis):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = 0
+
+    def hgetall(self, key: str) -> dict:
+        self.commands += 1
+        return super().hgetall(key)
+
+
+@pytest.mark.parametrize('max_inline_size,commands_per_event', [
+    (16 * 1024, 0),
+    (0, 1),
+])
+def test_event_pubsub_inline(max_inline_size, commands_per_event):
+    redis = CommandCountingRedis()
+    object_store = RedisObjectStore(namespace='events', redis_client=redis)
+    store = ObjectStoreEventStore(object_store=object_store)
+
+    pubsub = RedisEventPubSub(redis_client=redis, event_store=store,
+                              max_inline_size=max_inline_size)
+    pubsub.subscribe()
+
+    events = [ExampleEvent(integer=i, string='testing', id=str(i))
+              for i in range(10)]
+    for evt in events:
+        store.save(evt)
+        pubsub.publish(evt)
+
+    #
+    # Ensure events are received intact, and that inline events are
+    # delivered without fetching them from the event store, while events
+    # over the inline size are fetched with a single command each
+    #
+    redis.commands = 0
+    for evt in events:
+        assert pubsub.get_message() == evt
+    assert redis.commands == commands_per_event * len(events)
+
+
 def test_event_listener(event_store, celery_worker):
     #
     # The purpose of this unit test is to ensure that when events fire,
@@ -176,3 +338,305 @@ def test_event_listener(event_store, celery_worker):
     assert 'example-listener' in was_run
     assert 'example-all-listener' in was_run
     assert 'example-none-listener' not in was_run
+
+
+def test_event_listener_batching(event_store, monkeypatch):
+    from tortuga.events import tasks
+    from tortuga.events.dispatcher import batch_listeners
+    from tortuga.events.listeners import base
+
+    #
+    # Only register the listeners defined in this test
+    #
+    monkeypatch.setattr(base, 'EVENT_LISTENERS', {})
+
+    #
+    # Run tasks eagerly, recording the countdown of each broker message
+    #
+    messages = []
+
+    def apply_async(args, countdown=None):
+        messages.append(countdown)
+        return tasks.run_event_listeners.apply(args=args)
+
+    monkeypatch.setattr(tasks.run_event_listeners, 'apply_async',
+                        apply_async)
+
+    was_run = []
+
+    class RunMixin:
+        def run(self, event):
+            was_run.append((self.name, event.integer))
+
+    class ExampleEventListener(RunMixin, base.BaseListener):
+        name = 'example-listener'
+        event_types = [ExampleEvent]
+
+    class ExampleEventAllListener(RunMixin, base.BaseListener):
+        name = 'example-all-listener'
+        all_events = True
+
+    class ExampleEventDelayedListener(RunMixin, base.BaseListener):
+        name = 'example-delayed-listener'
+        event_types = [ExampleEvent]
+        countdown = 60
+
+    class ExampleEventNoneListener(RunMixin, base.BaseListener):
+        name = 'example-none-listener'
+
+    #
+    # Ensure a single event schedules one task per countdown, rather than
+    # one task per listener
+    #
+    ExampleEvent.fire(integer=0, string='testing')
+    assert sorted(messages, key=str) == [60, None]
+    assert sorted(was_run) == [
+        ('example-all-listener', 0),
+        ('example-delayed-listener', 0),
+        ('example-listener', 0)
+    ]
+
+    #
+    # Ensure a burst of events fired in a batch is scheduled in the same
+    # number of tasks, and that every listener runs for every event
+    #
+    messages.clear()
+    was_run.clear()
+    with batch_listeners():
+        for i in range(100):
+            ExampleEvent.fire(integer=i, string='testing')
+        assert messages == []
+
+    assert sorted(messages, key=str) == [60, None]
+    for name in ['example-listener', 'example-all-listener',
+                 'example-delayed-listener']:
+        assert [i for n, i in was_run if n == name] == list(range(100))
+    assert 'example-none-listener' not in [n for n, _ in was_run]
+
+    #
+    # Ensure listeners are still scheduled for a batch that raised, and
+    # that events fired afterwards are no longer batched
+    #
+    messages.clear()
+    was_run.clear()
+    with pytest.raises(ValueError):
+        with batch_listeners():
+            ExampleEvent.fire(integer=0, string='testing')
+            assert messages == []
+            raise ValueError()
+
+    assert sorted(messages, key=str) == [60, None]
+    assert ('example-listener', 0) in was_run
+
+    messages.clear()
+    ExampleEvent.fire(integer=1, string='testing')
+    assert sorted(messages, key=str) == [60, None]
+
+
+def test_events_controller_list_page(event_store):
+    from tortuga.web_service.controllers_v2.events import EventController
+
+    for i in range(20):
+        ExampleEvent.fire(integer=i, string='testing')
+
+    class ExampleEventController(EventController):
+        object_store = event_store
+
+    controller = ExampleEventController()
+
+    response = controller.list(page_size='10', order_alpha='false',
+                               name='example-event')
+    assert [event['integer'] for event in response['items']] == \
+        list(range(10))
+    assert response['next']
+
+    #
+    # Make sure list parameters that pages do not support are rejected,
+    # rather than being used as filters
+    #
+    with mock.patch.object(cherrypy, 'response') as response_mock:
+        response = controller.list(page_size='10', order_alpha='true')
+
+    assert response_mock.status == http.client.BAD_REQUEST
+    assert response == {
+        'error': {
+            'message': 'order_alpha can not be used with page_size/cursor',
+        }
+    }
+
+
+def test_addhost_request_listeners(event_store, monkeypatch):
+    """
+    Listeners for the events fired by adding hosts are scheduled even if
+    adding the hosts fails, as the request is committed either way
+    """
+    from tortuga.addhost import addHostRequest
+    from tortuga.events import dispatcher
+
+    scheduled = []
+    monkeypatch.setattr(dispatcher, 'schedule_listeners',
+                        lambda events: scheduled.append(
+                            [event.name for event in events]))
+
+    def add_hosts(session, request):
+        NodeStateChanged.fire(node={'name': 'compute-01'},
+                              previous_state='Installing')
+
+        raise TortugaException('Resource adapter failure')
+
+    session = mock.Mock()
+    req = mock.Mock(state='pending')
+
+    with mock.patch.object(addHostRequest, 'NodeRequestsDbHandler') \
+            as node_requests_db_handler_mock, \
+            mock.patch.object(addHostRequest,
+                              'AddHostSessionContextManager') \
+            as context_manager_mock:
+        node_requests_db_handler_mock.return_value.\
+            get_by_addHostSession.return_value = req
+        context_manager_mock.return_value.__enter__.return_value.\
+            addHosts.side_effect = add_hosts
+
+        addHostRequest.process_addhost_request(
+            session, {'addNodesRequest': {}}, 'session-id')
+
+    assert req.state == 'error'
+    assert session.commit.called
+    assert scheduled == [
+        ['node-state-changed'],
+        ['add-node-request-complete'],
+    ]
+
+
+class PipelineCountingRedis(MockRedis):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trips = 0
+
+    def zrangebyscore(self, *args, **kwargs) -> list:
+        self.round_trips += 1
+        return super().zrangebyscore(*args, **kwargs)
+
+    def pipeline(self, transaction: bool = True):
+        self.round_trips += 1
+        return super().pipeline(transaction)
+
+
+def test_timer_wheel():
+    redis = PipelineCountingRedis()
+    timer_wheel = RedisTimerWheel(name='test', redis_client=redis)
+
+    start = time.time()
+    count = 50000
+    for i in range(count):
+        timer_wheel.schedule('node-{}'.format(i), 600 + i / 1000)
+
+    #
+    # Ensure that no timers are due before they expire, and that a
+    # rescheduled timer replaces the existing one
+    #
+    timer_wheel.schedule('node-0', 1000)
+    assert timer_wheel.count() == count
+    assert timer_wheel.pop_due(now=start + 599) == []
+
+    #
+    # Ensure that expired timers are popped in batches, oldest first, with
+    # a fixed number of round trips per batch, regardless of how many
+    # timers are pending
+    #
+    redis.round_trips = 0
+    popped = []
+    while True:
+        batch = timer_wheel.pop_due(now=start + 700, limit=1000)
+        if not batch:
+            break
+        popped.extend(batch)
+
+    assert popped == ['node-{}'.format(i) for i in range(1, count)]
+    assert redis.round_trips == 2 * (count // 1000) + 1
+    assert timer_wheel.pop_due(now=start + 2000) == ['node-0']
+    assert timer_wheel.count() == 0
+
+    #
+    # Ensure cancelled timers never expire
+    #
+    timer_wheel.schedule('node-0', 0)
+    timer_wheel.cancel('node-0')
+    assert timer_wheel.pop_due() == []
+
+
+def test_node_provisioning_timeouts(redis, dbm, monkeypatch):
+    from tortuga.events.listeners import NodeProvisioningListener
+    from tortuga.events.types import NodeStateChanged
+    from tortuga.tasks.celery import app
+
+    TimerWheelManager._redis_client = redis
+    monkeypatch.setattr(app, 'dbm', dbm)
+    monkeypatch.setattr(NodeProvisioningListener, 'batch_size', 3)
+
+    checked = []
+    monkeypatch.setattr(
+        NodeProvisioningListener, '_check_nodes',
+        lambda session, node_names: checked.append(node_names))
+
+    #
+    # Ensure provisioned nodes get a timer, rather than a task each
+    #
+    listener = NodeProvisioningListener(app.app)
+    for i in range(10):
+        listener.run_if_required(NodeStateChanged(
+            node={'name': 'node-{}'.format(i), 'state': 'Provisioned'},
+            previous_state='Allocated'
+        ))
+    listener.run_if_required(NodeStateChanged(
+        node={'name': 'node-10', 'state': 'Installed'},
+        previous_state='Provisioned'
+    ))
+
+    #
+    # Ensure that nothing is checked before the timeout, and that every
+    # node is checked exactly once after it
+    #
+    assert NodeProvisioningListener.check_timeouts() == 0
+    assert NodeProvisioningListener.check_timeouts(
+        now=time.time() + NodeProvisioningListener.timeout) == 10
+    assert checked == [['node-0', 'node-1', 'node-2'],
+                       ['node-3', 'node-4', 'node-5'],
+                       ['node-6', 'node-7', 'node-8'],
+                       ['node-9']]
+    assert NodeProvisioningListener.check_timeouts(
+        now=time.time() + NodeProvisioningListener.timeout) == 0
+
+    #
+    # Ensure that nodes are checked again, after the retry delay, if
+    # checking them fails
+    #
+    for i in range(5):
+        listener.run_if_required(NodeStateChanged(
+            node={'name': 'node-{}'.format(i), 'state': 'Provisioned'},
+            previous_state='Allocated'
+        ))
+
+    def check_nodes_mock(session, node_names):
+        raise Exception('Database unavailable')
+
+    monkeypatch.setattr(NodeProvisioningListener, '_check_nodes',
+                        check_nodes_mock)
+
+    now = time.time() + NodeProvisioningListener.timeout
+    with pytest.raises(Exception):
+        NodeProvisioningListener.check_timeouts(now=now)
+
+    monkeypatch.setattr(
+        NodeProvisioningListener, '_check_nodes',
+        lambda session, node_names: checked.append(node_names))
+
+    checked.clear()
+    timer_wheel = TimerWheelManager.get(NodeProvisioningListener.timer_wheel)
+    assert timer_wheel.count() == 5
+    assert NodeProvisioningListener.check_timeouts() == 0
+    assert NodeProvisioningListener.check_timeouts(
+        now=time.time() + NodeProvisioningListener.retry_delay) == 3
+    assert checked == [['node-0', 'node-1', 'node-2']]
+    assert NodeProvisioningListener.check_timeouts(
+        now=time.time() + NodeProvisioningListener.timeout) == 2
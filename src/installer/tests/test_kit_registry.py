@@ -0,0 +1,42 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from tortuga.kit import registry
+
+
+def test_discover_kit_installers_cached(monkeypatch):
+    searched = []
+
+    monkeypatch.setattr(registry, 'discover_kit_installers_in_package',
+                        searched.append)
+    registry._discover_kit_installers_cached.cache_clear()
+
+    #
+    # Ensure kit installers are only searched for again when the cache
+    # key changes
+    #
+    for _ in range(10):
+        registry.discover_kit_installers(cache_key=('/kits', 1.0))
+    assert searched == registry.KIT_INSTALLER_PACKAGES
+
+    registry.discover_kit_installers(cache_key=('/kits', 2.0))
+    assert searched == registry.KIT_INSTALLER_PACKAGES * 2
+
+    #
+    # Ensure searches without a cache key are never cached
+    #
+    registry.discover_kit_installers()
+    assert searched == registry.KIT_INSTALLER_PACKAGES * 3
+
+    registry._discover_kit_installers_cached.cache_clear()
@@ -0,0 +1,95 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import cherrypy
+
+from tortuga.db.instanceMetadataDbHandler import InstanceMetadataDbHandler
+from tortuga.db.models.instanceMetadata import InstanceMetadata
+from tortuga.db.models.node import Node
+from tortuga.web_service.tools.ndjson import NdjsonStream
+
+
+def test_ndjson_stream(dbm, monkeypatch):
+    with dbm.session() as session:
+        names = [name for name, in
+                 session.query(Node.name).order_by(Node.id)]
+
+        monkeypatch.setattr(cherrypy.request, 'db', session, raising=False)
+
+        sessions = []
+
+        def generate(stream_session):
+            sessions.append(stream_session)
+            for name, in stream_session.query(Node.name).order_by(
+                    Node.id).yield_per(3):
+                yield {'name': name}
+
+        stream = NdjsonStream(generate)
+
+    #
+    # Ensure the stream emits one object per line, using its own session,
+    # so that it still works after the request session is closed
+    #
+    lines = list(stream)
+    assert [json.loads(line.decode())['name'] for line in lines] == names
+    assert all(line.endswith(b'\n') for line in lines)
+    assert sessions[0] is not session
+
+
+def test_ndjson_stream_error(dbm, monkeypatch):
+    with dbm.session() as session:
+        monkeypatch.setattr(cherrypy.request, 'db', session, raising=False)
+
+        def generate(_):
+            yield {'name': 'node-1'}
+            raise Exception('Failed')
+
+        stream = NdjsonStream(generate)
+
+    #
+    # Ensure errors after streaming has started are reported on the last
+    # line
+    #
+    lines = [json.loads(line.decode()) for line in stream]
+    assert lines == [
+        {'name': 'node-1'},
+        {'error': {'message': 'Failed'}}
+    ]
+
+
+def test_iterate_metadata(dbm):
+    with dbm.session() as session:
+        try:
+            for i in range(25):
+                session.add(InstanceMetadata(key='key-{}'.format(i),
+                                             value=str(i)))
+            session.flush()
+
+            #
+            # Ensure metadata is iterated over in batches, and filtered
+            #
+            handler = InstanceMetadataDbHandler()
+            result = [metadata.key for metadata in
+                      handler.iterate(session, batch_size=10)]
+            assert sorted(result) == sorted(
+                'key-{}'.format(i) for i in range(25))
+
+            result = [metadata.value for metadata in
+                      handler.iterate(session, filter_key='key-3')]
+            assert result == ['3']
+
+        finally:
+            session.rollback()
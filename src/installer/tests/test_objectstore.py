@@ -12,11 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
 import types
+from typing import Tuple
+
+import mock
+import pytest
 
 from tortuga.objectstore.base import matches_filters
 from tortuga.objectstore.redis import RedisObjectStore
 
+from .mocks.redis import MockRedis, Pipeline
+
 
 data_1 = {
     'string': 'bar',
@@ -277,3 +284,500 @@ def test_list_filter(redis):
     for k, v in store.list(order_by='number', age__gt=40):
         numbers.append(v['number'])
     assert numbers == [1, 4]
+
+
+class RoundTripCountingPipeline(Pipeline):
+    def execute(self) -> list:
+        #
+        # A pipeline execution is a single round trip, regardless of the
+        # number of commands that were queued
+        #
+        round_trips = self._redis.round_trips
+        results = super().execute()
+        self._redis.round_trips = round_trips + 1
+
+        return results
+
+
+class RoundTripCountingRedis(MockRedis):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trips = 0
+        self.objects_fetched = 0
+
+    def hgetall(self, key: str) -> dict:
+        self.round_trips += 1
+        self.objects_fetched += 1
+        return super().hgetall(key)
+
+    def pipeline(self, transaction: bool = True) -> Pipeline:
+        return RoundTripCountingPipeline(self)
+
+
+@pytest.mark.parametrize('count', [1000, 10000])
+def test_list_pipelined_round_trips(count):
+    redis = RoundTripCountingRedis()
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             fetch_chunk_size=500)
+
+    for i in range(count):
+        store.set('my_key{}'.format(i), {'number': i, 'tags': [i]})
+
+    #
+    # Make sure all objects are returned, in order, and correctly
+    # deserialized
+    #
+    redis.round_trips = 0
+    from_store = list(store.list(order_by='number'))
+    assert [v['number'] for _, v in from_store] == list(range(count))
+    assert from_store[7] == ('my_key7', {'number': 7, 'tags': [7]})
+
+    #
+    # Make sure the objects were fetched one chunk per round trip, rather
+    # than one object per round trip
+    #
+    assert redis.round_trips == count // 500
+
+
+def test_list_skips_deleted(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis)
+
+    store.set('my_key1', data_1)
+    store.set('my_key2', data_2)
+    store.delete('my_key1')
+
+    #
+    # Make sure stale index entries do not show up as empty objects
+    #
+    assert list(store.list()) == [('my_key2', data_2)]
+
+
+def _populate_indexed_stores(count: int) -> Tuple[RedisObjectStore,
+                                                  RedisObjectStore]:
+    scan_store = RedisObjectStore(namespace='test', redis_client=MockRedis())
+    indexed_store = RedisObjectStore(
+        namespace='test',
+        redis_client=RoundTripCountingRedis(),
+        equality_indexes=['name', 'state'],
+        ordered_indexes=['age']
+    )
+
+    names = ['alice', 'bob', 'fred', 'joe', 'zeph']
+    states = ['Installed', 'Provisioned', None]
+    for i in range(count):
+        obj = {
+            'number': i,
+            'name': names[i % len(names)],
+            'state': states[i % len(states)],
+            'age': i % 50,
+            'tags': {'index': i},
+        }
+        scan_store.set('my_key{}'.format(i), obj)
+        indexed_store.set('my_key{}'.format(i), obj)
+
+    return scan_store, indexed_store
+
+
+@pytest.mark.parametrize('filters', [
+    {'name': 'bob'},
+    {'name': 'bob', 'state': 'Installed'},
+    {'state': None},
+    {'age': 10},
+    {'age__gt': 40},
+    {'age__lt': 5, 'name': 'joe'},
+    {'age__gt': 10, 'age__lt': 20, 'state': 'Provisioned'},
+    {'name': 'nobody'},
+    #
+    # Not indexed, or not answerable by an index
+    #
+    {'number__lt': 20},
+    {'tags__index__gt': 290},
+    {'name__gt': 'joe'},
+])
+def test_list_indexed_matches_scan(filters):
+    scan_store, indexed_store = _populate_indexed_stores(300)
+
+    for kwargs in [{}, {'order_by': 'number'},
+                   {'order_by': 'number', 'order_desc': True, 'limit': 7}]:
+        scanned = list(scan_store.list(**kwargs, **filters))
+        indexed = list(indexed_store.list(**kwargs, **filters))
+        if 'order_by' not in kwargs:
+            scanned.sort()
+            indexed.sort()
+
+        assert indexed == scanned
+
+
+def test_list_indexed_loads_only_candidates():
+    _, store = _populate_indexed_stores(300)
+    redis = store._redis
+
+    redis.objects_fetched = 0
+    result = list(store.list(name='bob', age__lt=10))
+    assert len(result) == 12
+    assert redis.objects_fetched == 12
+
+
+def test_indexes_updated(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             equality_indexes=['name'],
+                             ordered_indexes=['age'])
+
+    store.set('my_key1', {'name': 'bob', 'age': 30})
+    store.set('my_key2', {'name': 'bob', 'age': 40})
+
+    #
+    # Make sure updated values are moved in the indexes
+    #
+    store.set('my_key1', {'name': 'alice', 'age': 50})
+    assert [k for k, _ in store.list(name='bob')] == ['my_key2']
+    assert [k for k, _ in store.list(name='alice')] == ['my_key1']
+    assert [k for k, _ in store.list(age__gt=45)] == ['my_key1']
+
+    #
+    # Make sure attributes that are not updated keep their index entries
+    #
+    store.set('my_key2', {'other': 'value'})
+    assert [k for k, _ in store.list(name='bob')] == ['my_key2']
+    assert [k for k, _ in store.list(age=40)] == ['my_key2']
+
+    #
+    # Make sure deleted objects are removed from the indexes
+    #
+    store.delete('my_key2')
+    assert list(store.list(name='bob')) == []
+    assert list(store.list(age__lt=100)) == [
+        ('my_key1', {'name': 'alice', 'age': 50})]
+
+
+def test_indexes_updated_concurrently(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             equality_indexes=['name'])
+
+    store.set('my_key1', {'name': 'bob'})
+
+    #
+    # Simulate another writer updating the object after its old index
+    # values have been read, but before the transaction is executed
+    #
+    hmget = redis.hmget
+    concurrent_writes = [{'name': 'alice'}]
+
+    def hmget_mock(key, fields):
+        values = hmget(key, fields)
+        if concurrent_writes:
+            RedisObjectStore(
+                namespace='test', redis_client=redis,
+                equality_indexes=['name']
+            ).set('my_key1', concurrent_writes.pop())
+        return values
+
+    redis.hmget = hmget_mock
+
+    store.set('my_key1', {'name': 'fred'})
+
+    #
+    # Make sure the write was retried, and only the final value is indexed
+    #
+    assert store.get('my_key1') == {'name': 'fred'}
+    assert redis.smembers('test:INDEX:EQ:name:bob') == []
+    assert redis.smembers('test:INDEX:EQ:name:alice') == []
+    assert redis.smembers('test:INDEX:EQ:name:fred') == [b'test:my_key1']
+
+
+@pytest.mark.parametrize('order_desc', [False, True])
+def test_list_page(order_desc):
+    redis = RoundTripCountingRedis()
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             ordered_indexes=['number'])
+
+    #
+    # Use a lot of duplicate numbers, to make sure paging works across
+    # objects with the same sort key
+    #
+    for i in range(100):
+        store.set('my_key{:03d}'.format(i), {'id': i, 'number': i // 10})
+    expected = list(store.list(order_by='number', order_desc=order_desc))
+    expected_numbers = [v['number'] for _, v in expected]
+    assert expected_numbers == sorted(expected_numbers, reverse=order_desc)
+
+    paged = []
+    cursor = None
+    while True:
+        redis.objects_fetched = 0
+        page, cursor = store.list_page(order_by='number',
+                                       order_desc=order_desc,
+                                       limit=7, cursor=cursor)
+        #
+        # Make sure only the objects in the page (and the first object of
+        # the next page) are fetched
+        #
+        assert redis.objects_fetched <= len(page) + 1
+        paged.extend(page)
+        if cursor is None:
+            break
+        assert len(page) == 7
+
+    assert [v['id'] for _, v in paged] == \
+        sorted([v['id'] for _, v in expected], reverse=order_desc)
+    assert [v['number'] for _, v in paged] == expected_numbers
+
+
+def test_list_page_filters(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             ordered_indexes=['number'])
+
+    for i in range(50):
+        store.set('my_key{}'.format(i),
+                  {'number': i, 'name': 'even' if i % 2 else 'odd'})
+
+    numbers = []
+    cursor = None
+    while True:
+        page, cursor = store.list_page(order_by='number', limit=4,
+                                       cursor=cursor, name='odd',
+                                       number__lt=20)
+        numbers.extend(v['number'] for _, v in page)
+        if cursor is None:
+            break
+
+    assert numbers == list(range(0, 20, 2))
+
+
+def test_list_page_deleted_cursor(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             ordered_indexes=['number'])
+
+    for i in range(10):
+        store.set('my_key{}'.format(i), {'number': i})
+
+    page, cursor = store.list_page(order_by='number', limit=3)
+    assert [v['number'] for _, v in page] == [0, 1, 2]
+
+    #
+    # Make sure the next page is still correct after the object the
+    # cursor points to is deleted
+    #
+    store.delete('my_key2')
+    page, cursor = store.list_page(order_by='number', limit=3,
+                                   cursor=cursor)
+    assert [v['number'] for _, v in page] == [3, 4, 5]
+
+    #
+    # Make sure the last page has no next cursor
+    #
+    page, cursor = store.list_page(order_by='number', limit=4,
+                                   cursor=cursor)
+    assert [v['number'] for _, v in page] == [6, 7, 8, 9]
+    assert cursor is None
+
+
+def test_list_page_invalid(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             ordered_indexes=['number'])
+    store.set('my_key1', {'number': 1, 'name': 'bob'})
+    store.set('my_key2', {'number': 2, 'name': 'bob'})
+
+    with pytest.raises(Exception):
+        store.list_page(order_by='name')
+
+    with pytest.raises(Exception):
+        store.list_page(order_by='number', cursor='not-a-cursor')
+
+    _, cursor = store.list_page(order_by='number', limit=1)
+    with pytest.raises(Exception):
+        store.list_page(order_by='number', order_desc=True, cursor=cursor)
+
+
+def test_delete_removes_index_entry(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis)
+
+    store.set('my_key1', data_1)
+    store.delete('my_key1')
+
+    assert redis.smembers('test:INDEX') == []
+
+
+def test_reindex(redis):
+    #
+    # Store objects the way they were stored before the store had any
+    # indexes
+    #
+    for i in range(20):
+        redis.hmset('test:my_key{}'.format(i),
+                    {'number': i, 'name': 'bob' if i % 2 else 'alice'})
+        redis.sadd('test:INDEX', 'test:my_key{}'.format(i))
+
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             equality_indexes=['name'],
+                             ordered_indexes=['number'],
+                             fetch_chunk_size=7)
+
+    #
+    # Make sure the indexed queries skip objects that are not indexed
+    #
+    assert list(store.list(name='bob')) == []
+    assert store.list_page(order_by='number') == ([], None)
+    assert store.trim(order_by='number', max_count=5) == 0
+
+    #
+    # Make sure the existing objects are only indexed once
+    #
+    store.set('my_key20', {'number': 20, 'name': 'bob'})
+    assert store.reindex() == 21
+    assert store.reindex() == 0
+    assert store.reindex(force=True) == 21
+
+    assert [v['number'] for _, v in store.list(name='bob',
+                                               order_by='number')] == \
+        list(range(1, 21, 2)) + [20]
+    page, _ = store.list_page(order_by='number', limit=100)
+    assert [v['number'] for _, v in page] == list(range(21))
+    assert store.trim(order_by='number', max_count=5, name='alice') == 5
+    assert sorted(redis.smembers('test:INDEX:EQ:name:alice')) == sorted(
+        'test:my_key{}'.format(i).encode() for i in range(10, 20, 2))
+
+    #
+    # Make sure objects are indexed again when the index definitions
+    # change
+    #
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             equality_indexes=['name', 'number'],
+                             ordered_indexes=['number'])
+    assert store.reindex() == 16
+    assert [k for k, _ in store.list(number=19)] == ['my_key19']
+
+
+def test_reindex_concurrent_update(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             equality_indexes=['name'],
+                             ordered_indexes=['number'])
+
+    redis.hmset('test:my_key1', {'number': 1, 'name': 'bob'})
+    redis.sadd('test:INDEX', 'test:my_key1')
+
+    #
+    # Simulate the object being updated after its values have been read
+    # for reindexing, but before its index entries are added
+    #
+    get_many_indexed_values = store._get_many_indexed_values
+
+    def get_many_indexed_values_mock(keys):
+        values = get_many_indexed_values(keys)
+        if not redis.smembers('test:INDEX:EQ:name:bob'):
+            store.set('my_key1', {'number': 2, 'name': 'alice'})
+        return values
+
+    store._get_many_indexed_values = get_many_indexed_values_mock
+
+    assert store.reindex() == 1
+    assert redis.smembers('test:INDEX:EQ:name:bob') == []
+    assert redis.smembers('test:INDEX:EQ:name:alice') == [b'test:my_key1']
+    assert redis.zrangebyscore('test:INDEX:ORD:number', 2, 2) == \
+        [b'test:my_key1']
+
+
+def test_ttl_sweep(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             equality_indexes=['name'],
+                             ordered_indexes=['number'])
+
+    for i in range(10):
+        store.set('my_key{}'.format(i),
+                  {'number': i, 'name': 'bob' if i % 2 else 'alice'},
+                  ttl=60 if i < 8 else None)
+    assert redis.ttl('test:my_key3') == 60
+    assert redis.ttl('test:my_key9') == -1
+
+    #
+    # Simulate Redis expiring some of the objects
+    #
+    for i in range(5):
+        redis.delete('test:my_key{}'.format(i))
+
+    #
+    # Make sure nothing is swept before the objects are due to expire, and
+    # that the keyspace and the index set are never scanned
+    #
+    def scan_mock(*args, **kwargs):
+        raise AssertionError('Keys scanned')
+
+    redis.scan_iter = scan_mock
+    redis.sscan_iter = scan_mock
+
+    assert store.sweep() == 0
+
+    with mock.patch('time.time', return_value=time.time() + 61):
+        assert store.sweep() == 5
+        assert store.sweep() == 0
+
+    #
+    # Make sure none of the indexes refer to the expired objects
+    #
+    expected = sorted('test:my_key{}'.format(i).encode()
+                      for i in range(5, 10))
+    assert sorted(redis.smembers('test:INDEX')) == expected
+    assert sorted(redis.smembers('test:INDEX:EQ:name:bob') +
+                  redis.smembers('test:INDEX:EQ:name:alice')) == expected
+    assert redis.zrangebyscore('test:INDEX:ORD:number',
+                               '-inf', '+inf') == expected
+    assert sorted(redis.hgetall('test:INDEX:VALUES').keys()) == \
+        [key.decode() for key in expected]
+
+    #
+    # Objects that are due, but not expired by Redis yet, are left for the
+    # next sweep
+    #
+    assert redis.zrangebyscore('test:INDEX:EXPIRY', '-inf', '+inf') == \
+        expected[:3]
+
+    store.delete('my_key5')
+    assert redis.zrangebyscore('test:INDEX:EXPIRY', '-inf', '+inf') == \
+        expected[1:3]
+
+
+def test_trim(redis):
+    store = RedisObjectStore(namespace='test', redis_client=redis,
+                             equality_indexes=['name'],
+                             ordered_indexes=['number'])
+
+    for i in range(20):
+        store.set('my_key{}'.format(i),
+                  {'number': i, 'name': 'bob' if i % 2 else 'alice'})
+
+    #
+    # Make sure the objects are deleted in one transaction per chunk
+    #
+    def delete_mock(key):
+        raise AssertionError('Deleted one at a time')
+
+    store.delete = delete_mock
+
+    transactions = []
+    pipeline = redis.pipeline
+
+    def pipeline_mock(transaction=True):
+        if transaction:
+            transactions.append(True)
+        return pipeline(transaction=transaction)
+
+    redis.pipeline = pipeline_mock
+
+    #
+    # Make sure only the lowest numbered matching objects are deleted
+    #
+    assert store.trim(order_by='number', max_count=3, name='bob') == 7
+    assert len(transactions) == 1
+    assert store.trim(order_by='number', max_count=3, name='bob') == 0
+    assert [v['number'] for _, v in store.list(order_by='number')] == \
+        sorted(list(range(0, 20, 2)) + [15, 17, 19])
+
+    assert store.trim(order_by='number', max_count=5) == 8
+    assert [v['number'] for _, v in store.list(order_by='number')] == \
+        [15, 16, 17, 18, 19]
+
+    with pytest.raises(Exception):
+        store.trim(order_by='name', max_count=1)
+
+    with pytest.raises(Exception):
+        store.trim(order_by='number', max_count=1, number__gt=3)
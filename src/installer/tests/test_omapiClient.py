@@ -0,0 +1,117 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+
+import mock
+import pytest
+
+from tortuga.config.configManager import ConfigManager
+from tortuga.db.models.network import Network
+from tortuga.db.models.nic import Nic
+from tortuga.db.models.node import Node
+from tortuga.os_objects.rhel import bootHostManager
+from tortuga.os_objects.rhel.bootHostManager import BootHostManager
+from tortuga.os_objects.rhel.omapiClient import OmapiClient, pack_mac
+from .mocks.omapi import MockOmapiServer
+
+
+@pytest.fixture()
+def omapi_server():
+    with MockOmapiServer() as server:
+        yield server
+
+
+def get_mac(index: int) -> str:
+    return '52:54:00:{:02x}:{:02x}:{:02x}'.format(
+        (index >> 16) & 0xff, (index >> 8) & 0xff, index & 0xff)
+
+
+def get_ip(index: int) -> str:
+    return '10.{}.{}.{}'.format(
+        (index >> 16) & 0xff, (index >> 8) & 0xff, index & 0xff)
+
+
+def test_add_remove_hosts(omapi_server):
+    with OmapiClient(port=omapi_server.port) as client:
+        assert client.add_hosts([
+            ('compute-01', '52:54:00:00:00:01', '10.0.0.1'),
+            ('compute-02', '52:54:00:00:00:02', '10.0.0.2'),
+            ('compute-03', '52:54:00:00:00:01', '10.0.0.3'),
+        ]) == [None, None, 'already exists']
+
+        host = omapi_server.hosts[pack_mac('52:54:00:00:00:02')]
+        assert host[b'name'] == b'compute-02'
+        assert host[b'ip-address'] == b'\x0a\x00\x00\x02'
+
+        assert client.remove_hosts([
+            '52:54:00:00:00:01',
+            '52:54:00:00:00:03',
+        ]) == [None, 'not found']
+
+    assert list(omapi_server.hosts.keys()) == [pack_mac('52:54:00:00:00:02')]
+
+
+def test_dhcp_leases_batched(omapi_server):
+    """
+    Leases of many nodes are added and removed over one connection each,
+    without running omshell
+    """
+    count = 5000
+
+    network = Network(address='10.0.0.0', netmask='255.0.0.0',
+                      type='provision')
+
+    leases = []
+    for index in range(count):
+        nic = Nic(mac=get_mac(index), ip=get_ip(index), network=network)
+        node = Node(name='compute-{:05d}'.format(index), nics=[nic])
+
+        leases.append((node, nic))
+
+    bhm = BootHostManager(ConfigManager())
+
+    with mock.patch.object(bootHostManager, 'OmapiClient',
+                           functools.partial(OmapiClient,
+                                             port=omapi_server.port)), \
+            mock.patch('subprocess.Popen') as popen_mock:
+        bhm.addDhcpLeases(leases)
+
+        assert len(omapi_server.hosts) == count
+
+        bhm.removeDhcpLeases([node for node, _ in leases])
+
+    assert not omapi_server.hosts
+    assert omapi_server.connections == 2
+    assert popen_mock.call_count == 0
+
+
+def test_dhcp_leases_connection_error():
+    """
+    Failing to connect to the DHCP server is logged, not raised
+    """
+    network = Network(address='10.0.0.0', netmask='255.0.0.0',
+                      type='provision')
+    nic = Nic(mac=get_mac(1), ip=get_ip(1), network=network)
+    node = Node(name='compute-00001', nics=[nic])
+
+    bhm = BootHostManager(ConfigManager())
+
+    with mock.patch.object(bootHostManager, 'OmapiClient',
+                           side_effect=ConnectionRefusedError), \
+            mock.patch.object(bhm, '_logger') as logger_mock:
+        bhm.addDhcpLease(node, nic)
+        bhm.removeDhcpLease(node)
+
+    assert logger_mock.error.call_count == 2
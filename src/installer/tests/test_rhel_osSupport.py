@@ -16,9 +16,19 @@
 WIP: needs complete unit tests implemented
 """
 
+import os
+import shutil
+import time
+
+import mock
 import pytest
 
+from tortuga.config.configManager import ConfigManager
+from tortuga.db.models.nic import Nic
 from tortuga.db.models.node import Node
+from tortuga.db.models.operatingSystem import OperatingSystem
+from tortuga.db.models.operatingSystemFamily import OperatingSystemFamily
+from tortuga.db.models.softwareProfile import SoftwareProfile
 from tortuga.db.nodesDbHandler import NodesDbHandler
 from tortuga.exceptions.nodeNotFound import NodeNotFound
 from tortuga.objects.osFamilyInfo import OsFamilyInfo
@@ -50,3 +60,67 @@ class TestRhelOSSupport:
 
         with pytest.raises(NodeNotFound):
             osSupport._OSSupport__validate_node(node)
+
+
+def test_getKickstartFileContents_cached(tmp_path):
+    """
+    Render 10,000 kickstart files for distinct nodes from a template that
+    is compiled once, and reloaded when the template file changes
+    """
+
+    num_nodes = 10000
+
+    ks_template = str(tmp_path / 'kickstart.tmpl')
+
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), '..', 'config',
+                     'kickstart.tmpl'),
+        ks_template)
+
+    osSupport = OSSupport(OsFamilyInfo('rhel', '7', 'x86_64'))
+
+    swprofile = SoftwareProfile(
+        name='compute',
+        os=OperatingSystem(
+            name='centos', family=OperatingSystemFamily(name='rhel')))
+
+    def get_template_subst_dict(session, node, hardwareprofile,
+                                softwareprofile): \
+            # pylint: disable=unused-argument
+        return {
+            'fqdn': node.name,
+            'osfamilyvers': 7,
+        }
+
+    with mock.patch.object(ConfigManager, 'getKitConfigBase',
+                           return_value=str(tmp_path)), \
+            mock.patch.object(osSupport,
+                              '_OSSupport__get_template_subst_dict',
+                              side_effect=get_template_subst_dict):
+        start = time.time()
+
+        for n in range(num_nodes):
+            node = Node(name='compute-{:05d}.private'.format(n),
+                        nics=[Nic()])
+
+            result = osSupport.getKickstartFileContents(
+                None, node, None, swprofile)
+
+            assert 'compute-{:05d}.private'.format(n) in result
+
+        elapsed = time.time() - start
+
+        # Modified templates are reloaded
+        with open(ks_template, 'a') as fp:
+            fp.write('# modified {{ fqdn }}\n')
+
+        stat = os.stat(ks_template)
+        os.utime(ks_template, (stat.st_atime, stat.st_mtime + 1))
+
+        result = osSupport.getKickstartFileContents(
+            None, Node(name='compute-new.private', nics=[Nic()]),
+            None, swprofile)
+
+        assert '# modified compute-new.private' in result
+
+    assert elapsed < 30
@@ -0,0 +1,331 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+import timeit
+
+import mock
+import pytest
+
+from tortuga.events.manager import EventStoreManager, PubSubManager
+from tortuga.events.store import ObjectStoreEventStore
+from tortuga.objectstore.redis import RedisObjectStore
+from tortuga.events.types.node import NodeStateChanged
+from tortuga.web_service.websocket.dispatcher import EventDispatcher
+from tortuga.web_service.websocket.message_queue import MessageQueue, \
+    POLICY_COALESCE, POLICY_DISCONNECT, POLICY_DROP_OLDEST
+from tortuga.web_service.websocket.messages import ErrorMessage
+from tortuga.web_service.websocket.state import State
+from .test_events import ExampleEvent
+
+
+@pytest.fixture()
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    yield loop
+
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.fixture()
+def event_store(redis):
+    object_store = RedisObjectStore(namespace='events', redis_client=redis)
+    store = ObjectStoreEventStore(object_store=object_store)
+    EventStoreManager._event_store = store
+    PubSubManager._redis_client = redis
+
+    return store
+
+
+def wait_for_subscription(redis, timeout: float = 5):
+    """
+    Waits for the dispatcher thread to subscribe to events.
+
+    """
+    start = time.time()
+    while time.time() - start < timeout:
+        if redis._pubsubs and redis._pubsubs[-1]._patterns:
+            return
+        time.sleep(0.01)
+    raise Exception('Dispatcher did not subscribe')
+
+
+def test_dispatcher(loop, redis, event_store):
+    dispatcher = EventDispatcher(loop=loop)
+
+    #
+    # Subscribe a large number of websocket sessions, all of which should
+    # share a single subscription
+    #
+    states = []
+    for _ in range(1000):
+        state = State()
+        state.authenticated = True
+        state.subscribe(dispatcher)
+        states.append(state)
+
+    unauthenticated = State()
+    unauthenticated.subscribe(dispatcher)
+
+    wait_for_subscription(redis)
+    assert len(redis._pubsubs) == 1
+
+    events_in = [ExampleEvent.fire(integer=i, string='testing')
+                 for i in range(3)]
+
+    async def receive(state: State):
+        return [await state.next_message(timeout=5) for _ in events_in]
+
+    #
+    # Ensure every authenticated session receives every event, in order
+    #
+    received = loop.run_until_complete(
+        asyncio.gather(*[receive(state) for state in states]))
+    for events_out in received:
+        assert events_out == events_in
+
+    #
+    # Ensure unauthenticated sessions do not receive events
+    #
+    assert loop.run_until_complete(
+        unauthenticated.next_message(timeout=0.1)) is None
+
+    #
+    # Ensure unsubscribed sessions no longer receive events
+    #
+    states[0].unsubscribe()
+    ExampleEvent.fire(integer=4, string='testing')
+    assert loop.run_until_complete(
+        states[1].next_message(timeout=5)).integer == 4
+    assert loop.run_until_complete(
+        states[0].next_message(timeout=0.1)) is None
+
+    #
+    # Ensure the thread stops, and closes the subscription, once the
+    # dispatcher is stopped
+    #
+    thread = dispatcher._thread
+    dispatcher.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert not redis._pubsubs[-1]._patterns
+
+
+def test_dispatcher_disconnect_slow_subscriber(loop, redis, event_store):
+    dispatcher = EventDispatcher(loop=loop)
+
+    states = []
+    for _ in range(10):
+        state = State()
+        state.authenticated = True
+        state.subscribe(dispatcher)
+        states.append(state)
+
+    slow = State(message_queue_size=2,
+                 message_queue_policy=POLICY_DISCONNECT)
+    slow.authenticated = True
+    slow.subscribe(dispatcher)
+
+    #
+    # Ensure that a subscriber disconnected by an overflowing queue is
+    # unsubscribed, while the other subscribers still receive every event
+    #
+    events_in = [ExampleEvent.fire(integer=i, string='testing')
+                 for i in range(3)]
+    for event in events_in:
+        dispatcher.dispatch(event)
+
+    assert slow.exit
+    assert slow not in dispatcher._subscribers
+    assert len(dispatcher.get_queue_stats()) == 10
+
+    for state in states:
+        assert [loop.run_until_complete(state.next_message(timeout=0))
+                for _ in events_in] == events_in
+
+    dispatcher.stop()
+
+
+def test_dispatcher_queue_stats_threadsafe(loop):
+    from tortuga.web_service.controllers.rootController import \
+        RootController
+
+    dispatcher = EventDispatcher(loop=loop)
+    dispatcher.start = lambda: None
+
+    state = State(message_queue_size=2)
+    state.username = 'admin'
+    state.authenticated = True
+    state.subscribe(dispatcher)
+
+    for i in range(3):
+        dispatcher.dispatch(ExampleEvent(integer=i, string='testing'))
+
+    #
+    # Ensure the metrics are empty until the websocket server runs the
+    # event loop
+    #
+    assert dispatcher.get_queue_stats_threadsafe() == []
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    try:
+        expected = [{
+            'username': 'admin',
+            'depth': 2,
+            'max_depth': 2,
+            'maxsize': 2,
+            'policy': POLICY_DROP_OLDEST,
+            'dropped': 1,
+            'coalesced': 0,
+        }]
+
+        #
+        # Ensure the metrics are gathered by the event loop, and served
+        # by the metrics endpoint of the web service
+        #
+        assert dispatcher.get_queue_stats_threadsafe() == expected
+
+        with mock.patch.object(EventDispatcher, '_instance', dispatcher):
+            assert RootController(mock.Mock()).getWebsocketMetrics() == \
+                {'sessions': expected}
+
+        with mock.patch.object(EventDispatcher, '_instance', None):
+            assert RootController(mock.Mock()).getWebsocketMetrics() == \
+                {'sessions': []}
+
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+
+def test_next_message_wakes_on_enqueue(loop):
+    state = State()
+
+    async def enqueue_later():
+        await asyncio.sleep(0.05)
+        state.enqueue_message(ErrorMessage(reason='testing'))
+
+    async def wait():
+        start = loop.time()
+        msg, _ = await asyncio.gather(state.next_message(timeout=5),
+                                      enqueue_later())
+        return msg, loop.time() - start
+
+    #
+    # Ensure the waiting consumer wakes up as soon as a message is
+    # enqueued, rather than on a polling interval
+    #
+    msg, elapsed = loop.run_until_complete(wait())
+    assert msg.reason == 'testing'
+    assert elapsed < 0.5
+
+
+def test_next_message_authentication_timeout(loop):
+    state = State()
+    state.AUTHENTICATION_TIMEOUT = 0.1
+    state.start_authentication_timeout()
+
+    #
+    # Ensure that waiting for a message for the remaining authentication
+    # time returns once the authentication period expires
+    #
+    msg = loop.run_until_complete(state.next_message(
+        timeout=state.get_authentication_time_remaining()))
+
+    assert msg is None
+    assert state.is_authentication_timed_out()
+
+
+def test_message_queue_drop_oldest(loop):
+    queue = MessageQueue(maxsize=10, policy=POLICY_DROP_OLDEST)
+    for i in range(25):
+        assert queue.put(i)
+
+    #
+    # Ensure the newest messages are kept, and the oldest dropped
+    #
+    assert [queue.get_nowait() for _ in range(len(queue))] == \
+        list(range(15, 25))
+    assert queue.get_stats() == {
+        'depth': 0,
+        'max_depth': 10,
+        'maxsize': 10,
+        'policy': POLICY_DROP_OLDEST,
+        'dropped': 15,
+        'coalesced': 0
+    }
+
+
+def test_message_queue_coalesce(loop):
+    def node_event(node_id: int, state: str) -> NodeStateChanged:
+        return NodeStateChanged(node={'id': node_id, 'state': state},
+                                previous_state='Unknown')
+
+    queue = MessageQueue(maxsize=3, policy=POLICY_COALESCE)
+    queue.put(node_event(1, 'Provisioned'))
+    queue.put(node_event(2, 'Provisioned'))
+    queue.put(ErrorMessage(reason='testing'))
+
+    #
+    # Ensure that when full, a newer event for a queued node replaces the
+    # queued event in place, and otherwise the oldest message is dropped
+    #
+    queue.put(node_event(1, 'Installed'))
+    queue.put(node_event(3, 'Installed'))
+
+    messages = [queue.get_nowait() for _ in range(len(queue))]
+    assert [m.node['id'] for m in messages[::2]] == [2, 3]
+    assert messages[1].reason == 'testing'
+    assert queue.get_stats()['coalesced'] == 1
+    assert queue.get_stats()['dropped'] == 1
+
+
+def test_message_queue_disconnect(loop):
+    state = State(message_queue_size=10,
+                  message_queue_policy=POLICY_DISCONNECT)
+    for i in range(11):
+        state.enqueue_message(ErrorMessage(reason=str(i)))
+
+    #
+    # Ensure that overflowing the queue disconnects the client, with a
+    # final message explaining why
+    #
+    assert state.exit
+    msg = loop.run_until_complete(state.next_message(timeout=0))
+    assert msg.reason == 'Message queue full'
+    assert loop.run_until_complete(state.next_message(timeout=0)) is None
+
+
+def test_message_queue_throughput(loop):
+    queue = MessageQueue(maxsize=10000)
+
+    def fill_and_drain():
+        for i in range(10000):
+            queue.put(i)
+        for _ in range(10000):
+            queue.get_nowait()
+
+    #
+    # Enqueueing and dequeueing 10k messages must not be quadratic,
+    # even on slow test hosts this takes well under a second
+    #
+    assert timeit.timeit(fill_and_drain, number=5) < 5
+    assert queue.empty()
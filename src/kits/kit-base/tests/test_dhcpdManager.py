@@ -0,0 +1,166 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+import os
+
+import mock
+import pytest
+
+from tortuga_kits.base_7_0_3.util.rhel.dhcpdManager import DhcpdManager
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'dhcpd')
+
+TEMPLATE_FILE = os.path.join(
+    os.path.dirname(__file__), '..', 'tortuga_kits', 'base_7_0_3',
+    'components', 'dhcpd', 'files', 'dhcpd.conf.tmpl')
+
+
+def get_subnets(num_nodes):
+    network = ipaddress.IPv4Network('10.2.0.0/255.255.0.0')
+
+    nodes = [
+        {
+            'ip': str(network[n + 10]),
+            'mac': '52:54:00:00:{:02X}:{:02X}'.format(n // 256, n % 256),
+            'fqdn': 'compute-{:02d}.private'.format(n + 1),
+            'hostname': 'compute-{:02d}'.format(n + 1),
+            'unmanaged': False,
+        }
+        for n in range(num_nodes)
+    ]
+
+    return {
+        network: {
+            'nodes': nodes,
+            'installerIp': ipaddress.IPv4Address('10.2.0.1'),
+            'gateway': ipaddress.IPv4Address('10.2.0.1'),
+        },
+    }
+
+
+def read_golden_file(name, conf_dir):
+    with open(os.path.join(FIXTURES_DIR, name)) as fp:
+        return fp.read().replace('@CONFDIR@', conf_dir)
+
+
+@pytest.fixture
+def dhcpd_manager(tmp_path):
+    with mock.patch.object(DhcpdManager, 'getConfigFileName',
+                           return_value=str(tmp_path / 'dhcpd.conf')), \
+            mock.patch.object(DhcpdManager, 'getTemplateFileName',
+                              return_value=TEMPLATE_FILE):
+        yield DhcpdManager()
+
+
+def configure(dhcpd_manager, subnets, incremental=True):
+    return dhcpd_manager.configure(
+        2400, 'private', [ipaddress.IPv4Address('10.2.0.1')], subnets,
+        None, incremental=incremental)
+
+
+def test_configure_golden(dhcpd_manager, tmp_path):
+    conf_dir = str(tmp_path)
+
+    subnets = get_subnets(257)
+
+    # Hosts with MAC addresses ending in the same byte are included
+    # through the same list
+    subnet = list(subnets.values())[0]
+    subnet['nodes'] = [subnet['nodes'][n] for n in (0, 1, 256)]
+
+    assert configure(dhcpd_manager, subnets)
+
+    for name in ['dhcpd.conf', 'tortuga-hosts.conf',
+                 'tortuga-hosts.d/.include-00',
+                 'tortuga-hosts.d/52-54-00-00-00-00.conf',
+                 'tortuga-hosts.d/52-54-00-00-01-00.conf']:
+        with open(os.path.join(conf_dir, name)) as fp:
+            assert fp.read() == read_golden_file(name, conf_dir), name
+
+    assert sorted(os.listdir(os.path.join(conf_dir, 'tortuga-hosts.d'))) == [
+        '.include-00', '.include-01', '.manifest-00', '.manifest-01',
+        '52-54-00-00-00-00.conf', '52-54-00-00-00-01.conf',
+        '52-54-00-00-01-00.conf']
+
+
+def test_configure_not_incremental_golden(dhcpd_manager, tmp_path):
+    conf_dir = str(tmp_path)
+
+    assert configure(dhcpd_manager, get_subnets(2), incremental=False)
+
+    with open(os.path.join(conf_dir, 'dhcpd.conf')) as fp:
+        assert fp.read() == read_golden_file(
+            'dhcpd-not-incremental.conf', conf_dir)
+
+    assert not os.path.exists(os.path.join(conf_dir, 'tortuga-hosts.d'))
+
+
+def test_configure_incremental(dhcpd_manager, tmp_path):
+    hosts_dir = str(tmp_path / 'tortuga-hosts.d')
+
+    subnets = get_subnets(100)
+
+    assert configure(dhcpd_manager, subnets)
+
+    # Nothing is written when nothing changed
+    with mock.patch.object(DhcpdManager, '_writeFile', autospec=True,
+                           side_effect=DhcpdManager._writeFile) \
+            as write_file_mock:
+        assert not configure(dhcpd_manager, subnets)
+
+    assert all(call[1].get('compare', True)
+               for call in write_file_mock.call_args_list)
+
+    # Only the declarations of changed, added, and removed hosts are
+    # written
+    nodes = list(subnets.values())[0]['nodes']
+    nodes[0]['ip'] = '10.2.1.10'
+    removed_node = nodes.pop()
+
+    added_subnets = get_subnets(101)
+    nodes.append(list(added_subnets.values())[0]['nodes'][100])
+
+    with mock.patch.object(DhcpdManager, '_writeFile', autospec=True,
+                           side_effect=DhcpdManager._writeFile) \
+            as write_file_mock:
+        assert configure(dhcpd_manager, subnets)
+
+    written = sorted(
+        os.path.basename(call[0][0])
+        for call in write_file_mock.call_args_list
+        if call[1].get('compare') is False)
+
+    assert written == ['.manifest-00', '.manifest-64',
+                       '52-54-00-00-00-00.conf', '52-54-00-00-00-64.conf']
+
+    with open(os.path.join(hosts_dir, '52-54-00-00-00-00.conf')) as fp:
+        assert 'fixed-address 10.2.1.10;' in fp.read()
+
+    # The lists of shards without hosts are removed
+    for name in [DhcpdManager._getHostFileName(removed_node['mac']),
+                 '.include-63', '.manifest-63']:
+        assert not os.path.exists(os.path.join(hosts_dir, name))
+
+    with open(str(tmp_path / 'tortuga-hosts.conf')) as fp:
+        assert '.include-63' not in fp.read()
+
+    # Host files that have been removed outside of the manager are
+    # written again
+    os.unlink(os.path.join(hosts_dir, '52-54-00-00-00-01.conf'))
+
+    assert configure(dhcpd_manager, subnets)
+
+    assert os.path.exists(os.path.join(hosts_dir, '52-54-00-00-00-01.conf'))
@@ -0,0 +1,266 @@
+# Copyright 2008-2018 Univa Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import mock
+import pytest
+
+from tortuga_kits.base_7_0_3.components.dns import component
+from tortuga_kits.base_7_0_3.components.dns.component import (
+    ComponentInstaller, DnsmasqDnsProvider, write_file_if_changed)
+
+
+@pytest.fixture
+def dns_paths(tmp_path):
+    paths = {
+        'DNSMASQ_CONFIG_FILE': str(tmp_path / 'dnsmasq.d' /
+                                   'tortuga-dns.conf'),
+        'DNSMASQ_HOSTS_DIR': str(tmp_path / 'tortuga-dns-hosts.d'),
+        'DNSMASQ_ADDN_HOSTS_FILE': str(tmp_path / 'tortuga-dns-hosts'),
+    }
+
+    with mock.patch.multiple(component, **paths):
+        yield paths
+
+
+@pytest.fixture
+def service_handle():
+    handle = mock.Mock()
+
+    with mock.patch.object(component, 'getOsObjectFactory') as factory:
+        factory.return_value.getOsServiceManager.return_value = handle
+
+        yield handle
+
+
+def get_provider(use_hostsdir=True):
+    with mock.patch.object(component, 'dnsmasq_supports_hostsdir',
+                           return_value=use_hostsdir):
+        return DnsmasqDnsProvider('private')
+
+
+def read_file(path):
+    with open(path) as fp:
+        return fp.read()
+
+
+def assert_reloaded(service_handle):
+    service_handle.executeAndIgnoreFailure.assert_called_once_with(
+        'pkill -HUP -x dnsmasq')
+    assert not service_handle.restart.called
+
+    service_handle.reset_mock()
+
+
+def assert_not_updated(service_handle):
+    assert not service_handle.executeAndIgnoreFailure.called
+    assert not service_handle.restart.called
+
+
+def test_write(dns_paths, service_handle):
+    hosts_dir = dns_paths['DNSMASQ_HOSTS_DIR']
+
+    provider = get_provider()
+    provider.add_record('Compute-01.private', '10.0.0.1')
+    provider.add_record('compute-02.private', '10.0.0.2')
+    provider.write()
+
+    #
+    # Ensure each host has its own file, and that writing the config file
+    # for the first time restarts dnsmasq
+    #
+    assert read_file(dns_paths['DNSMASQ_CONFIG_FILE']).endswith(
+        'hostsdir={}'.format(hosts_dir))
+    assert sorted(os.listdir(hosts_dir)) == \
+        ['compute-01.private', 'compute-02.private']
+    assert read_file(os.path.join(hosts_dir, 'compute-01.private')) == \
+        '10.0.0.1 compute-01.private\n'
+
+    provider.update_service()
+    service_handle.restart.assert_called_once_with('dnsmasq')
+    assert not service_handle.executeAndIgnoreFailure.called
+    service_handle.reset_mock()
+
+    #
+    # Ensure writing the same records again leaves dnsmasq alone
+    #
+    provider = get_provider()
+    provider.add_record('compute-01.private', '10.0.0.1')
+    provider.add_record('compute-02.private', '10.0.0.2')
+    provider.write()
+    provider.update_service()
+
+    assert_not_updated(service_handle)
+
+    #
+    # Ensure the files of hosts without records are removed, which
+    # requires dnsmasq to re-read its hosts files
+    #
+    provider = get_provider()
+    provider.add_record('compute-01.private', '10.0.0.1')
+    provider.write()
+    provider.update_service()
+
+    assert os.listdir(hosts_dir) == ['compute-01.private']
+    assert_reloaded(service_handle)
+
+
+def test_write_records(dns_paths, service_handle):
+    hosts_dir = dns_paths['DNSMASQ_HOSTS_DIR']
+
+    provider = get_provider()
+    provider.add_record('compute-01.private', '10.0.0.1')
+    provider.write()
+    provider.update_service()
+    service_handle.reset_mock()
+
+    #
+    # Ensure new hosts are added without touching the files of other
+    # hosts, and without signalling dnsmasq, which reads new files itself
+    #
+    provider = get_provider()
+    provider.add_record('compute-02.private', '10.0.0.2')
+    assert provider.write_records()
+    provider.update_service()
+
+    assert sorted(os.listdir(hosts_dir)) == \
+        ['compute-01.private', 'compute-02.private']
+    assert_not_updated(service_handle)
+
+    #
+    # Ensure changed hosts, and removed hosts, are dropped by dnsmasq
+    #
+    provider = get_provider()
+    provider.add_record('compute-02.private', '10.0.0.3')
+    assert provider.write_records()
+    provider.update_service()
+
+    assert read_file(os.path.join(hosts_dir, 'compute-02.private')) == \
+        '10.0.0.3 compute-02.private\n'
+    assert_reloaded(service_handle)
+
+    provider = get_provider()
+    provider.remove_records(['Compute-02.private', 'compute-03.private'])
+    provider.update_service()
+
+    assert os.listdir(hosts_dir) == ['compute-01.private']
+    assert_reloaded(service_handle)
+
+    provider = get_provider()
+    provider.remove_records(['compute-02.private'])
+    provider.update_service()
+
+    assert_not_updated(service_handle)
+
+
+def test_write_addn_hosts(dns_paths, service_handle):
+    addn_hosts_file = dns_paths['DNSMASQ_ADDN_HOSTS_FILE']
+
+    provider = get_provider(use_hostsdir=False)
+    provider.add_record('compute-01.private', '10.0.0.1')
+    provider.write()
+    provider.update_service()
+    service_handle.reset_mock()
+
+    #
+    # Ensure dnsmasq releases without hostsdir read the combined host
+    # files, and are signalled to re-read them when hosts are added
+    #
+    assert read_file(dns_paths['DNSMASQ_CONFIG_FILE']).endswith(
+        'addn-hosts={}'.format(addn_hosts_file))
+
+    provider = get_provider(use_hostsdir=False)
+    provider.add_record('compute-02.private', '10.0.0.2')
+    assert provider.write_records()
+    provider.update_service()
+
+    assert read_file(addn_hosts_file) == \
+        '10.0.0.1 compute-01.private\n10.0.0.2 compute-02.private\n'
+    assert_reloaded(service_handle)
+
+    provider = get_provider(use_hostsdir=False)
+    provider.remove_records(['compute-01.private'])
+    provider.update_service()
+
+    assert read_file(addn_hosts_file) == '10.0.0.2 compute-02.private\n'
+    assert_reloaded(service_handle)
+
+
+def test_write_file_if_changed(tmp_path):
+    path = str(tmp_path / 'hosts.d' / 'compute-01')
+
+    assert write_file_if_changed(path, 'a\n')
+    stat = os.stat(path)
+
+    #
+    # Ensure unchanged files are not written, and that changed files are
+    # replaced, rather than rewritten in place, without leaving temporary
+    # files behind
+    #
+    assert not write_file_if_changed(path, 'a\n')
+    assert os.stat(path).st_ino == stat.st_ino
+
+    assert write_file_if_changed(path, 'b\n')
+    assert os.stat(path).st_ino != stat.st_ino
+    assert read_file(path) == 'b\n'
+    assert os.listdir(str(tmp_path / 'hosts.d')) == ['compute-01']
+
+
+def test_pre_add_host_upgrade(tmp_path, dns_paths, service_handle):
+    hosts_dir = dns_paths['DNSMASQ_HOSTS_DIR']
+
+    #
+    # A config file written by an earlier release, with the records in it
+    #
+    os.makedirs(os.path.dirname(dns_paths['DNSMASQ_CONFIG_FILE']))
+    with open(dns_paths['DNSMASQ_CONFIG_FILE'], 'w') as fp:
+        fp.write('domain=private\nhost-record=compute-01.private,10.0.0.1\n')
+
+    def action_configure(_, *args, **kwargs):
+        installer.provider.add_record('compute-01.private', '10.0.0.1')
+
+    with mock.patch.object(ComponentInstaller, '_private_dns_zone',
+                           return_value='private'), \
+            mock.patch.object(component, 'dnsmasq_supports_hostsdir',
+                              return_value=True):
+        installer = ComponentInstaller(
+            mock.Mock(**{'get_config_base.return_value': str(tmp_path)}))
+
+    installer.action_configure = action_configure
+
+    #
+    # Ensure the records of all hosts are written, before dnsmasq is
+    # restarted with the new config file
+    #
+    installer.action_pre_add_host(
+        'hwprofile', 'swprofile', 'compute-02.private', '10.0.0.2')
+
+    assert sorted(os.listdir(hosts_dir)) == \
+        ['compute-01.private', 'compute-02.private']
+    service_handle.restart.assert_called_once_with('dnsmasq')
+    service_handle.reset_mock()
+
+    #
+    # Ensure later hosts only write their own records
+    #
+    installer.provider = get_provider()
+    installer.action_configure = mock.Mock()
+
+    installer.action_pre_add_host(
+        'hwprofile', 'swprofile', 'compute-03.private', '10.0.0.3')
+
+    assert not installer.action_configure.called
+    assert len(os.listdir(hosts_dir)) == 3
+    assert_not_updated(service_handle)
@@ -298,6 +298,10 @@ class ComponentInstaller(ComponentInstallerBase):
                     config.get('tortuga_kit_base', 'disable_services') \
                     .split(' ')
 
+            if config.has_option('tortuga_kit_base', 'dhcpd_incremental'):
+                settings['dhcpd_incremental'] = config.getboolean(
+                    'tortuga_kit_base', 'dhcpd_incremental')
+
         return settings
 
     def _configure(self, softwareProfileName, fd, *args, **kwargs):
@@ -343,16 +347,27 @@ class ComponentInstaller(ComponentInstallerBase):
 
         installer_node = NodeApi().getInstallerNode(self.session)
 
-        self._manager.configure(
+        kit_settings = self._get_kit_settings_dictionary
+
+        changed = self._manager.configure(
             dhcp_lease_time,
             dns_zone,
             self._get_provisioning_nics_ip(installer_node),
             self._dhcp_subnets(),
             installerNode=installer_node,
             bUpdateSysconfig=kwargs.get('bUpdateSysconfig', True),
-            kit_settings=self._get_kit_settings_dictionary
+            kit_settings=kit_settings,
+            incremental=kit_settings.get('dhcpd_incremental', True)
         )
 
+        #
+        # The daemon is not restarted, as that would drop leases in flight.
+        # Hosts are added to, and removed from, the running daemon through
+        # OMAPI, and the configuration is used when it is next started.
+        #
+        if not changed:
+            logger.debug('[dhcpd] Configuration is unchanged')
+
     def action_post_install(self, *args, **kwargs):
         """
         Triggered post install.
@@ -12,13 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 from logging import getLogger
 
 from jinja2 import Template
 
 from tortuga.db.nodesDbHandler import NodesDbHandler
 from tortuga.db.models.hardwareProfile import HardwareProfile
-from tortuga.os_utility.osUtility import getOsObjectFactory
+from tortuga.os_utility.osUtility import (getNativeOsFamilyInfo,
+                                          getOsObjectFactory)
 from tortuga.db.globalParameterDbApi import GlobalParameterDbApi
 from tortuga.kit.installer import ComponentInstallerBase
 from tortuga.exceptions.parameterNotFound import ParameterNotFound
@@ -27,15 +29,35 @@ from tortuga.exceptions.parameterNotFound import ParameterNotFound
 logger = getLogger(__name__)
 
 
+DNSMASQ_CONFIG_FILE = '/etc/dnsmasq.d/tortuga-dns.conf'
+
+#
+# Each host has its own file in this directory, so that adding or
+# removing a host only writes that host's file. dnsmasq reads new and
+# changed files automatically, but only drops the records of changed or
+# removed files when it is sent SIGHUP. The directory must not be under
+# /etc/dnsmasq.d, where every file is read as configuration.
+#
+DNSMASQ_HOSTS_DIR = '/etc/tortuga-dns-hosts.d'
+
+#
+# dnsmasq releases before 2.73 (RHEL 6) have no hostsdir option, so the
+# host files are combined into this file, which is read with addn-hosts,
+# and re-read when dnsmasq is sent SIGHUP.
+#
+DNSMASQ_ADDN_HOSTS_FILE = '/etc/tortuga-dns-hosts'
+
 DNSMASQ_CONFIG_TEMPLATE = """
 # Tortuga DNS Config
 
 domain={{ domain }}
 local=/{{ domain }}/
 
-{% for host_record in host_records %}
-host-record={{ host_record.hostname }},{{ host_record.ip }}
-{% endfor %}
+{% if use_hostsdir -%}
+hostsdir={{ hosts_dir }}
+{%- else -%}
+addn-hosts={{ addn_hosts_file }}
+{%- endif %}
 """
 
 
@@ -84,6 +106,17 @@ class DnsmasqDnsProvider(DnsProvider):
         self._service_handle = getOsObjectFactory().getOsServiceManager()
         self._service_name = 'dnsmasq'
 
+        self.use_hostsdir = dnsmasq_supports_hostsdir()
+
+        self.restart_required = False
+        self.reload_required = False
+
+        #
+        # Set when host files are written or removed, until they are
+        # combined into the addn-hosts file
+        #
+        self._hosts_changed = False
+
     def _add_a_record(self, name, ip):
         """
         Add A record type.
@@ -131,6 +164,31 @@ class DnsmasqDnsProvider(DnsProvider):
         """
         self._service_handle.restart(self._service_name)
 
+    def reload_service(self):
+        """
+        Make the DNSMASQ service re-read its hosts files, dropping the
+        records of changed or removed files.
+
+        :returns: None
+        """
+        self._service_handle.executeAndIgnoreFailure(
+            'pkill -HUP -x {}'.format(self._service_name))
+
+    def update_service(self):
+        """
+        Restart or reload the DNSMASQ service, if required by the files
+        written since it was last updated.
+
+        :returns: None
+        """
+        if self.restart_required:
+            self.restart_service()
+        elif self.reload_required:
+            self.reload_service()
+
+        self.restart_required = False
+        self.reload_required = False
+
     def add_record(self, name, ip, record_type='A'):
         """
         Write individual records into the
@@ -152,20 +210,210 @@ class DnsmasqDnsProvider(DnsProvider):
 
     def write(self):
         """
-        Write the complete config file out.
+        Write the complete config out. Only the host files that have
+        changed are written, and the host files of hosts without records
+        are removed.
 
         :returns: None
         """
+        self._write_config()
+
+        hosts = self._get_hosts_file_contents()
+
+        for name in self._get_host_names():
+            if name not in hosts:
+                self._remove_hosts_file(name)
+
+        for name, contents in hosts.items():
+            self._write_hosts_file(name, contents)
+
+        self._write_addn_hosts_file()
+
+    def write_records(self):
+        """
+        Write the host files of the records that have been added, leaving
+        the files of other hosts as they are.
+
+        If the config file changes, it was written by an earlier release,
+        and the files of the other hosts have not been written yet, so
+        nothing else is written, and a complete write() is required.
+
+        :returns: True if the records were written, False if a complete
+                  write() is required
+        """
+        if self._write_config():
+            return False
+
+        for name, contents in self._get_hosts_file_contents().items():
+            self._write_hosts_file(name, contents)
+
+        self._write_addn_hosts_file()
+
+        return True
+
+    def remove_records(self, names):
+        """
+        Remove the host files of hosts.
+
+        :param names: List of host names
+        :returns: None
+        """
+        for name in names:
+            self._remove_hosts_file(name.lower())
+
+        self._write_addn_hosts_file()
+
+    def _write_config(self):
+        """
+        Write the config file. A changed config file requires a restart.
+
+        :returns: True if the config file was written
+        """
         template = Template(DNSMASQ_CONFIG_TEMPLATE)
 
         context = {
             'domain': self.private_dns_zone,
-            'host_records': self.host_records
+            'use_hostsdir': self.use_hostsdir,
+            'hosts_dir': DNSMASQ_HOSTS_DIR,
+            'addn_hosts_file': DNSMASQ_ADDN_HOSTS_FILE,
         }
 
-        rendered = template.render(context)
-        with open('/etc/dnsmasq.d/tortuga-dns.conf', 'w') as fp:
-            fp.write(rendered)
+        if not write_file_if_changed(DNSMASQ_CONFIG_FILE,
+                                     template.render(context)):
+            return False
+
+        self.restart_required = True
+
+        return True
+
+    def _write_addn_hosts_file(self):
+        """
+        Combine the host files into the addn-hosts file, if dnsmasq does
+        not read the hosts directory itself, and any of them changed.
+
+        :returns: None
+        """
+        if self.use_hostsdir or not self._hosts_changed:
+            return
+
+        contents = []
+        for name in sorted(self._get_host_names()):
+            with open(get_hosts_file_path(name)) as fp:
+                contents.append(fp.read())
+
+        if write_file_if_changed(DNSMASQ_ADDN_HOSTS_FILE,
+                                 ''.join(contents)):
+            self.reload_required = True
+
+        self._hosts_changed = False
+
+    def _get_hosts_file_contents(self):
+        """
+        Get the contents of the hosts file of each host with records.
+
+        :returns: Dict of host name to file contents
+        """
+        hosts = {}
+
+        for host_record in self.host_records:
+            name = host_record['hostname'].lower()
+
+            line = '{} {}\n'.format(host_record['ip'], name)
+
+            contents = hosts.get(name, '')
+            if line not in contents:
+                hosts[name] = contents + line
+
+        return hosts
+
+    def _get_host_names(self):
+        if not os.path.isdir(DNSMASQ_HOSTS_DIR):
+            return []
+
+        # dnsmasq ignores dotfiles, which are used for atomic writes
+        return [name for name in os.listdir(DNSMASQ_HOSTS_DIR)
+                if not name.startswith('.')]
+
+    def _write_hosts_file(self, name, contents):
+        path = get_hosts_file_path(name)
+
+        existed = os.path.exists(path)
+
+        if not write_file_if_changed(path, contents):
+            return
+
+        self._hosts_changed = True
+
+        if existed and self.use_hostsdir:
+            self.reload_required = True
+
+    def _remove_hosts_file(self, name):
+        try:
+            os.unlink(get_hosts_file_path(name))
+        except FileNotFoundError:
+            return
+
+        self._hosts_changed = True
+
+        if self.use_hostsdir:
+            self.reload_required = True
+
+
+def dnsmasq_supports_hostsdir():
+    """
+    Check whether the native dnsmasq supports the hostsdir option, which
+    dnsmasq releases before 2.73 (RHEL 6) do not.
+
+    :returns: Boolean
+    """
+    maj_version = \
+        int(getNativeOsFamilyInfo().getVersion().split('.', 1)[0])
+
+    return maj_version > 6
+
+
+def get_hosts_file_path(name):
+    """
+    Get the path of the hosts file for a host.
+
+    :param name: String host name
+    :returns: String path
+    """
+    if not name or name.startswith('.') or os.sep in name:
+        raise ValueError('Invalid host name: {}'.format(name))
+
+    return os.path.join(DNSMASQ_HOSTS_DIR, name)
+
+
+def write_file_if_changed(path, contents):
+    """
+    Atomically replace the contents of a file, unless they are unchanged.
+    The new contents are written to a temporary dotfile, and renamed over
+    the file.
+
+    :param path: String file path
+    :param contents: String file contents
+    :returns: True if the file was written
+    """
+    try:
+        with open(path) as fp:
+            if fp.read() == contents:
+                return False
+    except FileNotFoundError:
+        pass
+
+    dirname, basename = os.path.split(path)
+
+    os.makedirs(dirname, exist_ok=True)
+
+    tmp_path = os.path.join(dirname, '.{}.tmp'.format(basename))
+
+    with open(tmp_path, 'w') as fp:
+        fp.write(contents)
+
+    os.replace(tmp_path, path)
+
+    return True
 
 
 class ComponentInstaller(ComponentInstallerBase):
@@ -304,6 +552,7 @@ class ComponentInstaller(ComponentInstallerBase):
         """
         self.action_configure(software_profile_name, *args, **kwargs)
         self.provider.write()
+        self.provider.update_service()
 
     def action_post_install(self, *args, **kwargs):
         """
@@ -346,10 +595,17 @@ class ComponentInstaller(ComponentInstallerBase):
 
         :returns: None
         """
-        self.action_configure(None)
         self.provider.add_record(hostname, ip)
-        self.provider.write()
-        self.provider.restart_service()
+
+        if not self.provider.write_records():
+            #
+            # The config file was written by an earlier release, so the
+            # records of all hosts are written
+            #
+            self.action_configure(None)
+            self.provider.write()
+
+        self.provider.update_service()
 
     def action_delete_host(self, hardware_profile_name,
                            software_profile_name, nodes, *args, **kwargs):
@@ -358,10 +614,10 @@ class ComponentInstaller(ComponentInstallerBase):
 
         :param hardware_profile_name: String hardware profile name
         :param software_profile_name: String software profile name
-        :param nodes: List Objects
+        :param nodes: List of node names or objects
 
         :returns: None
         """
-        self.action_configure(None)
-        self.provider.write()
-        self.provider.restart_service()
+        self.provider.remove_records(
+            [getattr(node, 'name', node) for node in nodes])
+        self.provider.update_service()
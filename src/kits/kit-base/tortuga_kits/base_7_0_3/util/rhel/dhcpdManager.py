@@ -13,6 +13,8 @@
 # limitations under the License.
 # pylint: disable=no-member
 
+import hashlib
+import json
 import os
 import shutil
 import platform
@@ -25,11 +27,27 @@ from tortuga.os_utility.osUtility import getNativeOsFamilyInfo
 class DhcpdManager(OsObjectManager):
     """
     RHEL dhcpd manager.
+
+    In incremental mode, the host declaration of each node is kept in its
+    own file in an include directory, keyed by MAC address, and the
+    configuration file includes them through generated lists of include
+    statements. The content hash of each host file is recorded in a
+    manifest, so that only the host files that differ from the database
+    are written or removed.
     """
 
     SERVICE_CONFIG_FILE = '/etc/dhcpd.conf'
     SERVICE_NAME = 'dhcpd'
 
+    #
+    # Paths of the host declarations, relative to the directory of the
+    # configuration file
+    #
+    HOSTS_INCLUDE_FILE = 'tortuga-hosts.conf'
+    HOSTS_DIR = 'tortuga-hosts.d'
+    HOSTS_MANIFEST_PREFIX = '.manifest-'
+    HOSTS_INCLUDE_PREFIX = '.include-'
+
     def getServiceName(self):   # pylint: disable=no-self-use
         """ Get service name. """
         return DhcpdManager.SERVICE_NAME
@@ -50,11 +68,17 @@ class DhcpdManager(OsObjectManager):
         # RHEL 6.x
         return '/etc/dhcp/dhcpd.conf'
 
+    def getTemplateFileName(self):
+        return os.path.join(self._cm.getKitConfigBase(), 'dhcpd.conf.tmpl')
+
     def configure(self, leaseTime, dnsDomain, dnsServers, dhcpSubnets,
                   installerNode, bUpdateSysconfig=False,
-                  kit_settings=None):
+                  kit_settings=None, incremental=True):
         '''
         Invoked on the Installer Node to (re)configure the component
+
+        Returns True if the dhcpd configuration has changed, and the
+        service must be restarted for the changes to take effect.
         '''
 
         kit_settings = kit_settings or {}
@@ -70,59 +94,234 @@ class DhcpdManager(OsObjectManager):
             'rhel6': False,
         }
 
-        self._logger.debug('Writing [%s]' % (filename))
+        with open(self.getTemplateFileName()) as fp:
+            tmpl = fp.read()
 
-        with open(filename, 'w') as fd:
-            # Write the header created from template
-            with open('/opt/tortuga/config/dhcpd.conf.tmpl') as fp:
-                tmpl = fp.read()
+        # Write the header created from template
+        buf = Template(tmpl).render(dhcpCfgDict)
 
-            fd.write(Template(tmpl).render(dhcpCfgDict))
+        hosts = {}
 
-            for network, dhcpSubnet in dhcpSubnets.items():
-                # Find DNS server on this subnet
-                dnsServer = self._getDnsServerForNetwork(network, dnsServers)
+        for network, dhcpSubnet in dhcpSubnets.items():
+            # Find DNS server on this subnet
+            dnsServer = self._getDnsServerForNetwork(network, dnsServers)
 
-                self.getLogger().debug(
-                    'Configuring DHCP network [%s]' % (network))
+            self._logger.debug(
+                'Configuring DHCP network [%s]' % (network))
 
-                values = {
-                    'network': network.network_address,
-                    'netmask': network.netmask,
-                    'gateway': dhcpSubnet['gateway'],
-                }
+            values = {
+                'network': network.network_address,
+                'netmask': network.netmask,
+                'gateway': dhcpSubnet['gateway'],
+            }
 
-                # Generate the section of the file for this network
-                fd.write('''
+            # Generate the section of the file for this network
+            buf += '''
 subnet %(network)s netmask %(netmask)s {
     option routers             %(gateway)s;
     option subnet-mask         %(netmask)s;
-''' % (values))
+''' % (values)
+
+            if 'disable_services' in kit_settings and \
+                    'ntpd' not in kit_settings['disable_services']:
+                # Only add the entry for DHCP option 'ntp-servers' if
+                # this service is enabled.
+
+                buf += '    option ntp-servers         %s;\n' % (
+                    dhcpSubnet['gateway'])
 
-                if 'disable_services' in kit_settings and \
-                        'ntpd' not in kit_settings['disable_services']:
-                    # Only add the entry for DHCP option 'ntp-servers' if
-                    # this service is enabled.
+            if dnsServer:
+                buf += '    option domain-name-servers %s;\n' % (dnsServer)
 
-                    fd.write('    option ntp-servers         %s;\n' % (
-                        dhcpSubnet['gateway']))
+            buf += '    next-server                %s;\n' % (
+                dhcpSubnet['installerIp'])
 
-                if dnsServer:
-                    fd.write(
-                        '    option domain-name-servers %s;\n' % (dnsServer))
+            buf += '}\n'
 
-                fd.write('    next-server                %s;\n' % (
-                    dhcpSubnet['installerIp']))
+            # Generate host entries for each node in the subnet
+            for node in dhcpSubnet['nodes']:
+                entry = self._createDhcpNodeEntry(node)
 
-                fd.write('}\n')
+                if incremental:
+                    hosts[self._getHostFileName(node['mac'])] = entry
+                else:
+                    buf += entry
 
-                # Generate host entries for each node in the subnet
-                for node in dhcpSubnet['nodes']:
-                    fd.write(self._createDhcpNodeEntry(node))
+        if incremental:
+            changed = self._writeHostFiles(filename, hosts)
+
+            buf += '\ninclude "%s";\n' % (os.path.join(
+                os.path.dirname(filename), self.HOSTS_INCLUDE_FILE))
+        else:
+            changed = False
+
+        if self._writeFile(filename, buf):
+            self._logger.debug('Wrote [%s]' % (filename))
+
+            changed = True
 
         if bUpdateSysconfig:
             self.__updateSysconfig(installerNode)
 
+        return changed
+
+    def _writeHostFiles(self, filename, hosts):
+        """
+        Brings the host files in the include directory, and the lists of
+        include statements, in line with the given host declarations.
+
+        The host files are split into shards by the last byte of the MAC
+        address. Each shard has its own list of include statements and
+        manifest of content hashes, so that adding or removing a host only
+        rewrites the short lists of its shard.
+
+        :param filename: the dhcpd configuration file name
+        :param hosts:    dict of host file names to host declarations
+        :returns:        True if any host file changed
+
+        """
+        confDir = os.path.dirname(filename)
+        hostsDir = os.path.join(confDir, self.HOSTS_DIR)
+
+        os.makedirs(hostsDir, exist_ok=True)
+
+        shards = {}
+        for name, entry in hosts.items():
+            shards.setdefault(self._getShard(name), {})[name] = entry
+
+        existing = {}
+        listShards = set()
+
+        for name in os.listdir(hostsDir):
+            if name.endswith('.NEW'):
+                # Left over by an interrupted write
+                os.unlink(os.path.join(hostsDir, name))
+            elif name.startswith('.'):
+                shard = self._getListFileShard(name)
+                if shard is not None:
+                    listShards.add(shard)
+            else:
+                existing.setdefault(self._getShard(name), set()).add(name)
+
+        written = removed = 0
+
+        for shard in set(shards) | set(existing) | listShards:
+            shardHosts = shards.get(shard, {})
+            shardExisting = existing.get(shard, set())
+
+            manifestFile = os.path.join(
+                hostsDir, self.HOSTS_MANIFEST_PREFIX + shard)
+            includeFile = os.path.join(
+                hostsDir, self.HOSTS_INCLUDE_PREFIX + shard)
+
+            for name in shardExisting - set(shardHosts):
+                os.unlink(os.path.join(hostsDir, name))
+                removed += 1
+
+            if not shardHosts:
+                for name in (manifestFile, includeFile):
+                    if os.path.exists(name):
+                        os.unlink(name)
+
+                continue
+
+            # Files missing from the manifest, or from the directory, are
+            # always written
+            manifest = self._readManifest(manifestFile)
+
+            digests = {}
+            for name, entry in sorted(shardHosts.items()):
+                digest = hashlib.sha256(entry.encode()).hexdigest()
+                digests[name] = digest
+
+                if name in shardExisting and manifest.get(name) == digest:
+                    continue
+
+                self._writeFile(os.path.join(hostsDir, name), entry,
+                                compare=False)
+                written += 1
+
+            if digests != manifest:
+                self._writeFile(manifestFile,
+                                json.dumps(digests, sort_keys=True),
+                                compare=False)
+
+            self._writeFile(includeFile, ''.join(
+                'include "%s";\n' % (os.path.join(hostsDir, name))
+                for name in sorted(shardHosts)))
+
+        self._logger.debug(
+            'Wrote %d and removed %d of %d host declarations' % (
+                written, removed, len(hosts)))
+
+        changed = self._writeFile(
+            os.path.join(confDir, self.HOSTS_INCLUDE_FILE),
+            ''.join('include "%s";\n' % (os.path.join(
+                hostsDir, self.HOSTS_INCLUDE_PREFIX + shard))
+                for shard in sorted(shards)))
+
+        return changed or bool(written or removed)
+
+    @staticmethod
+    def _getShard(hostFileName):
+        # Host file names end with the last byte of the MAC address
+        return hostFileName[:-len('.conf')][-2:]
+
+    @classmethod
+    def _getListFileShard(cls, name):
+        """
+        Returns the shard of a manifest or include list file name, or None
+        if it is neither.
+
+        """
+        for prefix in (cls.HOSTS_MANIFEST_PREFIX, cls.HOSTS_INCLUDE_PREFIX):
+            if name.startswith(prefix):
+                return name[len(prefix):]
+
+        return None
+
+    @staticmethod
+    def _getHostFileName(mac):
+        return '%s.conf' % (mac.lower().replace(':', '-'))
+
+    @staticmethod
+    def _readManifest(manifestFile):
+        try:
+            with open(manifestFile) as fp:
+                manifest = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+        return manifest if isinstance(manifest, dict) else {}
+
+    @staticmethod
+    def _writeFile(filename, contents, compare=True):
+        """
+        Atomically replaces the contents of a file. If compare is set, the
+        file is left as is if its contents are unchanged.
+
+        :returns: True if the file was written
+
+        """
+        if compare:
+            try:
+                with open(filename) as fp:
+                    if fp.read() == contents:
+                        return False
+            except OSError:
+                pass
+
+        dirName, baseName = os.path.split(filename)
+
+        tmpFileName = os.path.join(dirName, '.%s.NEW' % (baseName))
+
+        with open(tmpFileName, 'w') as fp:
+            fp.write(contents)
+
+        os.replace(tmpFileName, filename)
+
+        return True
+
     def _getDnsServerForNetwork(self, network, dnsServers): \
             # pylint: disable=no-self-use
         for dnsServer in dnsServers:
@@ -166,7 +365,7 @@ host %(hostname)s {
 
         cfgFileName = '/etc/sysconfig/dhcpd'
 
-        self.getLogger().debug('[dhcpd] Updating %s' % (cfgFileName))
+        self._logger.debug('[dhcpd] Updating %s' % (cfgFileName))
 
         dhcpdNics = self.__getProvisioningNicDeviceNames(installerNode)
 